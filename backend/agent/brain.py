@@ -1,16 +1,45 @@
 from langchain.agents import create_agent
-from dependencies import llm
-from agent.tools import zus_rag_tool
+from langchain.agents.middleware import AgentMiddleware
+from agent.tools import zus_rag_tool, RAW_MODE_PROMPT
+from services.model_router import get_agent_llm
+from services.resilience import current_deadline, DeadlineExceededError
+from services.metrics import span, AGENT_MODEL_STEP, AGENT_TOOL_STEP
 
 
-def create_agent_instance(llm_instance=None):
+class DeadlineMiddleware(AgentMiddleware):
+    """
+    Stops the agent loop before another model call once the request deadline has passed.
+    """
+
+    def before_model(self, state, runtime):
+        deadline = current_deadline.get()
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceededError("Request deadline exhausted between agent steps")
+        return None
+
+
+class StepTimingMiddleware(AgentMiddleware):
+    """
+    Times each agent step (model call or tool call) into the agent step histogram.
+    """
+
+    def wrap_model_call(self, request, handler):
+        with span(AGENT_MODEL_STEP):
+            return handler(request)
+
+    def wrap_tool_call(self, request, handler):
+        with span(AGENT_TOOL_STEP):
+            return handler(request)
+
+
+def create_agent_instance(llm_instance=None, rag_tool=None):
     """
     Create a modern LangChain agent using langchain.agents.create_agent().
-    Handles RAG queries for ZUS Coffee using the zus_rag_tool.
+    Handles RAG queries for ZUS Coffee using the zus_rag_tool (or the given rag_tool).
     """
 
     # Select LLM model
-    model = llm_instance if llm_instance else llm
+    model = llm_instance if llm_instance else get_agent_llm()
 
     # System prompt as string (not SystemMessage object)
     system_prompt = (
@@ -23,17 +52,25 @@ def create_agent_instance(llm_instance=None):
         "- Prices, categories, or product details\n"
         "- Store hours, contact info, or outlet information\n\n"
         "DO NOT answer from memory or general knowledge. ALWAYS call the tool first.\n"
+        "For compound questions (e.g. a product price AND outlet locations), split them into "
+        "self-contained sub-questions and pass them together in the tool's `queries` list, "
+        "or issue the tool calls in parallel in a single step - never one after another.\n"
         "The tool searches our internal database with embeddings for accurate, up-to-date information.\n\n"
         "After getting tool results, format them nicely for the user."
     )
 
-    tools = [zus_rag_tool]
+    tool = rag_tool or zus_rag_tool
+    if tool.mode == "raw":
+        system_prompt += "\n" + RAW_MODE_PROMPT
+
+    tools = [tool]
 
     # Create agent with system_prompt as string
     agent = create_agent(
         model=model,
         tools=tools,
-        system_prompt=system_prompt
+        system_prompt=system_prompt,
+        middleware=[DeadlineMiddleware(), StepTimingMiddleware()]
     )
 
     return agent
@@ -1,12 +1,27 @@
 from langchain.tools import BaseTool
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List, Type
 from services.rag_service import RAGService
-from dependencies import llm
+from services.speculation import SpeculativeRetriever
+from services.retrieval_cache import ConversationRetrievalCache
+from services.model_router import model_router
+from services.query_log import query_log
+from dependencies import RAG_TOOL_MODE
 
 # -------------------- Initialize RAG Service --------------------
-rag_service = RAGService(llm)
+rag_service = RAGService(model_router=model_router)
+speculative_retriever = SpeculativeRetriever(rag_service)
+conversation_cache = ConversationRetrievalCache(rag_service)
 
 # -------------------- RAG LangChain Tool --------------------
+class ZUSRAGInput(BaseModel):
+    query: str = Field(default="", description="A natural language question about ZUS Coffee products, food, drinks, or outlets.")
+    queries: Optional[List[str]] = Field(
+        default=None,
+        description="For compound questions: one self-contained sub-question per item, searched together in one batch."
+    )
+
+
 class ZUSRAGTool(BaseTool):
     name: str = "zus_rag_search"
     description: str = (
@@ -14,24 +29,69 @@ class ZUSRAGTool(BaseTool):
         "food items (meals, pastries, food menu), drinks (beverages, coffee, tea, drink menu), "
         "outlets (locations, addresses, store info), prices, categories, and other internal data. "
         "This tool uses embeddings to find the most relevant and accurate information. "
-        "Input: A natural language question about ZUS Coffee products, food, drinks, or outlets."
+        "Input: A natural language question about ZUS Coffee products, food, drinks, or outlets, "
+        "or a list of sub-questions in `queries` when the user asks about several things at once."
     )
+    args_schema: Type[BaseModel] = ZUSRAGInput
+
+    # "summary": LLM-written summary of the hits; "raw": compact JSON hits for the agent to phrase itself
+    mode: str = RAG_TOOL_MODE
+
+    def _search(self, query: str = "", queries: Optional[List[str]] = None) -> str:
+        sub_queries = [q for q in (queries or []) if q.strip()]
+        if not sub_queries and query.strip():
+            sub_queries = [query]
+        if not sub_queries:
+            return "Please provide a question to search for."
 
-    def _run(self, query: str) -> str:
+        # Compound question: batch retrieval with concurrent per-sub-query summaries
+        if len(sub_queries) > 1:
+            if self.mode == "raw":
+                result = rag_service.search_and_format_many(sub_queries, top_k=5)
+            else:
+                result = rag_service.search_and_summarize_many(sub_queries, top_k=5)
+            query_log.annotate(cache="search_many", hits=[hit for hits in result["hits"] for hit in hits])
+            return result["context"] if self.mode == "raw" else result["summary"]
+
+        query = sub_queries[0]
+        # Reuse the previous turn's hits when this is a follow-up, or hits speculatively
+        # retrieved for this request's user message if the query is close enough
+        hits = conversation_cache.resolve_follow_up(query, top_k=5)
+        source = "follow_up"
+        if hits is None:
+            hits = speculative_retriever.claim(query, top_k=5)
+            source = "speculative"
+        if hits is None:
+            source = "search"
+
+        if self.mode == "raw":
+            result = rag_service.search_and_format(query=query, top_k=5, hits=hits)
+        else:
+            result = rag_service.search_and_summarize(query=query, top_k=5, hits=hits)
+        conversation_cache.remember(result["hits"])
+        query_log.annotate(cache=source, hits=result["hits"])
+        return result["context"] if self.mode == "raw" else result["summary"]
+
+    def _run(self, query: str = "", queries: Optional[List[str]] = None) -> str:
         """
         Synchronous run method for LangChain.
         Searches internal database using RAG with embeddings.
         """
-        result = rag_service.search_and_summarize(query=query, top_k=5)
-        return result["summary"]
+        return self._search(query, queries)
 
-    async def _arun(self, query: str) -> str:
+    async def _arun(self, query: str = "", queries: Optional[List[str]] = None) -> str:
         """
         Asynchronous run method for LangChain.
         Searches internal database using RAG with embeddings.
         """
-        result = rag_service.search_and_summarize(query=query, top_k=5)
-        return result["summary"]
+        return self._search(query, queries)
 
 # -------------------- Instantiate the tool --------------------
 zus_rag_tool = ZUSRAGTool()
+
+# Instructions the agent needs when the tool returns raw hits instead of a summary
+RAW_MODE_PROMPT = (
+    "The tool returns one JSON object per matching entry with fields like type, name, category, "
+    "price, address and a relevance score. Ignore low-scoring entries that don't fit the question, "
+    "and write the final answer yourself."
+)
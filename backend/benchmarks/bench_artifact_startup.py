@@ -0,0 +1,71 @@
+"""
+Startup benchmark: time to ready when loading from the Hugging Face cache vs. an offline artifact.
+
+Each run starts a fresh interpreter that imports main and runs the same background
+warm-up the server runs (model, FAISS index, metadata, probe search, intent router,
+agent), then reports the per-asset load times recorded by the readiness tracker.
+"hub" resolves the embedding model by name (HF cache, network on a cold cache);
+"artifact" sets ARTIFACT_DIR and loads strictly offline from the bundle.
+
+Build an artifact first, then run from the backend directory:
+    python services/artifacts.py build --out artifacts
+    python benchmarks/bench_artifact_startup.py --artifact artifacts/latest --runs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter() - start
+main.load_and_warm_up()
+from services.readiness import readiness
+status = readiness.status()
+print(json.dumps({"import_s": imported, "ready": status["ready"],
+                  "total_s": time.perf_counter() - start, "assets": status["assets"]}))
+"""
+
+
+def run_once(source: str, artifact_dir: str) -> dict:
+    env = dict(os.environ, LLM_PROVIDER=os.getenv("LLM_PROVIDER", "fake"))
+    env.pop("ARTIFACT_DIR", None)
+    if source == "artifact":
+        env["ARTIFACT_DIR"] = os.path.abspath(artifact_dir)
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=env,
+                            capture_output=True, text=True)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(f"{source} startup failed:\n{result.stderr[-2000:]}")
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--artifact", default=os.path.join("artifacts", "latest"))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--sources", default="hub,artifact")
+    args = parser.parse_args()
+
+    for source in args.sources.split(","):
+        runs = [run_once(source, args.artifact) for _ in range(args.runs)]
+        best = min(runs, key=lambda r: r["total_s"])
+        if not best["ready"]:
+            failed = {name: a.get("error") for name, a in best["assets"].items() if a["status"] == "failed"}
+            print(f"\n== {source}: NOT READY {failed}")
+            continue
+
+        totals = sorted(r["total_s"] for r in runs)
+        print(f"\n== {source}: ready in {best['total_s']:.2f}s best, {totals[len(totals) // 2]:.2f}s median "
+              f"({args.runs} runs; import main {best['import_s']:.2f}s)")
+        for name, asset in best["assets"].items():
+            print(f"  {name:<16}{asset['seconds']:>8.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Batch vs. single-item CRUD: N creates, N partial updates and N deletes on the food table.
+
+"single" awaits one create/modify/remove per item, as a client making N sequential
+POST/PUT/DELETE calls does: every item is its own write job and commit. "batch" sends
+each phase as one apply_batch (what POST /food/batch/ runs): one write job, one
+transaction. HTTP overhead per call is not included, so the gap on a real server is larger.
+
+Runs against a copy of the catalog database. From the backend directory:
+    python benchmarks/bench_batch_crud.py --items 1000
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dependencies import DATABASE_PATH
+from services import crud
+from services.database import Database
+from services.migrations import migrate
+
+
+async def run_single(table, items: int) -> dict:
+    timings = {}
+    start = time.perf_counter()
+    ids = [(await table.create({"name": f"bench {i}", "category": "bench", "price": 1.0}))["id"]
+           for i in range(items)]
+    timings["create"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for row_id in ids:
+        await table.modify(row_id, {"price": 2.0})
+    timings["update"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for row_id in ids:
+        await table.remove(row_id)
+    timings["delete"] = time.perf_counter() - start
+    return timings
+
+
+async def run_batch(table, items: int) -> dict:
+    timings = {}
+    start = time.perf_counter()
+    result = await table.apply_batch(
+        [{"name": f"bench {i}", "category": "bench", "price": 1.0} for i in range(items)], [], [])
+    timings["create"] = time.perf_counter() - start
+    ids = [item["id"] for item in result["results"]]
+
+    start = time.perf_counter()
+    await table.apply_batch([], [{"id": row_id, "price": 2.0} for row_id in ids], [])
+    timings["update"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await table.apply_batch([], [], ids)
+    timings["delete"] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-batch-")
+    path = os.path.join(workdir, "catalog.db")
+    shutil.copyfile(DATABASE_PATH, path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    migrate(conn)
+    conn.close()
+
+    # Point the CRUD layer at the copy
+    crud.database = Database(path)
+    try:
+        results = {
+            "single": asyncio.run(run_single(crud.food_table, args.items)),
+            "batch": asyncio.run(run_batch(crud.food_table, args.items)),
+        }
+    finally:
+        crud.database.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.items} items per phase on the food table\n")
+    print(f"{'phase':<10}{'single s':>10}{'batch s':>10}{'speedup':>10}")
+    for phase in ("create", "update", "delete"):
+        single, batch = results["single"][phase], results["batch"][phase]
+        print(f"{phase:<10}{single:>10.3f}{batch:>10.3f}{single / batch:>9.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Catalog GETs with and without the in-memory cache (services/catalog_cache.py).
+
+"uncached" does what the endpoints did before the cache: check out a pooled read
+connection, run the query, build row dicts and validate and serialize them with the
+response model. "cached" calls the CachedTable method the endpoint now uses, which after
+the first request returns the stored JSON body. HTTP overhead is not included.
+
+Runs against a copy of the catalog database. From the backend directory:
+    python benchmarks/bench_catalog_cache.py --requests 2000
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from dependencies import DATABASE_PATH
+from schemas import Drink, Page
+from services import crud
+from services.catalog_cache import CachedTable
+from services.database import Database
+from services.migrations import migrate
+
+ENDPOINTS = {
+    "list": (lambda table, conn: table.list(conn, 0, 100), lambda cached: cached.list(0, 100, Response()),
+             TypeAdapter(List[Drink])),
+    "detail": (lambda table, conn: table.get(conn, 1), lambda cached: cached.get(1, Response()), TypeAdapter(Drink)),
+    "page": (lambda table, conn: table.page(conn, 20, "price", "asc", None, True),
+             lambda cached: cached.page(20, "price", "asc", None, True, Response()), TypeAdapter(Page[Drink])),
+    "search": (lambda table, conn: table.search(conn, 100, name="latte"),
+               lambda cached: cached.search(100, Response(), name="latte"), TypeAdapter(List[Drink])),
+}
+
+
+def timed(call, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        call()
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-cache-")
+    path = os.path.join(workdir, "catalog.db")
+    shutil.copyfile(DATABASE_PATH, path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    migrate(conn)
+    conn.close()
+
+    # Point the CRUD layer (and so the cache) at the copy
+    crud.database = Database(path)
+    table = crud.drinks_table
+    cached = CachedTable(table, Drink, enabled=True)
+    results = {}
+    try:
+        for endpoint, (query, read, adapter) in ENDPOINTS.items():
+            def uncached():
+                with crud.database.read(table.router) as conn:
+                    adapter.dump_json(adapter.validate_python(query(table, conn)))
+            results[endpoint] = (timed(uncached, args.requests), timed(lambda: read(cached), args.requests))
+        stats = cached.stats()
+    finally:
+        crud.database.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.requests} requests per endpoint on the drinks table ({stats['rows']} rows)\n")
+    print(f"{'endpoint':<10}{'uncached us':>13}{'cached us':>11}{'speedup':>10}")
+    for endpoint, (uncached_us, cached_us) in results.items():
+        print(f"{endpoint:<10}{uncached_us:>13.1f}{cached_us:>11.1f}{uncached_us / cached_us:>9.0f}x")
+    print(f"\nhit ratio {stats['hit_ratio']:.4f}, {stats['row_bytes'] + stats['response_bytes']} bytes cached")
+
+
+if __name__ == "__main__":
+    main()
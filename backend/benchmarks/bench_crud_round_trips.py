@@ -0,0 +1,165 @@
+"""
+Per-endpoint CRUD micro-benchmark: statements, connections and time per call.
+
+"legacy" replays what the entity routers used to run per request: a fresh connection,
+SELECT-exists -> UPDATE -> SELECT for updates, INSERT -> SELECT for creates,
+SELECT-exists -> DELETE for deletes. "returning" runs services/crud.py's single
+INSERT/UPDATE/DELETE ... RETURNING statements on one long-lived connection (as the
+writer and read pool do). Both commit every call, so only round trips differ; the
+group commit on top of this is measured by bench_sqlite_writes.py.
+
+Runs on a copy of the catalog database. From the backend directory:
+    python benchmarks/bench_crud_round_trips.py --calls 2000
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dependencies import DATABASE_PATH
+from services.crud import food_table
+
+
+class Counter:
+    def __init__(self):
+        self.statements = 0
+        self.connections = 0
+
+    def connect(self, path):
+        self.connections += 1
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        conn.set_trace_callback(self.trace)
+        return conn
+
+    def trace(self, sql):
+        if sql not in ("BEGIN ", "COMMIT"):
+            self.statements += 1
+
+
+# -------------------- Legacy router code paths --------------------
+def legacy_create(counter, path, i):
+    conn = counter.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO food (name, category, price, image_url) VALUES (?, ?, ?, ?)",
+                   (f"bench {i}", "bench", 1.0, None))
+    conn.commit()
+    cursor.execute("SELECT * FROM food WHERE id = ?", (cursor.lastrowid,))
+    row = dict(cursor.fetchone())
+    conn.close()
+    return row["id"]
+
+
+def legacy_get(counter, path, food_id):
+    conn = counter.connect(path)
+    row = conn.execute("SELECT * FROM food WHERE id = ?", (food_id,)).fetchone()
+    conn.close()
+    return dict(row)
+
+
+def legacy_update(counter, path, food_id):
+    conn = counter.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM food WHERE id = ?", (food_id,))
+    cursor.fetchone()
+    cursor.execute("UPDATE food SET name = ?, price = ? WHERE id = ?", ("bench (updated)", 2.0, food_id))
+    conn.commit()
+    cursor.execute("SELECT * FROM food WHERE id = ?", (food_id,))
+    row = dict(cursor.fetchone())
+    conn.close()
+    return row
+
+
+def legacy_delete(counter, path, food_id):
+    conn = counter.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM food WHERE id = ?", (food_id,))
+    cursor.fetchone()
+    cursor.execute("DELETE FROM food WHERE id = ?", (food_id,))
+    conn.commit()
+    conn.close()
+
+
+# -------------------- RETURNING code paths --------------------
+def returning_paths(counter, path):
+    conn = counter.connect(path)
+
+    def create(_, __, i):
+        row = food_table.insert(conn, {"name": f"bench {i}", "category": "bench", "price": 1.0})
+        conn.commit()
+        return row["id"]
+
+    def get(_, __, food_id):
+        return food_table.get(conn, food_id)
+
+    def update(_, __, food_id):
+        row = food_table.update(conn, food_id, {"name": "bench (updated)", "price": 2.0})
+        conn.commit()
+        return row
+
+    def delete(_, __, food_id):
+        food_table.delete(conn, food_id)
+        conn.commit()
+
+    return {"create": create, "get": get, "update": update, "delete": delete}, conn.close
+
+
+def run(variant: str, calls: int, path: str) -> dict:
+    counter = Counter()
+    if variant == "legacy":
+        paths, close = {"create": legacy_create, "get": legacy_get,
+                        "update": legacy_update, "delete": legacy_delete}, lambda: None
+    else:
+        paths, close = returning_paths(counter, path)
+
+    results, ids = {}, []
+    for op in ("create", "get", "update", "delete"):
+        statements, connections = counter.statements, counter.connections
+        start = time.perf_counter()
+        for i in range(calls):
+            if op == "create":
+                ids.append(paths[op](counter, path, i))
+            else:
+                paths[op](counter, path, ids[i])
+        elapsed = time.perf_counter() - start
+        results[op] = {
+            "us_per_call": elapsed / calls * 1e6,
+            "statements": (counter.statements - statements) / calls,
+            "connections": (counter.connections - connections) / calls,
+        }
+    close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-crud-")
+    path = os.path.join(workdir, "catalog.db")
+    shutil.copyfile(DATABASE_PATH, path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+
+    try:
+        results = {variant: run(variant, args.calls, path) for variant in ("legacy", "returning")}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.calls} calls per endpoint on the food table (WAL, commit per call)\n")
+    print(f"{'endpoint':<10}{'variant':<12}{'statements':>12}{'connections':>13}{'us/call':>10}")
+    for op in ("create", "get", "update", "delete"):
+        for variant in ("legacy", "returning"):
+            r = results[variant][op]
+            print(f"{op:<10}{variant:<12}{r['statements']:>12.1f}{r['connections']:>13.1f}{r['us_per_call']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Import-time benchmark and regression guard for the API process.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter for each
+APP_MODE, reports the total and the slowest imports, and fails when:
+
+- importing main takes longer than the mode's budget (--full-budget-ms / --crud-budget-ms)
+- a module that must stay deferred was imported (the ML stack in any mode,
+  and anything LLM-related in crud mode)
+
+Each mode is measured --runs times and the best run is kept, to limit noise.
+The report lists the slowest imports made by main and by its direct imports.
+
+Run from the backend directory:
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --full-budget-ms 2500 --crud-budget-ms 800
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages that must not be imported by `import main`
+FORBIDDEN = {
+    "full": ["torch", "sentence_transformers", "faiss", "langchain_google_genai", "langchain_community"],
+    "crud": ["torch", "sentence_transformers", "faiss", "langchain", "langchain_core",
+             "langchain_google_genai", "langchain_community"],
+}
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(mode: str):
+    """
+    Return (total_us, {module: cumulative_us}, {module: depth}) for one fresh `import main`.
+    Depth 1 is imported directly by main.
+    """
+    env = dict(os.environ, APP_MODE=mode, LLM_PROVIDER=os.getenv("LLM_PROVIDER", "fake"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed in {mode} mode:\n{result.stderr[-2000:]}")
+
+    modules, depths = {}, {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+            depths[match.group(4)] = (len(match.group(3)) - 1) // 2
+    return modules.get("main", 0), modules, depths
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--full-budget-ms", type=float, default=3000)
+    parser.add_argument("--crud-budget-ms", type=float, default=1000)
+    parser.add_argument("--top", type=int, default=8)
+    args = parser.parse_args()
+    budgets = {"full": args.full_budget_ms, "crud": args.crud_budget_ms}
+
+    failures = []
+    for mode in ("full", "crud"):
+        total_us, modules, depths = min((measure(mode) for _ in range(args.runs)), key=lambda r: r[0])
+        # Slowest imports made by main and by the modules it imports directly
+        near_main = {name: us for name, us in modules.items() if 1 <= depths[name] <= 2}
+
+        print(f"\n== APP_MODE={mode}: import main {total_us / 1000:.0f} ms (budget {budgets[mode]:.0f} ms)")
+        for name, us in sorted(near_main.items(), key=lambda kv: -kv[1])[:args.top]:
+            print(f"  {'  ' * (depths[name] - 1)}{name:<32}{us / 1000:>8.0f} ms")
+
+        if total_us / 1000 > budgets[mode]:
+            failures.append(f"{mode}: import main took {total_us / 1000:.0f} ms > {budgets[mode]:.0f} ms")
+        leaked = [name for name in FORBIDDEN[mode] if name in modules]
+        if leaked:
+            failures.append(f"{mode}: eagerly imported {', '.join(leaked)}")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark the embedding-based intent router.
+
+Reports accuracy on the labelled evaluation set, per-message classification
+latency and the LLM calls the direct retrieval path saves per turn.
+
+Run from the backend directory:
+    python benchmarks/bench_intent_router.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from dependencies import EMBEDDING_MODEL
+from services.intent_router import (
+    IntentRouter, EVAL_SET, DIRECT_INTENTS, AGENT_LLM_CALLS, DIRECT_LLM_CALLS
+)
+
+
+def main():
+    print("Loading embedding model...")
+    embed_model = SentenceTransformer(EMBEDDING_MODEL)
+
+    start = time.perf_counter()
+    router = IntentRouter(embed_model)
+    print(f"Prototype encoding: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # Accuracy
+    report = router.evaluate()
+    print(f"\nAccuracy: {report['accuracy']:.1%} on {report['samples']} samples "
+          f"(threshold {report['threshold']})")
+    for label, recall in report["per_label_recall"].items():
+        print(f"  {label:<10} recall {recall:.1%}  {report['confusion'][label]}")
+
+    # Latency
+    timings = []
+    direct = 0
+    for _ in range(5):
+        for text, _ in EVAL_SET:
+            t0 = time.perf_counter()
+            label, _, _ = router.classify(text)
+            timings.append((time.perf_counter() - t0) * 1000)
+            direct += int(label in DIRECT_INTENTS)
+    print(f"\nClassify latency: p50 {np.percentile(timings, 50):.2f} ms, "
+          f"p95 {np.percentile(timings, 95):.2f} ms")
+
+    # LLM calls saved
+    turns = len(timings)
+    baseline = turns * AGENT_LLM_CALLS
+    routed = direct * DIRECT_LLM_CALLS + (turns - direct) * AGENT_LLM_CALLS
+    print(f"\nLLM calls: {baseline} via agent only vs {routed} with router "
+          f"({(baseline - routed) / turns:.2f} saved per turn)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compare the two zus_rag_search tool modes end to end.
+
+- summary: the tool asks the LLM to summarize the hits, then the agent rewrites that summary
+- raw:     the tool returns compact structured hits and the agent does the only generation
+
+For each mode the full agent is run over the same questions, recording wall-clock
+latency and the tokens of every LLM call made during the turn (including the
+tool's internal summary call).
+
+Run from the backend directory:
+    python benchmarks/bench_rag_tool_modes.py            # uses LLM_PROVIDER (Gemini by default)
+    LLM_PROVIDER=fake python benchmarks/bench_rag_tool_modes.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from langchain_core.callbacks import get_usage_metadata_callback
+from langchain_core.messages import HumanMessage
+from dependencies import get_llm
+from agent.brain import create_agent_instance
+from agent.tools import ZUSRAGTool
+
+QUESTIONS = [
+    "How much is the All Day Cup?",
+    "Which outlets are in Shah Alam?",
+    "What frappe drinks do you have?",
+    "Is there nasi lemak on the food menu?",
+    "Give me the address of the ZUS Coffee at Spectrum Shopping Mall",
+    "What mugs do you sell and how much are they?",
+]
+
+
+def run_mode(mode: str, rounds: int):
+    llm = get_llm()
+    agent = create_agent_instance(llm, rag_tool=ZUSRAGTool(mode=mode))
+
+    latencies = []
+    input_tokens = []
+    output_tokens = []
+    for _ in range(rounds):
+        for question in QUESTIONS:
+            with get_usage_metadata_callback() as usage_cb:
+                start = time.perf_counter()
+                agent.invoke({"messages": [HumanMessage(content=question)]})
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            usage = usage_cb.usage_metadata
+            input_tokens.append(sum(u.get("input_tokens", 0) for u in usage.values()))
+            output_tokens.append(sum(u.get("output_tokens", 0) for u in usage.values()))
+
+    return {
+        "p50_ms": np.percentile(latencies, 50),
+        "p95_ms": np.percentile(latencies, 95),
+        "input_tokens": np.mean(input_tokens),
+        "output_tokens": np.mean(output_tokens),
+    }
+
+
+def main():
+    rounds = int(os.getenv("BENCH_ROUNDS", "2"))
+    results = {mode: run_mode(mode, rounds) for mode in ("summary", "raw")}
+
+    print(f"\n{'mode':<10}{'p50 ms':>10}{'p95 ms':>10}{'in tok/turn':>14}{'out tok/turn':>14}")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}{r['input_tokens']:>14.0f}{r['output_tokens']:>14.0f}")
+
+    summary, raw = results["summary"], results["raw"]
+    print(f"\nraw vs summary: latency p50 {raw['p50_ms'] / summary['p50_ms'] - 1:+.0%}, "
+          f"total tokens {(raw['input_tokens'] + raw['output_tokens']) / (summary['input_tokens'] + summary['output_tokens']) - 1:+.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Measure the per-span cost of the metrics instrumentation.
+
+Times an empty `with span(...)` block with and without request span collection
+(X-Debug-Timings) against a bare loop, so the instrumentation overhead per
+stage stays visible as the metrics code changes.
+
+Run from the backend directory:
+    python benchmarks/bench_span_overhead.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.metrics import span, request_spans, STAGE_SECONDS
+
+ITERATIONS = 200_000
+
+
+def per_call_us(fn) -> float:
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        fn()
+    return (time.perf_counter() - start) / ITERATIONS * 1e6
+
+
+def main():
+    series = STAGE_SECONDS.labels("bench")
+
+    def bare():
+        pass
+
+    def timed():
+        with span(series):
+            pass
+
+    baseline = per_call_us(bare)
+    request_spans.set(None)
+    without_spans = per_call_us(timed)
+    request_spans.set([])
+    with_spans = per_call_us(timed)
+    request_spans.set(None)
+
+    print(f"{'variant':<28}{'us/call':>10}{'overhead us':>14}")
+    print(f"{'bare call':<28}{baseline:>10.3f}{'':>14}")
+    print(f"{'span':<28}{without_spans:>10.3f}{without_spans - baseline:>14.3f}")
+    print(f"{'span + request timings':<28}{with_spans:>10.3f}{with_spans - baseline:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
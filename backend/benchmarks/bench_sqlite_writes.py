@@ -0,0 +1,153 @@
+"""
+Write-heavy SQLite benchmark: per-write connections and commits vs. the group-committing writer.
+
+N writer threads each run create -> update -> delete cycles against the food table
+while a reindex thread periodically replaces embedding_metadata (one DELETE plus
+hundreds of INSERTs), as /embeddings/reindex does. Every mode runs on a fresh copy
+of the catalog database so the real file is never touched.
+
+Modes:
+    direct      connect + commit per write, rollback journal (how the routers used to write)
+    direct-wal  the same on a WAL database
+    queue       services.database.WriteQueue: one writer thread, group commits, WAL
+
+Run from the backend directory:
+    python benchmarks/bench_sqlite_writes.py --writers 16 --cycles 50
+    python benchmarks/bench_sqlite_writes.py --modes queue --window-ms 5
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dependencies import DATABASE_PATH
+from services.database import WriteQueue
+
+
+def create(conn, i):
+    cursor = conn.execute("INSERT INTO food (name, category) VALUES (?, ?)", (f"bench item {i}", "bench"))
+    return cursor.lastrowid
+
+
+def update(conn, food_id):
+    conn.execute("UPDATE food SET name = ? WHERE id = ?", ("bench item (updated)", food_id))
+
+
+def delete(conn, food_id):
+    conn.execute("DELETE FROM food WHERE id = ?", (food_id,))
+
+
+def replace_metadata(conn, rows):
+    conn.execute("DELETE FROM embedding_metadata")
+    conn.executemany("INSERT INTO embedding_metadata (item_type, item_index, text) VALUES (?, ?, ?)", rows)
+
+
+def direct_writer(path: str):
+    """Old behaviour: a new connection and a commit for every write."""
+    def write(fn, *args):
+        conn = sqlite3.connect(path)
+        try:
+            result = fn(conn, *args)
+            conn.commit()
+            return result
+        finally:
+            conn.close()
+    return write, lambda: None
+
+
+def queue_writer(path: str, window: float, max_batch: int):
+    writer = WriteQueue(path, window=window, max_batch=max_batch, max_queue=100000, timeout=60)
+    return (lambda fn, *args: writer.run(lambda conn: fn(conn, *args), "bench")), writer.close
+
+
+def run_mode(mode: str, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench-sqlite-")
+    path = os.path.join(workdir, "catalog.db")
+    shutil.copyfile(DATABASE_PATH, path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL" if mode != "direct" else "PRAGMA journal_mode=DELETE")
+    metadata_rows = conn.execute("SELECT item_type, item_index, text FROM embedding_metadata").fetchall()
+    conn.close()
+
+    if mode == "queue":
+        write, close = queue_writer(path, args.window_ms / 1000, args.max_batch)
+    else:
+        write, close = direct_writer(path)
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop_reindex = threading.Event()
+
+    def timed(fn, *fn_args):
+        start = time.perf_counter()
+        try:
+            result = write(fn, *fn_args)
+        except Exception as e:
+            with lock:
+                errors.append(type(e).__name__ + ": " + str(e)[:60])
+            return None
+        with lock:
+            latencies.append((time.perf_counter() - start) * 1000)
+        return result
+
+    def writer_loop(worker: int):
+        for cycle in range(args.cycles):
+            food_id = timed(create, worker * 100000 + cycle)
+            if food_id is not None:
+                timed(update, food_id)
+                timed(delete, food_id)
+
+    def reindex_loop():
+        while not stop_reindex.wait(args.reindex_every):
+            timed(replace_metadata, metadata_rows)
+
+    reindexer = threading.Thread(target=reindex_loop)
+    threads = [threading.Thread(target=writer_loop, args=(i,)) for i in range(args.writers)]
+    start = time.perf_counter()
+    reindexer.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    stop_reindex.set()
+    reindexer.join()
+    close()
+    shutil.rmtree(workdir, ignore_errors=True)
+    return {"latencies": latencies, "errors": errors, "wall": wall}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", default="direct,direct-wal,queue")
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--cycles", type=int, default=50, help="create/update/delete cycles per writer")
+    parser.add_argument("--reindex-every", type=float, default=0.25, help="seconds between metadata rewrites")
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers x {args.cycles} cycles (3 writes each), "
+          f"metadata rewrite every {args.reindex_every}s")
+    for mode in args.modes.split(","):
+        result = run_mode(mode, args)
+        latencies = result["latencies"]
+        print(f"\n== {mode}")
+        print(f"  throughput: {len(latencies) / result['wall']:.0f} writes/s over {result['wall']:.2f}s")
+        if latencies:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            print(f"  latency ms: p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f}  max {max(latencies):.1f}")
+        if result["errors"]:
+            print(f"  errors: {len(result['errors'])} (e.g. {result['errors'][0]})")
+
+
+if __name__ == "__main__":
+    main()
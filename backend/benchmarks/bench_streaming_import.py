@@ -0,0 +1,182 @@
+"""
+Bulk-load benchmark: the streaming admin import vs. the offline json.load ingestion.
+
+Generates a synthetic food file (default 1M rows, every 10th row repeating an earlier
+name so the upsert path is exercised), then loads it in a fresh interpreter per mode
+on a migrated copy of the catalog database (with its FTS triggers) and reports
+wall time, rows/s and peak anonymous RSS (sampled from /proc, Linux only; file-backed
+pages such as SQLite's mmap of the growing database are left out):
+
+    stream-csv     services/importer.py fed 64 KiB chunks of the CSV file
+    stream-ndjson  the same with the NDJSON file
+    json-load      json.load of the whole file, then one INSERT per row and a single
+                   commit (what ingestion/ingest_scraped_data_to_sqlite.py does)
+
+From the backend directory:
+    python benchmarks/bench_streaming_import.py --rows 1000000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dependencies import DATABASE_PATH
+
+READ_SIZE = 64 * 1024
+
+
+def synthetic_rows(count: int):
+    for i in range(count):
+        n = i - i % 10 if i % 10 == 9 else i
+        yield {"name": f"Synthetic item {n}", "category": f"cat {n % 50}",
+               "price": f"RM{n % 90 + 5}.90", "image_url": f"https://example.com/{n}.png"}
+
+
+def write_files(workdir: str, count: int) -> dict:
+    paths = {fmt: os.path.join(workdir, f"food.{fmt}") for fmt in ("csv", "ndjson", "json")}
+    with open(paths["csv"], "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["name", "category", "price", "image_url"])
+        writer.writeheader()
+        writer.writerows(synthetic_rows(count))
+    with open(paths["ndjson"], "w", encoding="utf-8") as f:
+        for row in synthetic_rows(count):
+            f.write(json.dumps(row) + "\n")
+    with open(paths["json"], "w", encoding="utf-8") as f:
+        json.dump(list(synthetic_rows(count)), f)
+    return paths
+
+
+# -------------------- Child process --------------------
+async def file_chunks(path: str):
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(READ_SIZE)
+            if not data:
+                return
+            yield data
+
+
+def load_stream(fmt: str, path: str, db: str) -> int:
+    from services import crud
+    from services.database import Database
+    from services.importer import importer
+
+    crud.database = Database(db)
+    try:
+        result = asyncio.run(importer.run("food", fmt, file_chunks(path)))
+    finally:
+        crud.database.close()
+    return result["written"]
+
+
+def load_json(path: str, db: str) -> int:
+    from services.text_cleaning import parse_price
+    from services.migrations import conflict_target
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    conn = sqlite3.connect(db)
+    for item in data:
+        conn.execute(f"""
+        INSERT INTO food (name, category, price, image_url) VALUES (?, ?, ?, ?)
+        ON CONFLICT ({conflict_target("food")}) DO UPDATE SET price = excluded.price, image_url = excluded.image_url
+        """, (item.get("name"), item.get("category"),
+              parse_price(item.get("price")) if item.get("price") else None, item.get("image_url")))
+    conn.commit()
+    conn.close()
+    return len(data)
+
+
+def anon_rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1])
+    return 0
+
+
+def child(mode: str, path: str, db: str):
+    peak, done = [anon_rss_kb()], threading.Event()
+
+    def sample():
+        while not done.wait(0.05):
+            peak[0] = max(peak[0], anon_rss_kb())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    rows = load_json(path, db) if mode == "json-load" else load_stream(mode.split("-")[1], path, db)
+    seconds = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    peak[0] = max(peak[0], anon_rss_kb())
+    print(json.dumps({"rows": rows, "seconds": seconds, "peak_rss_mb": peak[0] / 1024}))
+
+
+# -------------------- Parent --------------------
+def fresh_database(workdir: str) -> str:
+    from services import crud
+    from services.database import Database
+    from services.migrations import migrate
+
+    path = os.path.join(workdir, "catalog.db")
+    shutil.copyfile(DATABASE_PATH, path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    migrate(conn)
+    conn.execute("BEGIN")
+    crud.food_table.create_search_index(conn)
+    conn.execute("COMMIT")
+    conn.close()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--modes", default="stream-csv,stream-ndjson,json-load")
+    parser.add_argument("--child", nargs=3, metavar=("MODE", "FILE", "DB"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench-import-")
+    try:
+        print(f"Generating {args.rows} synthetic food rows...")
+        paths = write_files(workdir, args.rows)
+        for fmt, path in paths.items():
+            print(f"  {fmt:<7}{os.path.getsize(path) / 1e6:>8.1f} MB")
+
+        print(f"\n{'mode':<16}{'rows':>10}{'seconds':>10}{'rows/s':>10}{'peak anon MB':>14}")
+        for mode in args.modes.split(","):
+            path = paths["json" if mode == "json-load" else mode.split("-")[1]]
+            db = fresh_database(workdir)
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, path, db],
+                                 cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                 capture_output=True, text=True)
+            lines = out.stdout.strip().splitlines()
+            if out.returncode != 0 or not lines:
+                print(f"{mode:<16} failed:\n{out.stderr[-2000:]}")
+                continue
+            r = json.loads(lines[-1])
+            print(f"{mode:<16}{r['rows']:>10}{r['seconds']:>10.1f}{r['rows'] / r['seconds']:>10.0f}{r['peak_rss_mb']:>14.0f}")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db + suffix):
+                    os.remove(db + suffix)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
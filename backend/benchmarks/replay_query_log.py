@@ -0,0 +1,127 @@
+"""
+Replay a sampled query log against a running server and report throughput and latency.
+
+Queries are sent to /chat/ in log order, keeping the original inter-arrival gaps
+divided by --speedup (0 sends as fast as the workers allow). Each logged session
+keeps its own session id and client address, so follow-up reuse, session caches
+and per-client rate limits behave as they did in production.
+
+Record a log with QUERY_LOG_ENABLED=true (and QUERY_LOG_SAMPLE_RATE), then start a
+local server on the fake LLM so replays are free and repeatable:
+
+    LLM_PROVIDER=fake CHAT_RATE_PER_MINUTE=100000 uvicorn main:app --port 8000
+
+and, from the backend directory:
+
+    python benchmarks/replay_query_log.py logs/query_log.jsonl --speedup 10 --concurrency 8
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+import httpx
+import numpy as np
+
+
+def load_records(path: str, limit: int = 0):
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            records.append(json.loads(line))
+            if limit and len(records) >= limit:
+                break
+    records.sort(key=lambda r: r["ts"])
+    return records
+
+
+def replay(records, url: str, speedup: float, concurrency: int, session_prefix: str, timeout: float):
+    jobs = queue.Queue()
+    for record in records:
+        jobs.put(record)
+
+    first_ts = records[0]["ts"]
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def worker():
+        with httpx.Client(base_url=url, timeout=timeout) as client:
+            while True:
+                try:
+                    record = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                if speedup > 0:
+                    delay = (record["ts"] - first_ts) / speedup - (time.perf_counter() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+
+                session_id = f"{session_prefix}{record['session_id']}"
+                sent = time.perf_counter()
+                try:
+                    response = client.post(
+                        "/chat/",
+                        json={"message": record["query"], "session_id": session_id},
+                        headers={"X-Forwarded-For": f"replay-{record['session_id']}"},
+                    )
+                    status = str(response.status_code)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                elapsed_ms = (time.perf_counter() - sent) * 1000
+                with lock:
+                    statuses[status] += 1
+                    if status == "200":
+                        latencies.append(elapsed_ms)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", nargs="?", default=os.path.join("logs", "query_log.jsonl"))
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--speedup", type=float, default=1.0, help="Divide recorded gaps by this (0 = no pacing)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=0, help="Replay only the first N records")
+    parser.add_argument("--session-prefix", default="replay-", help="Prefix for replayed session ids")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    records = load_records(args.log, args.limit)
+    if not records:
+        print(f"No records in {args.log}")
+        return
+
+    span = records[-1]["ts"] - records[0]["ts"]
+    print(f"Replaying {len(records)} queries recorded over {span:.0f}s against {args.url} "
+          f"(speedup {args.speedup or 'max'}, concurrency {args.concurrency})")
+    latencies, statuses, wall = replay(records, args.url, args.speedup, args.concurrency,
+                                       args.session_prefix, args.timeout)
+
+    print(f"\nstatuses: {dict(statuses)}")
+    print(f"throughput: {sum(statuses.values()) / wall:.2f} req/s over {wall:.1f}s")
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"latency ms: p50 {p50:.0f}  p95 {p95:.0f}  p99 {p99:.0f}  max {max(latencies):.0f}")
+
+    recorded = [r["latency_ms"] for r in records if r.get("status") == 200 and "latency_ms" in r]
+    if recorded:
+        p50, p95, p99 = np.percentile(recorded, [50, 95, 99])
+        print(f"recorded ms: p50 {p50:.0f}  p95 {p95:.0f}  p99 {p99:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
 import os
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI 
-from langchain_community.utilities import SQLDatabase
 
 load_dotenv()
 
+# "full" serves chat, embeddings and CRUD; "crud" serves only the CRUD and admin routers
+# and never imports the ML / LLM stack
+APP_MODE = os.getenv("APP_MODE", "full").lower()
+
 DATA_DIR = "data"
 DRINKWARE_JSON = os.path.join(DATA_DIR, "drinkware.json")
 OUTLETS_JSON = os.path.join(DATA_DIR, "outlets.json")
@@ -12,18 +14,157 @@ OUTLETS_JSON = os.path.join(DATA_DIR, "outlets.json")
 DATABASE_DIR = "database"
 DATABASE_PATH = os.path.join(DATABASE_DIR, "zus_coffee_internal.db")
 
+# Shared SQLite pool (services/database.py): read-only connections for queries, one writer
+# per worker, WAL journal. cache size is in KiB, mmap size in bytes
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Writes go through one writer thread per worker that group-commits whatever arrives within
+# the window (up to DB_WRITE_MAX_BATCH writes per transaction)
+DB_WRITE_WINDOW_MS = float(os.getenv("DB_WRITE_WINDOW_MS", "2"))
+DB_WRITE_MAX_BATCH = int(os.getenv("DB_WRITE_MAX_BATCH", "64"))
+DB_WRITE_MAX_QUEUE = int(os.getenv("DB_WRITE_MAX_QUEUE", "1000"))
+DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "10"))
+# How long a catalog table's row count is reused for paginated listings (this worker's
+# own writes refresh it immediately)
+CATALOG_COUNT_TTL = float(os.getenv("CATALOG_COUNT_TTL", "30"))
+# Most creates + updates + deletes accepted by one /<entity>/batch/ request (one write transaction)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "5000"))
+# Conditional GETs on the catalog: how long a worker trusts its copy of the table versions
+# (its own writes refresh it immediately) and the Cache-Control sent with the ETags
+CATALOG_VERSION_TTL = float(os.getenv("CATALOG_VERSION_TTL", "1"))
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "no-cache")
+# In-memory catalog cache (per worker): table rows kept per catalog version, and up to
+# CATALOG_CACHE_RESPONSES serialized GET responses per table
+CATALOG_CACHE_ENABLED = os.getenv("CATALOG_CACHE_ENABLED", "true").lower() == "true"
+CATALOG_CACHE_RESPONSES = int(os.getenv("CATALOG_CACHE_RESPONSES", "256"))
+# Rows per transaction for streamed admin imports (also the most rows held in memory)
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "1000"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+
 FAISS_INDEX_PATH = os.path.join(DATA_DIR, "zus_embeddings.index")
 PKL_PATH = os.path.join(DATA_DIR, "zus_embeddings.pkl")
 META_PATH = os.path.join(DATA_DIR, "faiss_meta.pkl")
 
 EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
 
+# Offline model artifact built by `python services/artifacts.py build`. When set, the embedding
+# model, tokenizer, FAISS index and metadata load only from this directory and the
+# Hugging Face Hub is never contacted
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", "")
+EMBEDDING_MODEL_SOURCE = EMBEDDING_MODEL
+if ARTIFACT_DIR:
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    EMBEDDING_MODEL_SOURCE = os.path.join(ARTIFACT_DIR, "model")
+    FAISS_INDEX_PATH = os.path.join(ARTIFACT_DIR, "zus_embeddings.index")
+    META_PATH = os.path.join(ARTIFACT_DIR, "faiss_meta.pkl")
 
-def get_llm():
+# "google" for Gemini, "fake" for the deterministic local stand-in (benchmarks, offline runs)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "google").lower()
+
+# Model tiers: the small model writes RAG summaries, the large one runs the agent and takes escalations
+LLM_MODEL_SMALL = os.getenv("LLM_MODEL_SMALL", "gemini-2.5-flash-lite")
+LLM_MODEL_LARGE = os.getenv("LLM_MODEL_LARGE", "gemini-2.5-flash")
+LLM_SUMMARY_TIER = os.getenv("LLM_SUMMARY_TIER", "small").lower()
+LLM_AGENT_TIER = os.getenv("LLM_AGENT_TIER", "large").lower()
+# Summaries escalate to the large tier above this prompt size or below this top retrieval score
+SMALL_TIER_MAX_PROMPT_CHARS = int(os.getenv("SMALL_TIER_MAX_PROMPT_CHARS", "6000"))
+ESCALATE_BELOW_SCORE = float(os.getenv("ESCALATE_BELOW_SCORE", "0.3"))
+
+# Token accounting: USD per million tokens as "input,output" for each tier's model,
+# and an optional per-session token budget (0 = unlimited)
+LLM_SMALL_PRICE = os.getenv("LLM_SMALL_PRICE", "0.10,0.40")
+LLM_LARGE_PRICE = os.getenv("LLM_LARGE_PRICE", "0.30,2.50")
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "0"))
+TOKEN_USAGE_SESSIONS = int(os.getenv("TOKEN_USAGE_SESSIONS", "10000"))
+
+# What zus_rag_search returns to the agent: "summary" (LLM-written) or "raw" (compact hits)
+RAG_TOOL_MODE = os.getenv("RAG_TOOL_MODE", "summary").lower()
+
+# Chat session storage: "memory" (single worker only), "sqlite" or "redis"
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(DATABASE_DIR, "chat_sessions.db"))
+SESSION_REDIS_URL = os.getenv("SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "86400"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "256"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "1.0"))
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "0.05"))
+
+# Embedding-based intent router in front of the agent
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+INTENT_ROUTER_THRESHOLD = float(os.getenv("INTENT_ROUTER_THRESHOLD", "0.45"))
+
+# Speculative retrieval of the user message while the agent's first LLM call runs
+SPECULATIVE_RETRIEVAL_ENABLED = os.getenv("SPECULATIVE_RETRIEVAL_ENABLED", "true").lower() == "true"
+SPECULATION_SIMILARITY = float(os.getenv("SPECULATION_SIMILARITY", "0.6"))
+
+# LLM deadlines, timeouts, hedging and circuit breaker
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "25"))
+LLM_CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "15"))
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER")) if os.getenv("LLM_HEDGE_AFTER") else None
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+LLM_MAX_WORKERS = int(os.getenv("LLM_MAX_WORKERS", "32"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+# Admission control: per-client token buckets and bounded queues for model-bound work
+CHAT_RATE_PER_MINUTE = float(os.getenv("CHAT_RATE_PER_MINUTE", "20"))
+CHAT_BURST = int(os.getenv("CHAT_BURST", "5"))
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "8"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+EMBEDDINGS_RATE_PER_MINUTE = float(os.getenv("EMBEDDINGS_RATE_PER_MINUTE", "6"))
+EMBEDDINGS_BURST = int(os.getenv("EMBEDDINGS_BURST", "2"))
+EMBEDDINGS_MAX_CONCURRENT = int(os.getenv("EMBEDDINGS_MAX_CONCURRENT", "1"))
+EMBEDDINGS_MAX_QUEUE = int(os.getenv("EMBEDDINGS_MAX_QUEUE", "2"))
+# Peers (IPs or CIDRs, comma-separated) whose X-Forwarded-For is believed when keying
+# rate limits; empty means the socket peer is always the client
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")
+
+# Opt-in sampled query log (JSON Lines) for traffic replay, see benchmarks/replay_query_log.py
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "false").lower() == "true"
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", os.path.join("logs", "query_log.jsonl"))
+QUERY_LOG_SAMPLE_RATE = float(os.getenv("QUERY_LOG_SAMPLE_RATE", "0.1"))
+QUERY_LOG_FLUSH_INTERVAL = float(os.getenv("QUERY_LOG_FLUSH_INTERVAL", "1.0"))
+QUERY_LOG_MAX_PENDING = int(os.getenv("QUERY_LOG_MAX_PENDING", "10000"))
+
+# Sessions whose previous-turn hits are kept for follow-up questions
+RETRIEVAL_CACHE_SESSIONS = int(os.getenv("RETRIEVAL_CACHE_SESSIONS", "1024"))
+
+
+def build_llm(model: str, callbacks=None):
+    """
+    Chat model client for one model name. With LLM_PROVIDER=fake, the small tier gets a
+    faster local stand-in so tier routing can be exercised offline.
+    """
+    if LLM_PROVIDER == "fake":
+        from services.fake_llm import FakeChatModel
+        if model == LLM_MODEL_SMALL:
+            return FakeChatModel(model_name=f"fake-{model}", base_latency=0.02,
+                                 seconds_per_output_token=0.0008, callbacks=callbacks)
+        return FakeChatModel(model_name=f"fake-{model}", callbacks=callbacks)
+    from langchain_google_genai import ChatGoogleGenerativeAI
     return ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash", # Fast and free-tier eligible
+        model=model,
         temperature=0,
-        google_api_key=os.getenv("GOOGLE_API_KEY")
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        timeout=LLM_CALL_TIMEOUT,
+        max_retries=LLM_MAX_RETRIES,
+        callbacks=callbacks
     )
 
-llm = get_llm()
+def get_llm():
+    return build_llm(LLM_MODEL_LARGE)
+
+_llm = None
+
+def __getattr__(name):
+    # `dependencies.llm` is built on first access rather than at import time
+    global _llm
+    if name == "llm":
+        if _llm is None:
+            _llm = get_llm()
+        return _llm
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
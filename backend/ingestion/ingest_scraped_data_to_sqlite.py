@@ -1,7 +1,12 @@
 import os
+import sys
 import json
 import sqlite3
-import re
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.migrations import upgrade, conflict_target
+from services.text_cleaning import parse_price, repair_text
 
 # -------------------- Config --------------------
 DATA_DIR = "backend/data"
@@ -68,7 +73,22 @@ def create_database():
     )
     """)
 
+    # Embedding metadata (filled by ingest_data_into_faiss_embeddings.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS embedding_metadata (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        item_type TEXT,
+        item_index INTEGER,
+        text TEXT
+    )
+    """)
+
     conn.commit()
+
+    # Indexes and unique natural keys, so re-ingesting updates rows instead of duplicating them
+    conn.isolation_level = None
+    for name in upgrade(conn):
+        print(f"Applied migration {name}")
     conn.close()
     print("Database and tables are ready!")
 
@@ -77,13 +97,6 @@ def load_json(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def parse_price(price_str):
-    """Extract numeric price from a string like 'Sale priceRM79.00'."""
-    if not price_str:
-        return 0.0
-    match = re.search(r"(\d+(\.\d+)?)", price_str)
-    return float(match.group(1)) if match else 0.0
-
 def ingest_drinkware(data):
     """Ingest drinkware/products data into SQLite."""
     conn = sqlite3.connect(DATABASE_PATH)
@@ -92,10 +105,13 @@ def ingest_drinkware(data):
         cursor.execute("""
         INSERT INTO drinkware (name, link, category, price, image_url)
         VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (link) DO UPDATE SET
+            name = excluded.name, category = excluded.category,
+            price = excluded.price, image_url = excluded.image_url
         """, (
-            item.get("name"),
+            repair_text(item.get("name")),
             item.get("link"),
-            item.get("category"),
+            repair_text(item.get("category")),
             parse_price(item.get("price")),
             item.get("image_url")
         ))
@@ -108,13 +124,15 @@ def ingest_outlets(data):
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
     for outlet in data:
-        cursor.execute("""
+        cursor.execute(f"""
         INSERT INTO outlets (name, category, address, maps_url)
         VALUES (?, ?, ?, ?)
+        ON CONFLICT ({conflict_target("outlets")}) DO UPDATE SET
+            category = excluded.category, maps_url = excluded.maps_url
         """, (
-            outlet.get("name"),
-            outlet.get("category"),
-            outlet.get("address"),
+            repair_text(outlet.get("name")),
+            repair_text(outlet.get("category")),
+            repair_text(outlet.get("address")),
             outlet.get("maps_url")
         ))
     conn.commit()
@@ -126,12 +144,14 @@ def ingest_food(data):
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
     for item in data:
-        cursor.execute("""
+        cursor.execute(f"""
         INSERT INTO food (name, category, price, image_url)
         VALUES (?, ?, ?, ?)
+        ON CONFLICT ({conflict_target("food")}) DO UPDATE SET
+            price = excluded.price, image_url = excluded.image_url
         """, (
-            item.get("name"),
-            item.get("category"),
+            repair_text(item.get("name")),
+            repair_text(item.get("category")),
             parse_price(item.get("price")) if item.get("price") else None,
             item.get("image_url")
         ))
@@ -144,12 +164,14 @@ def ingest_drinks(data):
     conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
     for item in data:
-        cursor.execute("""
+        cursor.execute(f"""
         INSERT INTO drinks (name, category, price, image_url)
         VALUES (?, ?, ?, ?)
+        ON CONFLICT ({conflict_target("drinks")}) DO UPDATE SET
+            price = excluded.price, image_url = excluded.image_url
         """, (
-            item.get("name"),
-            item.get("category"),
+            repair_text(item.get("name")),
+            repair_text(item.get("category")),
             parse_price(item.get("price")) if item.get("price") else None,
             item.get("image_url")
         ))
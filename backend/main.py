@@ -1,45 +1,68 @@
+import asyncio
 import os
 import pickle
+import time
+import threading
+import importlib
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from sentence_transformers import SentenceTransformer
-import faiss
 
-from routers import products, outlets, food, drinks, chat, embeddings, admin
-from dependencies import DATA_DIR, DATABASE_DIR, DATABASE_PATH, OUTLETS_JSON, DRINKWARE_JSON, PKL_PATH, META_PATH, EMBEDDING_MODEL, FAISS_INDEX_PATH
+from routers import products, outlets, food, drinks, admin
+from services import metrics, artifacts
+from services.readiness import readiness
+from services.database import database
+from services.crud import ensure_search_indexes
+from services.migrations import run_migrations
+from dependencies import META_PATH, INTENT_ROUTER_ENABLED, APP_MODE, ARTIFACT_DIR
+
+# CRUD-only workers skip the chat and embeddings routers, and with them torch,
+# sentence-transformers, FAISS and LangChain
+CRUD_ONLY = APP_MODE == "crud"
+if not CRUD_ONLY:
+    from routers import chat, embeddings
 
 # Global dictionary to hold ML models
 ml_models = {}
 
-# ==============================
-# Lifespan context manager (replaces deprecated on_event)
-# ==============================
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Startup: Load ML models
+# Probe query used to warm up the embedding model and FAISS before reporting ready
+WARMUP_QUERY = "iced spanish latte"
+
+def load_meta():
+    with open(META_PATH, "rb") as f:
+        return pickle.load(f)
+
+def load_and_warm_up():
+    """
+    Load heavy assets in the background, then run one real encode + FAISS search
+    (paying torch's lazy initialization here instead of on the first user query).
+    Readiness flips only when all of it succeeded.
+    """
     try:
-        print("Loading SentenceTransformer model...")
-        ml_models["embed_model"] = SentenceTransformer(EMBEDDING_MODEL)
-        print("SentenceTransformer loaded.")
+        if ARTIFACT_DIR:
+            # Offline bundle: refuse to start from a missing or incomplete artifact
+            manifest = readiness.load("artifact", lambda: artifacts.check(ARTIFACT_DIR))
+            print(f"Using model artifact {manifest['version']} from {ARTIFACT_DIR}")
 
-        # Define paths relative to backend directory
-        faiss_index_path = FAISS_INDEX_PATH
-        meta_path = META_PATH
+        # Shared with the RAG service so the model and index are only held once
+        ml_models["embed_model"] = readiness.load("embed_model", lambda: chat.rag_service.embed_model)
+        ml_models["faiss_index"] = readiness.load("faiss_index", lambda: chat.rag_service.faiss_index)
 
-        if os.path.exists(faiss_index_path):
-            ml_models["faiss_index"] = faiss.read_index(faiss_index_path)
-            print("FAISS index loaded.")
+        if os.path.exists(META_PATH):
+            ml_models["meta"] = readiness.load("meta", load_meta)
         else:
-            print(f"⚠️ FAISS index not found at {faiss_index_path}")
+            print(f"⚠️ Meta file not found at {META_PATH}")
 
-        if os.path.exists(meta_path):
-            with open(meta_path, "rb") as f:
-                ml_models["meta"] = pickle.load(f)
-            print("Meta loaded.")
-        else:
-            print(f"⚠️ Meta file not found at {meta_path}")
+        readiness.load("warmup_search", lambda: chat.rag_service.search(WARMUP_QUERY, top_k=1))
+        if INTENT_ROUTER_ENABLED:
+            readiness.load("intent_router", chat.get_intent_router)
 
+        # Deferred at import time; paid here rather than by the first agent turn
+        readiness.load("agent", lambda: importlib.import_module("agent.brain"))
+        readiness.load("llm_client", chat.get_agent_llm)
+
+        readiness.mark_ready()
         print("✅ All models loaded successfully.")
 
     except Exception as e:
@@ -47,9 +70,28 @@ async def lifespan(app: FastAPI):
         import traceback
         traceback.print_exc()
 
+# ==============================
+# Lifespan context manager (replaces deprecated on_event)
+# ==============================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: load ML models in the background so the process is live immediately;
+    # /health/ready reports when they are usable
+    # Schema migrations, then the full-text search indexes, once per start on the writer
+    await asyncio.to_thread(run_migrations)
+    await asyncio.to_thread(ensure_search_indexes)
+    if CRUD_ONLY:
+        readiness.mark_ready()
+    else:
+        threading.Thread(target=load_and_warm_up, name="warm-up", daemon=True).start()
+
     yield  # Application runs here
 
     # Shutdown: Cleanup (optional)
+    if not CRUD_ONLY:
+        chat.session_store.close()
+        chat.query_log.close()
+    database.close()
     ml_models.clear()
     print("🔄 ML models cleared from memory.")
 
@@ -82,13 +124,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ==============================
+# Request timing and per-request spans
+# ==============================
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    # Span timings are collected only when asked for, e.g. `X-Debug-Timings: 1`
+    spans = [] if request.headers.get("x-debug-timings") else None
+    metrics.request_spans.set(spans)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        metrics.ERRORS.inc("http_unhandled")
+        raise
+    elapsed = time.perf_counter() - start
+
+    # Label by endpoint function name (unique across routers) to keep cardinality bounded
+    route = request.scope.get("route")
+    metrics.REQUEST_SECONDS.labels(request.method, route.name if route else "unmatched").observe(elapsed)
+    if response.status_code >= 500:
+        metrics.ERRORS.inc("http_5xx")
+    if spans is not None:
+        spans.append(("request", elapsed))
+        response.headers["Server-Timing"] = metrics.server_timing(spans)
+    return response
+
 # Include routers
 app.include_router(products.router, prefix="/products", tags=["Products"])
 app.include_router(outlets.router, prefix="/outlets", tags=["Outlets"])
 app.include_router(food.router, prefix="/food", tags=["Food"])
 app.include_router(drinks.router, prefix="/drinks", tags=["Drinks"])
-app.include_router(chat.router, prefix="/chat", tags=["Chat"])
-app.include_router(embeddings.router, prefix="/embeddings", tags=["Embeddings"])
+if not CRUD_ONLY:
+    app.include_router(chat.router, prefix="/chat", tags=["Chat"])
+    app.include_router(embeddings.router, prefix="/embeddings", tags=["Embeddings"])
 app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
 # ==============================
@@ -97,3 +166,24 @@ app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 @app.get("/")
 def root():
     return {"message": "ZUS Coffee Internal Assistant API is running"}
+
+# ==============================
+# Prometheus metrics
+# ==============================
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# ==============================
+# Liveness and readiness probes
+# ==============================
+@app.get("/health/live")
+def liveness():
+    """The process is up and serving requests."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness_probe():
+    """Ready once models are loaded and warmed up; 503 until then, with per-asset load timings."""
+    status = readiness.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi import APIRouter, HTTPException, Request, Response, Depends
 from pydantic import BaseModel
+from typing import Optional
 import os
 
+from services.token_usage import token_ledger
+from services.database import database
+from services.importer import importer, import_format
+from services.catalog_cache import catalog_cache
+
 router = APIRouter()
 
 # Admin password from environment variable or default
@@ -40,4 +46,40 @@ async def check_auth(request: Request):
     if admin_session == "authenticated":
         return {"authenticated": True}
     else:
-        raise HTTPException(status_code=401, detail="Not authenticated")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+def require_admin(request: Request):
+    """Dependency for admin-only endpoints"""
+    if request.cookies.get("admin_session") != "authenticated":
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+@router.get("/usage", dependencies=[Depends(require_admin)])
+async def get_token_usage():
+    """LLM token usage and estimated cost per endpoint and per model"""
+    return token_ledger.stats()
+
+@router.get("/usage/{session_id}", dependencies=[Depends(require_admin)])
+async def get_session_token_usage(session_id: str):
+    """LLM token usage, estimated cost and remaining budget for one chat session"""
+    return token_ledger.session_stats(session_id)
+
+@router.get("/db", dependencies=[Depends(require_admin)])
+async def get_db_pool_stats():
+    """Connection pool usage for the catalog database (per worker)"""
+    return database.stats()
+
+@router.get("/cache", dependencies=[Depends(require_admin)])
+async def get_catalog_cache_stats():
+    """Catalog cache hit ratio, snapshot versions and memory per table (per worker)"""
+    return catalog_cache.stats()
+
+@router.post("/import/{entity}", dependencies=[Depends(require_admin)])
+async def import_catalog(entity: str, request: Request, format: Optional[str] = None):
+    """Stream a CSV or NDJSON body into a catalog table, upserting on its natural key"""
+    fmt = import_format(request.headers.get("content-type"), format)
+    return await importer.run(entity, fmt, request.stream())
+
+@router.get("/imports", dependencies=[Depends(require_admin)])
+async def get_imports():
+    """Progress of running imports and the most recent finished ones (per worker)"""
+    return importer.stats()
@@ -1,40 +1,138 @@
+import threading
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict
+from typing import List
 from schemas import ChatRequest, ChatResponse, ChatMessage
-from agent.brain import create_agent_instance
-from dependencies import get_llm
+from agent.tools import rag_service, speculative_retriever, conversation_cache
+from dependencies import INTENT_ROUTER_ENABLED, SPECULATIVE_RETRIEVAL_ENABLED, CHAT_DEADLINE_SECONDS
+from services.session_store import create_session_store
+from services.retrieval_cache import current_session_id
+from services.intent_router import IntentRouter, DIRECT_INTENTS, CHITCHAT, looks_like_follow_up
+from services.rag_service import format_fallback_answer, NO_MATCH_MESSAGE
+from services.resilience import (
+    call_with_resilience, start_deadline, record_request, mark_fallback, LLMUnavailableError, agent_executor
+)
+from services import resilience
+from services import admission
+from services.model_router import model_router, get_agent_llm
+from services.token_usage import token_ledger
+from services.query_log import query_log
+from services.admission import chat_rate_limiter, llm_slot, limit_chat_clients
 
 router = APIRouter()
 
-# In-memory session storage (use Redis in production)
-chat_sessions: Dict[str, List[ChatMessage]] = {}
+# Session storage shared by all workers (see SESSION_BACKEND in dependencies)
+session_store = create_session_store()
+
+# Intent router is built on first use so prototype encoding doesn't slow down startup
+intent_router = None
+_intent_router_lock = threading.Lock()
+
+def get_intent_router() -> IntentRouter:
+    global intent_router
+    if intent_router is None:
+        with _intent_router_lock:
+            if intent_router is None:
+                intent_router = IntentRouter(rag_service.embed_model)
+    return intent_router
+
+def extract_agent_response(result) -> str:
+    """
+    Get the final answer text from the agent result's last message.
+    """
+    result_messages = result.get("messages", [])
+    if result_messages:
+        last_message = result_messages[-1]
+        if hasattr(last_message, 'content'):
+            response_text = last_message.content
+        else:
+            response_text = str(last_message)
+    else:
+        response_text = "I'm sorry, I couldn't process that request."
+    
+    # Handle list content format (e.g., Claude)
+    if isinstance(response_text, list):
+        text_parts = []
+        for item in response_text:
+            if isinstance(item, dict) and item.get('type') == 'text':
+                text_parts.append(item.get('text', ''))
+            elif isinstance(item, str):
+                text_parts.append(item)
+        return ' '.join(text_parts).strip()
+    return str(response_text)
+
+def retrieval_only_answer(message: str, follow_up: bool) -> str:
+    """
+    Fallback answer built from hits alone, reusing speculative or cached hits when available.
+    """
+    hits = conversation_cache.resolve_follow_up(message) if follow_up else None
+    if hits is None:
+        hits = speculative_retriever.claim(message)
+    if hits is None:
+        hits = rag_service.search(message)
+    return format_fallback_answer(hits) if hits else NO_MATCH_MESSAGE
 
 # ==================== Chat with Agent ====================
-@router.post("/", response_model=ChatResponse)
-async def chat_with_agent(request: ChatRequest, llm=Depends(get_llm)):
+@router.post("/", response_model=ChatResponse, dependencies=[Depends(limit_chat_clients)])
+def chat_with_agent(request: ChatRequest, llm=Depends(get_agent_llm), slot=Depends(llm_slot)):
     """
     Chat endpoint that uses a ReAct agent with RAG tool.
+    Runs in FastAPI's threadpool since the agent and model calls block; requests wait for
+    an LLM admission slot on the event loop first, so queued ones hold no thread.
     
     Flow:
     1. User sends a message
-    2. Agent receives the message and decides whether to use the RAG tool
-    3. RAG tool searches FAISS embeddings for accurate internal data
-    4. Agent formats and returns the response
+    2. Intent router sends confident catalog/outlet questions straight to RAG (one LLM call)
+    3. Otherwise the agent receives the message and decides whether to use the RAG tool
+    4. RAG tool searches FAISS embeddings for accurate internal data
+    5. Agent formats and returns the response
     
     This ensures all product/outlet queries use embeddings, not LLM general knowledge.
     """
+    session_id = request.session_id or "default"
+    chat_rate_limiter.check(f"session:{session_id}")
+    token_ledger.check_budget(session_id)
+    
+    # Bounded concurrency for LLM-bound work (llm_slot); the deadline starts once admitted
+    deadline = start_deadline(CHAT_DEADLINE_SECONDS, on_abandon=slot.hold)
+    usage = token_ledger.start_request("chat", session_id)
+    log_record = query_log.start(request.message, session_id)
+    status = 200
     try:
-        session_id = request.session_id or "default"
+        current_session_id.set(session_id)
         
-        # Get or create session history
-        if session_id not in chat_sessions:
-            chat_sessions[session_id] = []
-        
-        # Add user message to history
+        # Load session history and add the current user message
+        history = session_store.get(session_id)
         user_message = ChatMessage(role="user", content=request.message)
-        chat_sessions[session_id].append(user_message)
         
-        # Create agent with LLM
+        # Fast path: skip the agent's tool-decision call for catalog/outlet questions
+        label, embedding = None, None
+        follow_up = looks_like_follow_up(request.message, bool(history))
+        if INTENT_ROUTER_ENABLED and not follow_up:
+            intents = get_intent_router()
+            label, score, embedding = intents.classify(request.message)
+            if label in DIRECT_INTENTS:
+                usage.endpoint = "chat_direct"
+                result = rag_service.search_and_summarize(
+                    query=request.message, top_k=5, query_embedding=embedding
+                )
+                query_log.annotate(cache="direct", hits=result["hits"], path="direct", intent=label)
+                intents.record_direct()
+                conversation_cache.remember(result["hits"], session_id)
+                response_text = result["summary"]
+                assistant_message = ChatMessage(role="assistant", content=response_text)
+                session_store.append(session_id, [user_message.model_dump(), assistant_message.model_dump()])
+                return ChatResponse(response=response_text, session_id=session_id)
+        
+        history.append(user_message.model_dump())
+        query_log.annotate(path="agent", intent=label, follow_up=follow_up)
+        
+        # Start retrieving for the user message while the agent's first LLM call decides on the tool
+        speculation = None
+        if SPECULATIVE_RETRIEVAL_ENABLED and label != CHITCHAT and not follow_up:
+            speculation = speculative_retriever.start(request.message, top_k=5, query_embedding=embedding)
+        
+        # Create agent with LLM (langchain.agents is imported on the first agent turn)
+        from agent.brain import create_agent_instance
         agent = create_agent_instance(llm)
         
         # Prepare messages for agent (convert to LangChain message format)
@@ -42,66 +140,99 @@ async def chat_with_agent(request: ChatRequest, llm=Depends(get_llm)):
         
         messages = []
         # Include all chat history including current message
-        for msg in chat_sessions[session_id]:
-            if msg.role == "user":
-                messages.append(HumanMessage(content=msg.content))
-            elif msg.role == "assistant":
-                messages.append(AIMessage(content=msg.content))
-        
-        # Invoke agent with messages format - it will automatically call the RAG tool when needed
-        result = agent.invoke({"messages": messages})
+        for msg in history:
+            if msg["role"] == "user":
+                messages.append(HumanMessage(content=msg["content"]))
+            elif msg["role"] == "assistant":
+                messages.append(AIMessage(content=msg["content"]))
         
-        # Extract response from agent result - get last message content
-        result_messages = result.get("messages", [])
-        if result_messages:
-            last_message = result_messages[-1]
-            if hasattr(last_message, 'content'):
-                response_text = last_message.content
-            else:
-                response_text = str(last_message)
-        else:
-            response_text = "I'm sorry, I couldn't process that request."
+        # Invoke agent with messages format - it will automatically call the RAG tool when needed.
+        # The whole run is bounded by the request deadline; if the model is down or too slow,
+        # answer from retrieval alone.
+        try:
+            result = call_with_resilience(
+                agent.invoke, {"messages": messages}, timeout=deadline.remaining(), hedge_after=None,
+                executor=agent_executor
+            )
+            response_text = extract_agent_response(result)
+        except LLMUnavailableError as e:
+            print(f"Agent fallback: {e}")
+            mark_fallback()
+            response_text = retrieval_only_answer(request.message, follow_up)
+        finally:
+            speculative_retriever.finish(speculation)
         
-        # Handle list content format (e.g., Claude)
-        if isinstance(response_text, list):
-            text_parts = []
-            for item in response_text:
-                if isinstance(item, dict) and item.get('type') == 'text':
-                    text_parts.append(item.get('text', ''))
-                elif isinstance(item, str):
-                    text_parts.append(item)
-            response_text = ' '.join(text_parts).strip()
-        else:
-            response_text = str(response_text)
-        
-        # Add assistant response to history
+        # Persist the user message and assistant response together
         assistant_message = ChatMessage(role="assistant", content=response_text)
-        chat_sessions[session_id].append(assistant_message)
+        session_store.append(session_id, [user_message.model_dump(), assistant_message.model_dump()])
         
         return ChatResponse(response=response_text, session_id=session_id)
         
+    except HTTPException as e:
+        status = e.status_code
+        raise
     except Exception as e:
+        status = 500
         print(f"Chat error: {e}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+    finally:
+        record_request(deadline)
+        token_ledger.finish(usage)
+        query_log.annotate(fallback=deadline.fell_back)
+        query_log.finish(log_record, status)
 
 # ==================== Get Chat History ====================
+# History endpoints are plain def: the session store does blocking SQLite/Redis I/O,
+# so FastAPI runs them in the threadpool instead of on the event loop
 @router.get("/history/{session_id}", response_model=List[ChatMessage])
-async def get_chat_history(session_id: str):
+def get_chat_history(session_id: str):
     """
     Retrieve chat history for a session.
     """
-    if session_id not in chat_sessions:
-        return []
-    return chat_sessions[session_id]
+    return [ChatMessage(**msg) for msg in session_store.get(session_id)]
 
 # ==================== Clear Chat History ====================
 @router.delete("/history/{session_id}")
-async def clear_chat_history(session_id: str):
+def clear_chat_history(session_id: str):
     """
     Clear chat history for a session.
     """
-    if session_id in chat_sessions:
-        del chat_sessions[session_id]
-    return {"message": f"Chat history for session '{session_id}' cleared."}
\ No newline at end of file
+    session_store.clear(session_id)
+    conversation_cache.forget(session_id)
+    return {"message": f"Chat history for session '{session_id}' cleared."}
+
+# ==================== Chat Stats ====================
+@router.get("/stats")
+async def get_chat_stats():
+    """
+    Runtime statistics for the chat pipeline (session cache, intent routing, speculation,
+    follow-up reuse, LLM breaker and fallbacks, admission control, model tiers).
+    """
+    stats = {}
+    if hasattr(session_store, "stats"):
+        stats["sessions"] = session_store.stats()
+    if intent_router is not None:
+        stats["intent_router"] = intent_router.stats()
+    stats["speculative_retrieval"] = speculative_retriever.stats()
+    stats["conversation_cache"] = conversation_cache.stats()
+    stats["resilience"] = resilience.stats()
+    stats["admission"] = admission.stats()
+    stats["model_tiers"] = model_router.stats()
+    stats["query_log"] = query_log.stats()
+    return stats
+
+@router.get("/router/eval")
+async def evaluate_intent_router():
+    """
+    Report intent router accuracy on the built-in labelled question set.
+    """
+    return get_intent_router().evaluate()
+
+@router.get("/stats/{session_id}")
+async def get_session_stats(session_id: str):
+    """
+    Follow-up retrieval cache statistics for one session.
+    """
+    return conversation_cache.session_stats(session_id)
@@ -1,12 +1,12 @@
-import sqlite3
-import faiss
 import pickle
 import numpy as np
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request, Depends
 from typing import Dict
 import os
 
 from schemas import ReindexResponse, IndexStatus
+from services.database import database
+from services.admission import embeddings_slot, limit_embeddings_clients
 
 router = APIRouter()
 
@@ -16,29 +16,23 @@ FAISS_INDEX_PATH = os.path.join("data", "faiss_index.faiss")
 META_PATH = os.path.join("data", "faiss_meta.pkl")
 
 # ==================== Helper Functions ====================
-def get_db_connection():
-    """Create a database connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
 def reindex_embeddings_task(embed_model, faiss_index_path, meta_path, db_path):
     """
     Background task to regenerate embeddings from the database.
     This should be called after CRUD operations to keep the vector store in sync.
     """
+    # Imported here so the API process only loads FAISS when it is needed
+    import faiss
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Fetch all products and outlets
-        cursor.execute("SELECT id, name, category, price, link FROM drinkware")
-        products = cursor.fetchall()
-        
-        cursor.execute("SELECT id, name, category, address FROM outlets")
-        outlets = cursor.fetchall()
-        
-        conn.close()
+        with database.read("embeddings") as conn:
+            cursor = conn.cursor()
+            
+            # Fetch all products and outlets
+            cursor.execute("SELECT id, name, category, price, link FROM drinkware")
+            products = cursor.fetchall()
+            
+            cursor.execute("SELECT id, name, category, address FROM outlets")
+            outlets = cursor.fetchall()
         
         # Prepare documents for embedding
         documents = []
@@ -87,18 +81,15 @@ def reindex_embeddings_task(embed_model, faiss_index_path, meta_path, db_path):
             pickle.dump(metadata, f)
         
         # Update embedding_metadata table
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM embedding_metadata")
-        
-        for idx, meta in enumerate(metadata):
-            cursor.execute(
+        # One write in the writer's next group commit, batched with any concurrent CRUD writes
+        def replace_metadata(conn):
+            conn.execute("DELETE FROM embedding_metadata")
+            conn.executemany(
                 "INSERT INTO embedding_metadata (item_type, item_index, text) VALUES (?, ?, ?)",
-                (meta["item_type"], meta["item_index"], meta["text"])
+                [(meta["item_type"], meta["item_index"], meta["text"]) for meta in metadata]
             )
         
-        conn.commit()
-        conn.close()
+        database.write(replace_metadata, "embeddings")
         
         print(f"✅ Reindexing complete. Total embeddings: {len(documents)}")
         return len(documents)
@@ -111,12 +102,18 @@ def reindex_embeddings_task(embed_model, faiss_index_path, meta_path, db_path):
 
 # ==================== Endpoints ====================
 
-@router.post("/reindex", response_model=ReindexResponse)
-async def reindex_embeddings(background_tasks: BackgroundTasks, request: Request):
+@router.post("/reindex", response_model=ReindexResponse,
+             dependencies=[Depends(limit_embeddings_clients), Depends(embeddings_slot)])
+def reindex_embeddings(background_tasks: BackgroundTasks, request: Request):
     """
     Regenerate all embeddings from the current database state.
     This should be called after creating, updating, or deleting products/outlets.
+    Runs in the threadpool once admitted by the embedding admission queue, since encoding blocks.
     """
+    return _reindex(request)
+
+def _reindex(request: Request):
+    import faiss
     try:
         # Get the embedding model from app state
         ml_models = request.app.state.ml_models
@@ -140,6 +137,8 @@ async def reindex_embeddings(background_tasks: BackgroundTasks, request: Request
             total_embeddings=total
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Reindex error: {e}")
         import traceback
@@ -1,171 +1,122 @@
-import sqlite3
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from typing import Optional, List
-import os
 
-from schemas import Outlet, OutletCreate, OutletUpdate
+from schemas import Outlet, OutletCreate, OutletUpdate, OutletBatchUpdate, Page, Batch, BatchResult
+from services.crud import outlets_table, conditional_get
+from services.catalog_cache import catalog_cache
 
 router = APIRouter()
 
-# Database path
-DB_PATH = os.path.join("database", "zus_coffee_internal.db")
-
 # ==================== Helper Functions ====================
-def get_db_connection():
-    """Create a database connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Reads are answered from the worker's catalog cache, which falls back to pooled read-only
+# connections; writes are single RETURNING statements submitted to the worker's
+# group-committing writer (services/crud.py, services/catalog_cache.py, services/database.py)
+outlets_cache = catalog_cache.register(outlets_table, Outlet)
+# GETs carry the table's version as an ETag; a matching If-None-Match is a 304 without a query
+check_etag = conditional_get(outlets_table)
 
 # ==================== Endpoints ====================
 
-@router.get("/", response_model=List[Outlet])
-def get_all_outlets(skip: int = 0, limit: int = 100):
+@router.get("/", response_model=List[Outlet], dependencies=[Depends(check_etag)])
+def get_all_outlets(response: Response, skip: int = 0, limit: int = 100):
     """
     Get all outlets with pagination.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM outlets LIMIT ? OFFSET ?", (limit, skip))
-        rows = cursor.fetchall()
-        conn.close()
-        
-        outlets = [dict(row) for row in rows]
-        return outlets
+        return outlets_cache.list(skip, limit, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching outlets: {str(e)}")
 
-@router.get("/{outlet_id}", response_model=Outlet)
-def get_outlet(outlet_id: int):
+@router.get("/page/", response_model=Page[Outlet], dependencies=[Depends(check_etag)])
+def get_outlets_page(
+    response: Response,
+    limit: int = Query(20, ge=1, le=500),
+    sort: str = "id",
+    order: str = "asc",
+    cursor: Optional[str] = None,
+    include_total: bool = False
+):
+    """
+    Get outlets one page at a time, sorted by id, name, category (asc or desc).
+    Pass next_cursor / prev_cursor back as `cursor` to move between pages.
+    """
+    try:
+        return outlets_cache.page(limit, sort, order, cursor, include_total, response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching outlets: {str(e)}")
+
+@router.get("/{outlet_id}", response_model=Outlet, dependencies=[Depends(check_etag)])
+def get_outlet(outlet_id: int, response: Response):
     """
     Get a specific outlet by ID.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM outlets WHERE id = ?", (outlet_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row is None:
-            raise HTTPException(status_code=404, detail="Outlet not found")
-        
-        return dict(row)
+        return outlets_cache.get(outlet_id, response)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching outlet: {str(e)}")
 
 @router.post("/", response_model=Outlet, status_code=201)
-def create_outlet(outlet: OutletCreate):
+async def create_outlet(outlet: OutletCreate):
     """
     Create a new outlet.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO outlets (name, category, address, maps_url)
-            VALUES (?, ?, ?, ?)
-            """,
-            (outlet.name, outlet.category, outlet.address, outlet.maps_url)
-        )
-        conn.commit()
-        outlet_id = cursor.lastrowid
-        
-        # Fetch the created outlet
-        cursor.execute("SELECT * FROM outlets WHERE id = ?", (outlet_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        return dict(row)
+        return await outlets_table.create(outlet.model_dump())
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating outlet: {str(e)}")
 
 @router.put("/{outlet_id}", response_model=Outlet)
-def update_outlet(outlet_id: int, outlet: OutletUpdate):
+async def update_outlet(outlet_id: int, outlet: OutletUpdate):
     """
     Update an existing outlet.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if outlet exists
-        cursor.execute("SELECT * FROM outlets WHERE id = ?", (outlet_id,))
-        existing = cursor.fetchone()
-        if existing is None:
-            conn.close()
-            raise HTTPException(status_code=404, detail="Outlet not found")
-        
-        # Build dynamic update query based on provided fields
-        update_fields = []
-        values = []
-        
-        if outlet.name is not None:
-            update_fields.append("name = ?")
-            values.append(outlet.name)
-        if outlet.category is not None:
-            update_fields.append("category = ?")
-            values.append(outlet.category)
-        if outlet.address is not None:
-            update_fields.append("address = ?")
-            values.append(outlet.address)
-        if outlet.maps_url is not None:
-            update_fields.append("maps_url = ?")
-            values.append(outlet.maps_url)
-        
-        if not update_fields:
-            conn.close()
-            raise HTTPException(status_code=400, detail="No fields to update")
-        
-        values.append(outlet_id)
-        query = f"UPDATE outlets SET {', '.join(update_fields)} WHERE id = ?"
-        
-        cursor.execute(query, values)
-        conn.commit()
-        
-        # Fetch updated outlet
-        cursor.execute("SELECT * FROM outlets WHERE id = ?", (outlet_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        return dict(row)
+        return await outlets_table.modify(outlet_id, outlet.model_dump(exclude_none=True))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error updating outlet: {str(e)}")
 
 @router.delete("/{outlet_id}", status_code=204)
-def delete_outlet(outlet_id: int):
+async def delete_outlet(outlet_id: int):
     """
     Delete an outlet.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if outlet exists
-        cursor.execute("SELECT * FROM outlets WHERE id = ?", (outlet_id,))
-        existing = cursor.fetchone()
-        if existing is None:
-            conn.close()
-            raise HTTPException(status_code=404, detail="Outlet not found")
-        
-        cursor.execute("DELETE FROM outlets WHERE id = ?", (outlet_id,))
-        conn.commit()
-        conn.close()
-        
+        await outlets_table.remove(outlet_id)
         return None
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting outlet: {str(e)}")
 
-@router.get("/search/", response_model=List[Outlet])
+@router.post("/batch/", response_model=BatchResult[Outlet])
+async def batch_outlets(batch: Batch[OutletCreate, OutletBatchUpdate]):
+    """
+    Create, update and delete many outlets in one transaction, with a status per item.
+    With atomic=true, any failed item rolls back the whole batch (409 with the results).
+    """
+    try:
+        return await outlets_table.apply_batch(
+            [item.model_dump() for item in batch.create],
+            [item.model_dump(exclude_none=True) for item in batch.update],
+            batch.delete,
+            batch.atomic,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error applying outlet batch: {str(e)}")
+
+@router.get("/search/", response_model=List[Outlet], dependencies=[Depends(check_etag)])
 def search_outlets(
+    response: Response,
     name: Optional[str] = None,
     category: Optional[str] = None,
     address: Optional[str] = None,
@@ -175,31 +126,6 @@ def search_outlets(
     Search outlets with various filters.
     """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = "SELECT * FROM outlets WHERE 1=1"
-        params = []
-        
-        if name:
-            query += " AND name LIKE ?"
-            params.append(f"%{name}%")
-        
-        if category:
-            query += " AND category LIKE ?"
-            params.append(f"%{category}%")
-        
-        if address:
-            query += " AND address LIKE ?"
-            params.append(f"%{address}%")
-        
-        query += " LIMIT ?"
-        params.append(limit)
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [dict(row) for row in rows]
+        return outlets_cache.search(limit, response, name=name, category=category, address=address)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error searching outlets: {str(e)}")
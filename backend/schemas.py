@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Generic, TypeVar
 
 # ==================== Legacy Schemas ====================
 class NLQuery(BaseModel):
@@ -28,6 +28,9 @@ class ProductUpdate(BaseModel):
     price: Optional[float] = None
     image_url: Optional[str] = None
 
+class ProductBatchUpdate(ProductUpdate):
+    id: int
+
 class Product(ProductBase):
     id: int
 
@@ -50,6 +53,9 @@ class OutletUpdate(BaseModel):
     address: Optional[str] = None
     maps_url: Optional[str] = None
 
+class OutletBatchUpdate(OutletUpdate):
+    id: int
+
 class Outlet(OutletBase):
     id: int
 
@@ -72,6 +78,9 @@ class FoodUpdate(BaseModel):
     price: Optional[float] = None
     image_url: Optional[str] = None
 
+class FoodBatchUpdate(FoodUpdate):
+    id: int
+
 class Food(FoodBase):
     id: int
 
@@ -94,12 +103,52 @@ class DrinkUpdate(BaseModel):
     price: Optional[float] = None
     image_url: Optional[str] = None
 
+class DrinkBatchUpdate(DrinkUpdate):
+    id: int
+
 class Drink(DrinkBase):
     id: int
 
     class Config:
         from_attributes = True
 
+# ==================== Pagination Schemas ====================
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the following page
+    prev_cursor: Optional[str] = None  # pass back as ?cursor= for the preceding page
+    total: Optional[int] = None  # only with include_total=true; may lag other workers' writes
+    sort: str
+    order: str
+
+# ==================== Batch Schemas ====================
+C = TypeVar("C")
+U = TypeVar("U")
+
+class Batch(BaseModel, Generic[C, U]):
+    create: List[C] = []
+    update: List[U] = []  # partial updates, each with the id it applies to
+    delete: List[int] = []
+    atomic: bool = False  # all-or-nothing: any failed item rolls back the whole batch
+
+class BatchItemResult(BaseModel, Generic[T]):
+    op: str  # "create", "update" or "delete"
+    index: int  # position in that op's array
+    id: Optional[int] = None
+    status: int  # HTTP status the single-item endpoint would have returned
+    detail: Optional[str] = None
+    item: Optional[T] = None
+
+class BatchResult(BaseModel, Generic[T]):
+    applied: bool
+    created: int
+    updated: int
+    deleted: int
+    failed: int
+    results: List[BatchItemResult[T]]
+
 # ==================== Chat Schemas ====================
 class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
@@ -0,0 +1,330 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import ipaddress
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Optional
+from fastapi import HTTPException, Request
+from dependencies import (
+    TRUSTED_PROXIES,
+    CHAT_RATE_PER_MINUTE,
+    CHAT_BURST,
+    LLM_MAX_CONCURRENT,
+    LLM_MAX_QUEUE,
+    LLM_QUEUE_TIMEOUT,
+    EMBEDDINGS_RATE_PER_MINUTE,
+    EMBEDDINGS_BURST,
+    EMBEDDINGS_MAX_CONCURRENT,
+    EMBEDDINGS_MAX_QUEUE,
+)
+
+
+# -------------------- Rate limiting --------------------
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Take one token. Returns 0 if allowed, else the seconds until a token is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    One token bucket per client key (client address or session id), kept in a bounded LRU.
+    """
+
+    def __init__(self, per_minute: float, burst: int, max_keys: int = 10000):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def check(self, key: str):
+        """
+        Raise 429 with Retry-After when `key` has used up its budget.
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(key)
+            retry_after = bucket.take()
+            if retry_after:
+                self.limited += 1
+            else:
+                self.allowed += 1
+
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please slow down.",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"clients": len(self._buckets), "allowed": self.allowed, "limited": self.limited}
+
+
+def _parse_networks(spec: str) -> list:
+    networks = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            print(f"⚠️ Ignoring invalid TRUSTED_PROXIES entry: {item}")
+    return networks
+
+
+trusted_proxies = _parse_networks(TRUSTED_PROXIES)
+
+
+def is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in trusted_proxies)
+
+
+def client_key(request: Request) -> str:
+    """
+    Identify the caller by the socket peer. X-Forwarded-For is only honoured when the peer
+    is one of TRUSTED_PROXIES (Cloud Run, ngrok, a load balancer): the client is then the
+    nearest hop that is not itself a trusted proxy, since anything further left is client-supplied.
+    """
+    host = request.client.host if request.client else "unknown"
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded or not is_trusted_proxy(host):
+        return host
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        if not is_trusted_proxy(hop):
+            return hop
+    return host
+
+
+# -------------------- Admission queue --------------------
+class Admission:
+    """
+    One admitted request's slot. Released once the request is done and every model call it
+    abandoned on a timeout (see resilience.Deadline) has finished, so work that keeps running
+    in the background still counts against the queue's concurrency.
+    """
+
+    def __init__(self, queue: "AdmissionQueue", slots: asyncio.Semaphore, loop: asyncio.AbstractEventLoop,
+                 waited: float):
+        self.queue = queue
+        self.waited = waited
+        self._slots = slots
+        self._loop = loop
+        self._pending = 1
+        self._lingering = False
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def hold(self, future: Future):
+        """Keep the slot until `future` finishes (callable from any thread)."""
+        with self._lock:
+            if self._pending == 0:
+                return
+            self._pending += 1
+        future.add_done_callback(lambda _: self._settle())
+
+    def close(self):
+        """The request is done; the slot is freed now or when the last held call finishes."""
+        with self._lock:
+            self._lingering = self._pending > 1
+        self.queue._finished(self, time.perf_counter() - self._started)
+        self._settle()
+
+    def _settle(self):
+        with self._lock:
+            self._pending -= 1
+            last = self._pending == 0
+        if last:
+            self.queue._release(self)
+
+
+class AdmissionQueue:
+    """
+    Bounded concurrency for expensive (LLM / embedding model) work.
+
+    At most `max_concurrent` requests run; up to `max_waiting` more wait for at most
+    `max_wait` seconds. Anything beyond that is rejected with 503 and a Retry-After
+    estimated from recent service times. Queue wait and service time are tracked separately.
+
+    Waiting happens on the event loop (asyncio.Semaphore in an async dependency), so queued
+    requests hold no threadpool thread; only admitted ones reach the sync endpoint.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_waiting: int, max_wait: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.running = 0
+        self.lingering = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+        self.completed = 0
+        self.total_service = 0.0
+
+    def _retry_after(self) -> str:
+        avg_service = self.total_service / self.completed if self.completed else 5.0
+        backlog = (self.waiting + self.running) / self.max_concurrent
+        return str(max(1, math.ceil(avg_service * backlog)))
+
+    def _reject(self, detail: str):
+        with self._lock:
+            self.rejected += 1
+            retry_after = self._retry_after()
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": retry_after})
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # One event loop per worker; a new loop (tests, reload) starts with fresh slots
+            self._loop, self._slots = loop, asyncio.Semaphore(self.max_concurrent)
+        return self._slots
+
+    async def admit(self) -> Admission:
+        slots = self._semaphore()
+        wait_start = time.perf_counter()
+        if not slots.locked():
+            # A free slot is taken without queueing
+            await slots.acquire()
+            acquired = True
+        else:
+            with self._lock:
+                full = self.waiting >= self.max_waiting
+                if not full:
+                    self.waiting += 1
+            if full:
+                self._reject(f"{self.name} is at capacity, please retry shortly.")
+            acquired = False
+            try:
+                await asyncio.wait_for(slots.acquire(), timeout=self.max_wait)
+                acquired = True
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+        waited = time.perf_counter() - wait_start
+        if not acquired:
+            self._reject(f"{self.name} queue wait exceeded {self.max_wait:.0f}s, please retry shortly.")
+        with self._lock:
+            self.running += 1
+            self.admitted += 1
+            self.total_wait += waited
+            self.max_observed_wait = max(self.max_observed_wait, waited)
+        return Admission(self, slots, asyncio.get_running_loop(), waited)
+
+    def _finished(self, admission: Admission, served: float):
+        with self._lock:
+            self.completed += 1
+            self.total_service += served
+            if admission._lingering:
+                self.lingering += 1
+
+    def _release(self, admission: Admission):
+        with self._lock:
+            self.running -= 1
+            if admission._lingering:
+                self.lingering -= 1
+        try:
+            admission._loop.call_soon_threadsafe(admission._slots.release)
+        except RuntimeError:
+            pass  # event loop already closed (shutdown)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                # Finished requests whose slot is still held by timed-out model calls
+                "lingering": self.lingering,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "avg_queue_wait_ms": self.total_wait / self.admitted * 1000 if self.admitted else 0.0,
+                "max_queue_wait_ms": self.max_observed_wait * 1000,
+                "avg_service_ms": self.total_service / self.completed * 1000 if self.completed else 0.0,
+            }
+
+
+# -------------------- Shared instances --------------------
+chat_rate_limiter = RateLimiter(CHAT_RATE_PER_MINUTE, CHAT_BURST)
+embeddings_rate_limiter = RateLimiter(EMBEDDINGS_RATE_PER_MINUTE, EMBEDDINGS_BURST)
+
+llm_admission = AdmissionQueue("Assistant", LLM_MAX_CONCURRENT, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
+embeddings_admission = AdmissionQueue("Embedding model", EMBEDDINGS_MAX_CONCURRENT, EMBEDDINGS_MAX_QUEUE, LLM_QUEUE_TIMEOUT)
+
+
+def admission_slot(queue: AdmissionQueue):
+    """
+    Dependency factory: wait for a slot in `queue` on the event loop and hold it for the
+    request (declare it on the route; the handler can take the Admission to hold() calls).
+    """
+    async def admitted():
+        admission = await queue.admit()
+        try:
+            yield admission
+        finally:
+            admission.close()
+    return admitted
+
+
+llm_slot = admission_slot(llm_admission)
+embeddings_slot = admission_slot(embeddings_admission)
+
+
+def limit_chat_clients(request: Request):
+    """FastAPI dependency: per-client token bucket for /chat."""
+    chat_rate_limiter.check(client_key(request))
+
+
+def limit_embeddings_clients(request: Request):
+    """FastAPI dependency: per-client token bucket for /embeddings."""
+    embeddings_rate_limiter.check(client_key(request))
+
+
+def stats() -> dict:
+    return {
+        "chat_rate_limit": chat_rate_limiter.stats(),
+        "embeddings_rate_limit": embeddings_rate_limiter.stats(),
+        "llm_queue": llm_admission.stats(),
+        "embeddings_queue": embeddings_admission.stats(),
+    }
@@ -0,0 +1,207 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import hashlib
+import json
+import shutil
+import sqlite3
+import tempfile
+import time
+from importlib import metadata
+from dependencies import DATA_DIR, DATABASE_PATH, EMBEDDING_MODEL
+
+# Versioned offline bundles of everything retrieval needs at startup: the embedding model
+# with its tokenizer, the FAISS index and the FAISS metadata, plus a manifest.
+#
+#     artifacts/
+#       20261019-3f2a9c1b7e/
+#         manifest.json
+#         model/                  (SentenceTransformer.save: weights, tokenizer, config)
+#         zus_embeddings.index
+#         faiss_meta.pkl
+#       latest -> 20261019-3f2a9c1b7e
+#
+# Build (needs Hub access once) and verify, from the backend directory:
+#     python services/artifacts.py build --out artifacts
+#     python services/artifacts.py verify artifacts/latest
+# Serve with ARTIFACT_DIR=artifacts/latest to load strictly from the bundle, offline.
+
+ARTIFACT_FORMAT = 1
+MANIFEST = "manifest.json"
+MODEL_DIR = "model"
+INDEX_FILE = "zus_embeddings.index"
+META_FILE = "faiss_meta.pkl"
+# Library versions recorded in the manifest; a model saved by one may not load in another
+RECORDED_PACKAGES = ["sentence-transformers", "transformers", "torch", "faiss-cpu"]
+
+
+class ArtifactError(RuntimeError):
+    """The artifact is missing, incomplete or was built for a different model."""
+
+
+def sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def list_files(root: str) -> list:
+    """Relative paths of all files under root, sorted, excluding the manifest."""
+    files = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            rel = os.path.relpath(os.path.join(dirpath, name), root)
+            if rel != MANIFEST:
+                files.append(rel.replace(os.sep, "/"))
+    return sorted(files)
+
+
+def package_versions() -> dict:
+    versions = {}
+    for package in RECORDED_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+# -------------------- Build --------------------
+def build(out_root: str, index_path: str, meta_path: str, model_name: str = EMBEDDING_MODEL,
+          version: str = None) -> str:
+    """
+    Package the embedding model, FAISS index and metadata into out_root/<version>
+    and point out_root/latest at it. Returns the artifact directory.
+    """
+    import faiss
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(out_root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".building-", dir=out_root)
+    os.chmod(staging, 0o755)
+    try:
+        print(f"Saving {model_name} ...")
+        model = SentenceTransformer(model_name)
+        model.save(os.path.join(staging, MODEL_DIR))
+        shutil.copyfile(index_path, os.path.join(staging, INDEX_FILE))
+        shutil.copyfile(meta_path, os.path.join(staging, META_FILE))
+
+        index = faiss.read_index(os.path.join(staging, INDEX_FILE))
+        dimension = model.get_sentence_embedding_dimension()
+        if index.d != dimension:
+            raise ArtifactError(f"FAISS index dimension {index.d} does not match {model_name} ({dimension})")
+
+        files = {}
+        for rel in list_files(staging):
+            path = os.path.join(staging, rel)
+            files[rel] = {"bytes": os.path.getsize(path), "sha256": sha256(path)}
+        content_digest = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()
+        version = version or f"{time.strftime('%Y%m%d')}-{content_digest[:10]}"
+
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "version": version,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "embedding_model": model_name,
+            "dimension": dimension,
+            "vectors": index.ntotal,
+            "content_sha256": content_digest,
+            "packages": package_versions(),
+            "files": files,
+        }
+        with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        target = os.path.join(out_root, version)
+        if os.path.exists(target):
+            raise ArtifactError(f"Artifact {target} already exists")
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Swap the "latest" link atomically so a starting server never sees a half-written pointer
+    link = os.path.join(out_root, "latest")
+    tmp_link = f"{link}.tmp"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(version, tmp_link)
+    os.replace(tmp_link, link)
+    total_mb = sum(f["bytes"] for f in files.values()) / 1e6
+    print(f"Built artifact {target} ({len(files)} files, {total_mb:.1f} MB)")
+    return target
+
+
+# -------------------- Load / verify --------------------
+def load_manifest(artifact_dir: str) -> dict:
+    path = os.path.join(artifact_dir, MANIFEST)
+    if not os.path.exists(path):
+        raise ArtifactError(f"No {MANIFEST} in {artifact_dir}; build it with `python services/artifacts.py build`")
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ArtifactError(f"Artifact format {manifest.get('format')} is not supported (expected {ARTIFACT_FORMAT})")
+    return manifest
+
+
+def check(artifact_dir: str, checksums: bool = False) -> dict:
+    """
+    Validate an artifact before loading from it and return its manifest. Startup checks
+    file presence and sizes; checksums=True also hashes every file (used by `verify`).
+    """
+    manifest = load_manifest(artifact_dir)
+    if manifest["embedding_model"] != EMBEDDING_MODEL:
+        raise ArtifactError(f"Artifact was built for {manifest['embedding_model']}, app expects {EMBEDDING_MODEL}")
+
+    problems = []
+    for rel, expected in manifest["files"].items():
+        path = os.path.join(artifact_dir, rel)
+        if not os.path.exists(path):
+            problems.append(f"missing {rel}")
+        elif os.path.getsize(path) != expected["bytes"]:
+            problems.append(f"size mismatch for {rel}")
+        elif checksums and sha256(path) != expected["sha256"]:
+            problems.append(f"checksum mismatch for {rel}")
+    if problems:
+        raise ArtifactError(f"Artifact {artifact_dir} is corrupt: {', '.join(problems[:5])}")
+
+    # FAISS ids map onto embedding_metadata rows, so a reindexed database needs a new artifact
+    try:
+        conn = sqlite3.connect(DATABASE_PATH)
+        rows = conn.execute("SELECT COUNT(*) FROM embedding_metadata").fetchone()[0]
+        conn.close()
+        if rows != manifest["vectors"]:
+            print(f"⚠️ Artifact {manifest['version']} has {manifest['vectors']} vectors, "
+                  f"embedding_metadata has {rows} rows; rebuild the artifact after reindexing")
+    except sqlite3.Error as e:
+        print(f"⚠️ Could not compare artifact with embedding_metadata: {e}")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or verify offline model artifacts")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_cmd = commands.add_parser("build")
+    build_cmd.add_argument("--out", default="artifacts")
+    build_cmd.add_argument("--index", default=os.path.join(DATA_DIR, INDEX_FILE))
+    build_cmd.add_argument("--meta", default=os.path.join(DATA_DIR, META_FILE))
+    build_cmd.add_argument("--version", default=None)
+    verify_cmd = commands.add_parser("verify")
+    verify_cmd.add_argument("artifact_dir")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        target = build(args.out, args.index, args.meta, version=args.version)
+        check(target, checksums=True)
+    else:
+        manifest = check(args.artifact_dir, checksums=True)
+        print(f"Artifact {manifest['version']} OK ({len(manifest['files'])} files, {manifest['vectors']} vectors)")
+
+
+if __name__ == "__main__":
+    main()
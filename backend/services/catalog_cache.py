@@ -0,0 +1,199 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Type
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from schemas import Page
+from services import crud
+from services.crud import CrudTable, catalog_versions
+from services.metrics import CACHE_EVENTS
+from dependencies import CATALOG_CACHE_ENABLED, CATALOG_CACHE_RESPONSES
+
+
+class Snapshot:
+    """All rows of a table as of one catalog_versions value, plus responses built from that state."""
+
+    __slots__ = ("version", "rows", "by_id", "row_bytes", "responses", "response_bytes")
+
+    def __init__(self, version: int, rows: List[dict], row_bytes: int):
+        self.version = version
+        self.rows = rows
+        self.by_id = {row["id"]: row for row in rows}
+        self.row_bytes = row_bytes
+        self.responses: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self.response_bytes = 0
+
+
+class CachedTable:
+    """
+    Read-through cache for one catalog table's GET endpoints. Rows are loaded once per
+    table version and list/detail requests are answered from them; every endpoint's
+    serialized JSON body is kept (LRU, `max_responses` per table) so a repeat request
+    skips SQLite, row dicts and pydantic alike.
+
+    A snapshot is dropped as soon as this worker writes the table (CrudTable.write_hooks)
+    and is rebuilt once catalog_versions reports a newer version, which is how writes from
+    other workers and scripts arrive (within CATALOG_VERSION_TTL).
+    """
+
+    def __init__(self, table: CrudTable, model: Type[BaseModel], max_responses: int = CATALOG_CACHE_RESPONSES,
+                 enabled: bool = CATALOG_CACHE_ENABLED):
+        self.table = table
+        self.max_responses = max_responses
+        self.enabled = enabled
+        self.item = TypeAdapter(model)
+        self.items = TypeAdapter(List[model])
+        self.page_items = TypeAdapter(Page[model])
+        self._snapshot: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+        table.write_hooks.append(self.invalidate)
+
+    def invalidate(self):
+        self._snapshot = None
+        self.invalidations += 1
+
+    # -------------------- Snapshots --------------------
+    def snapshot(self) -> Optional[Snapshot]:
+        """The current snapshot, (re)loading it when missing or older than the table's version."""
+        if not self.enabled:
+            return None
+        version = catalog_versions.get(self.table.table)
+        if version is None:
+            # Versions not migrated yet: nothing could tell us when to drop a snapshot
+            return None
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version >= version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version < version:
+                snapshot = self._snapshot = self._load()
+        return snapshot
+
+    def _load(self) -> Snapshot:
+        with crud.database.read(self.table.router) as conn:
+            # Version and rows from the same read transaction, so the rows are never older than the version
+            conn.execute("BEGIN")
+            try:
+                version = conn.execute("SELECT version FROM catalog_versions WHERE name = ?",
+                                       (self.table.table,)).fetchone()[0]
+                rows = [dict(row) for row in conn.execute(f"SELECT * FROM {self.table.table} ORDER BY id")]
+            finally:
+                conn.rollback()
+        self.loads += 1
+        return Snapshot(version, rows, len(self.items.dump_json(self.items.validate_python(rows))))
+
+    # -------------------- Responses --------------------
+    def respond(self, key: tuple, build: Callable[[Optional[Snapshot]], Any], adapter: TypeAdapter,
+                response: Response) -> Response:
+        """
+        JSON response for `key`: the cached body, or `build(snapshot)` serialized with `adapter`
+        and cached. Headers already set on `response` (ETag, Cache-Control) are carried over.
+        """
+        snapshot = self.snapshot()
+        body = snapshot.responses.get(key) if snapshot is not None else None
+        if body is not None:
+            self.hits += 1
+            CACHE_EVENTS.inc("catalog", "hit")
+            with self._lock:
+                if key in snapshot.responses:
+                    snapshot.responses.move_to_end(key)
+        else:
+            self.misses += 1
+            CACHE_EVENTS.inc("catalog", "miss")
+            body = adapter.dump_json(adapter.validate_python(build(snapshot)))
+            if snapshot is not None and self.max_responses > 0:
+                with self._lock:
+                    if key not in snapshot.responses:
+                        snapshot.responses[key] = body
+                        snapshot.response_bytes += len(body)
+                    while len(snapshot.responses) > self.max_responses:
+                        _, evicted = snapshot.responses.popitem(last=False)
+                        snapshot.response_bytes -= len(evicted)
+        result = Response(content=body, media_type="application/json")
+        result.headers.raw.extend(response.headers.raw)
+        return result
+
+    def list(self, skip: int, limit: int, response: Response) -> Response:
+        def build(snapshot):
+            if snapshot is None:
+                with crud.database.read(self.table.router) as conn:
+                    return self.table.list(conn, skip, limit)
+            # Same rows as LIMIT/OFFSET: a negative limit means no limit, a negative offset none
+            start = max(skip, 0)
+            return snapshot.rows[start:] if limit < 0 else snapshot.rows[start:start + limit]
+        return self.respond(("list", skip, limit), build, self.items, response)
+
+    def get(self, row_id: int, response: Response) -> Response:
+        def build(snapshot):
+            if snapshot is None:
+                with crud.database.read(self.table.router) as conn:
+                    return self.table.get(conn, row_id)
+            row = snapshot.by_id.get(row_id)
+            if row is None:
+                raise self.table.not_found()
+            return row
+        return self.respond(("get", row_id), build, self.item, response)
+
+    def page(self, limit: int, sort: str, order: str, cursor: Optional[str], include_total: bool,
+             response: Response) -> Response:
+        def build(snapshot):
+            with crud.database.read(self.table.router) as conn:
+                return self.table.page(conn, limit, sort, order, cursor, include_total)
+        return self.respond(("page", limit, sort, order, cursor, include_total), build, self.page_items, response)
+
+    def search(self, limit: int, response: Response, **filters) -> Response:
+        def build(snapshot):
+            with crud.database.read(self.table.router) as conn:
+                return self.table.search(conn, limit, **filters)
+        key = ("search", limit, *sorted((name, value) for name, value in filters.items() if value is not None))
+        return self.respond(key, build, self.items, response)
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        lookups = self.hits + self.misses
+        return {
+            "version": snapshot.version if snapshot else None,
+            "rows": len(snapshot.rows) if snapshot else 0,
+            "row_bytes": snapshot.row_bytes if snapshot else 0,
+            "responses": len(snapshot.responses) if snapshot else 0,
+            "response_bytes": snapshot.response_bytes if snapshot else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+        }
+
+
+class CatalogCache:
+    def __init__(self):
+        self.tables: Dict[str, CachedTable] = {}
+
+    def register(self, table: CrudTable, model: Type[BaseModel]) -> CachedTable:
+        cached = self.tables[table.router] = CachedTable(table, model)
+        return cached
+
+    def stats(self) -> dict:
+        tables = {name: cached.stats() for name, cached in self.tables.items()}
+        hits = sum(t["hits"] for t in tables.values())
+        lookups = hits + sum(t["misses"] for t in tables.values())
+        return {
+            "enabled": CATALOG_CACHE_ENABLED,
+            # Serialized JSON size of the cached rows and response bodies (per worker)
+            "bytes": sum(t["row_bytes"] + t["response_bytes"] for t in tables.values()),
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "tables": tables,
+        }
+
+
+catalog_cache = CatalogCache()
@@ -0,0 +1,519 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import base64
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+from fastapi import HTTPException, Request, Response
+from services.database import database
+from dependencies import (
+    CATALOG_COUNT_TTL,
+    BATCH_MAX_ITEMS,
+    CATALOG_VERSION_TTL,
+    CATALOG_CACHE_CONTROL,
+)
+
+# Sort options shared by the priced catalog tables. Keys are NULL-free expressions so that
+# (key, id) row-value comparisons never drop rows; missing prices sort as the lowest
+PRICED_SORTS = {"id": "id", "name": "name", "price": "COALESCE(price, -1)"}
+OUTLET_SORTS = {"id": "id", "name": "name", "category": "COALESCE(category, '')"}
+
+# Full-text search: case- and accent-folded tokens ("Latté" matches "latte"), with prefix
+# indexes so short "lat"-style prefixes stay cheap
+FTS_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+SEARCH_TOKEN = re.compile(r"\w+")
+
+
+# Bound parameters per IN (...) lookup, well under SQLite's variable limit
+LOOKUP_CHUNK = 500
+
+
+class BatchRejected(Exception):
+    """Raised inside an all-or-nothing batch write so that the writer rolls it back."""
+
+    def __init__(self, result: dict):
+        super().__init__("batch rejected")
+        self.result = result
+
+
+# -------------------- Versions --------------------
+class CatalogVersions:
+    """
+    This worker's copy of the catalog_versions counters (see services/migrations.py), so
+    conditional GETs are answered without a database read. The copy is reloaded once it
+    is CATALOG_VERSION_TTL old, or on the next request after this worker writes.
+    """
+
+    def __init__(self, ttl: float = CATALOG_VERSION_TTL):
+        self.ttl = ttl
+        self._versions: Dict[str, int] = {}
+        self._expires = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def invalidate(self):
+        self._expires = 0.0
+
+    def get(self, table: str) -> Optional[int]:
+        """The table's version, or None when the counters are not available."""
+        if time.monotonic() >= self._expires:
+            with self._lock:
+                if time.monotonic() >= self._expires:
+                    self._reload()
+        return self._versions.get(table)
+
+    def _reload(self):
+        try:
+            with database.read("versions") as conn:
+                self._versions = dict(conn.execute("SELECT name, version FROM catalog_versions").fetchall())
+        except sqlite3.Error as e:
+            # Not migrated yet: serve without ETags
+            print(f"⚠️ Catalog versions unavailable: {e}")
+            self._versions = {}
+        self._expires = time.monotonic() + self.ttl
+        self.reloads += 1
+
+
+catalog_versions = CatalogVersions()
+
+
+# -------------------- Cursors --------------------
+def encode_cursor(sort: str, order: str, direction: str, key, row_id: int) -> str:
+    payload = json.dumps([sort, order, direction, key, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def is_sqlite_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and -2**63 <= value < 2**63
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Return (sort, order, direction, key, id); 400 for anything that is not one of ours."""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort, order, direction, key, row_id = json.loads(payload)
+        if direction not in ("next", "prev") or not is_sqlite_int(row_id):
+            raise ValueError(direction)
+        # The key is bound as a query parameter: only scalars SQLite can take
+        if key is not None and not isinstance(key, (str, float)) and not is_sqlite_int(key):
+            raise ValueError(key)
+        return sort, order, direction, key, row_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# -------------------- Table-driven CRUD --------------------
+class CrudTable:
+    """
+    CRUD for one catalog table, shared by the entity routers.
+
+    Every mutation is a single INSERT/UPDATE/DELETE ... RETURNING statement, so
+    there is no existence check before it and no read-back after it. Statement text
+    is built once per table (and per set of updated columns, in table column order),
+    so each connection's statement cache keeps reusing the same prepared statements.
+    Mutating methods take the writer's connection and must not commit; create/update/
+    delete submit them to the worker's group-committing writer.
+    """
+
+    def __init__(self, table: str, columns: Sequence[str], label: str, router: str, sorts: Dict[str, str],
+                 search_weights: Dict[str, float]):
+        self.table = table
+        self.columns = tuple(columns)
+        self.label = label
+        self.router = router
+        self.sorts = sorts
+        # Columns in the FTS5 index and their BM25 weights (a name hit outranks a category hit)
+        self.search_weights = search_weights
+        self.fts_table = f"{table}_fts"
+        self.fts_ready = False
+        # Called after every write this worker makes to the table (e.g. catalog cache invalidation)
+        self.write_hooks: List[Callable[[], None]] = []
+        self._count = None
+        self._count_expires = 0.0
+        self.select_page_sql = f"SELECT * FROM {table} LIMIT ? OFFSET ?"
+        self.select_one_sql = f"SELECT * FROM {table} WHERE id = ?"
+        self.exists_sql = f"SELECT 1 FROM {table} WHERE id = ?"
+        self.insert_sql = (f"INSERT INTO {table} ({', '.join(self.columns)}) "
+                           f"VALUES ({', '.join('?' * len(self.columns))}) RETURNING *")
+        self.delete_sql = f"DELETE FROM {table} WHERE id = ? RETURNING id"
+        self.delete_many_sql = f"DELETE FROM {table} WHERE id = ?"
+        self._update_sql: Dict[tuple, str] = {}
+
+    def not_found(self) -> HTTPException:
+        return HTTPException(status_code=404, detail=f"{self.label} not found")
+
+    def conflict(self) -> HTTPException:
+        # Unique natural keys, see services/migrations.py
+        return HTTPException(status_code=409, detail=f"{self.label} already exists")
+
+    def _check_columns(self, names):
+        unknown = set(names) - set(self.columns)
+        if unknown:
+            raise ValueError(f"Unknown {self.table} columns: {', '.join(sorted(unknown))}")
+
+    def update_sql(self, names: tuple) -> str:
+        sql = self._update_sql.get(names)
+        if sql is None:
+            assignments = ", ".join(f"{name} = ?" for name in names)
+            sql = self._update_sql[names] = f"UPDATE {self.table} SET {assignments} WHERE id = ? RETURNING *"
+        return sql
+
+    # -------------------- Reads --------------------
+    def list(self, conn: sqlite3.Connection, skip: int, limit: int) -> list:
+        return [dict(row) for row in conn.execute(self.select_page_sql, (limit, skip)).fetchall()]
+
+    def get(self, conn: sqlite3.Connection, row_id: int) -> dict:
+        row = conn.execute(self.select_one_sql, (row_id,)).fetchone()
+        if row is None:
+            raise self.not_found()
+        return dict(row)
+
+    def count(self, conn: sqlite3.Connection) -> int:
+        """Row count, reused for CATALOG_COUNT_TTL seconds or until this worker changes the table."""
+        if self._count is None or time.monotonic() >= self._count_expires:
+            self._count = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+            self._count_expires = time.monotonic() + CATALOG_COUNT_TTL
+        return self._count
+
+    def page(self, conn: sqlite3.Connection, limit: int, sort: str = "id", order: str = "asc",
+             cursor: Optional[str] = None, include_total: bool = False) -> dict:
+        """
+        Keyset pagination on (sort key, id): each page seeks past the cursor's row instead
+        of scanning and discarding OFFSET rows, so deep pages cost the same as the first.
+        Cursors carry the sort they were made for and are rejected under a different one.
+        """
+        if sort not in self.sorts:
+            raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(self.sorts)}")
+        if order not in ("asc", "desc"):
+            raise HTTPException(status_code=400, detail="order must be asc or desc")
+        key = self.sorts[sort]
+
+        direction, after = "next", None
+        if cursor:
+            cursor_sort, cursor_order, direction, cursor_key, cursor_id = decode_cursor(cursor)
+            if (cursor_sort, cursor_order) != (sort, order):
+                raise HTTPException(status_code=400, detail="Cursor was issued for a different sort order")
+            after = (cursor_key, cursor_id)
+
+        # Walking backwards is the same query in the opposite order, reversed afterwards
+        ascending = (order == "asc") == (direction == "next")
+        query = f"SELECT *, {key} AS _sort_key FROM {self.table}"
+        params = []
+        if after is not None:
+            query += f" WHERE ({key}, id) {'>' if ascending else '<'} (?, ?)"
+            params.extend(after)
+        sql_order = "ASC" if ascending else "DESC"
+        query += f" ORDER BY {key} {sql_order}, id {sql_order} LIMIT ?"
+        params.append(limit + 1)
+
+        rows = conn.execute(query, params).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if direction == "prev":
+            rows.reverse()
+
+        # There is a page before when we came forward from a cursor or more rows remain behind us;
+        # a page after when more rows remain ahead or we came back from a cursor
+        has_prev = more if direction == "prev" else after is not None
+        has_next = more if direction == "next" else after is not None
+        items = []
+        for row in rows:
+            item = dict(row)
+            item.pop("_sort_key")
+            items.append(item)
+        return {
+            "items": items,
+            "next_cursor": encode_cursor(sort, order, "next", rows[-1]["_sort_key"], rows[-1]["id"]) if rows and has_next else None,
+            "prev_cursor": encode_cursor(sort, order, "prev", rows[0]["_sort_key"], rows[0]["id"]) if rows and has_prev else None,
+            "total": self.count(conn) if include_total else None,
+            "sort": sort,
+            "order": order,
+        }
+
+    def search(self, conn: sqlite3.Connection, limit: int, min_price: Optional[float] = None,
+               max_price: Optional[float] = None, **contains) -> list:
+        """
+        Rows matching every given column filter, optionally within a price range, best
+        BM25 match first. Each word of a filter must prefix-match a word of that column.
+        One FTS5 MATCH joined to the base table, with the price range applied in the same query.
+        A filter without any word characters ("!!!") can't be matched by FTS5 and is applied
+        as a substring filter instead.
+        """
+        terms = {name: SEARCH_TOKEN.findall(value) for name, value in contains.items() if value}
+        unknown = set(terms) - set(self.search_weights)
+        if unknown:
+            raise ValueError(f"Not searchable on {self.table}: {', '.join(sorted(unknown))}")
+        if not self.fts_ready:
+            return self._search_like(conn, limit, min_price, max_price, contains)
+
+        match = " AND ".join(
+            f'{name} : "{word}"*' for name in self.search_weights for word in terms.get(name, [])
+        )
+        params = []
+        if match:
+            weights = ", ".join(str(weight) for weight in self.search_weights.values())
+            query = (f"SELECT t.* FROM {self.fts_table} JOIN {self.table} t ON t.id = {self.fts_table}.rowid "
+                     f"WHERE {self.fts_table} MATCH ?")
+            params.append(match)
+            order = f"bm25({self.fts_table}, {weights})"
+        else:
+            query = f"SELECT t.* FROM {self.table} t WHERE 1=1"
+            order = "t.id"
+        for name in self.search_weights:
+            if name in terms and not terms[name]:
+                query += f" AND t.{name} LIKE ?"
+                params.append(f"%{contains[name]}%")
+        if min_price is not None:
+            query += " AND t.price >= ?"
+            params.append(min_price)
+        if max_price is not None:
+            query += " AND t.price <= ?"
+            params.append(max_price)
+        query += f" ORDER BY {order} LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+    def _search_like(self, conn, limit, min_price, max_price, contains) -> list:
+        """Substring search, used only when the FTS5 index could not be created."""
+        query = f"SELECT * FROM {self.table} WHERE 1=1"
+        params = []
+        for name in self.search_weights:
+            if contains.get(name):
+                query += f" AND {name} LIKE ?"
+                params.append(f"%{contains[name]}%")
+        if min_price is not None:
+            query += " AND price >= ?"
+            params.append(min_price)
+        if max_price is not None:
+            query += " AND price <= ?"
+            params.append(max_price)
+        query += " LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
+
+    # -------------------- Search index --------------------
+    def create_search_index(self, conn: sqlite3.Connection) -> bool:
+        """
+        Create the external-content FTS5 table and the triggers that keep it in sync with
+        the base table; rebuild it when it or any trigger was missing (e.g. after the
+        ingestion scripts recreated the table). Returns True when it was (re)built.
+        """
+        fts, table = self.fts_table, self.table
+        names = ", ".join(self.search_weights)
+        new_values = ", ".join(f"new.{name}" for name in self.search_weights)
+        old_values = ", ".join(f"old.{name}" for name in self.search_weights)
+        triggers = {
+            f"{table}_fts_insert": f"AFTER INSERT ON {table} BEGIN "
+                                   f"INSERT INTO {fts} (rowid, {names}) VALUES (new.id, {new_values}); END",
+            f"{table}_fts_delete": f"AFTER DELETE ON {table} BEGIN "
+                                   f"INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); END",
+            f"{table}_fts_update": f"AFTER UPDATE ON {table} BEGIN "
+                                   f"INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values}); "
+                                   f"INSERT INTO {fts} (rowid, {names}) VALUES (new.id, {new_values}); END",
+        }
+        existing = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE name = ? OR name IN (?, ?, ?)", (fts, *triggers)
+        )}
+        rebuilt = False
+        if existing != {fts, *triggers}:
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, "
+                         f"content = '{table}', content_rowid = 'id', {FTS_OPTIONS})")
+            for name, body in triggers.items():
+                conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+            rebuilt = True
+        self.fts_ready = True
+        return rebuilt
+
+    # -------------------- Writes (on the writer connection) --------------------
+    def insert(self, conn: sqlite3.Connection, values: dict) -> dict:
+        self._check_columns(values)
+        try:
+            row = conn.execute(self.insert_sql, [values.get(name) for name in self.columns]).fetchone()
+        except sqlite3.IntegrityError:
+            raise self.conflict()
+        self._count = None
+        return dict(row)
+
+    def update(self, conn: sqlite3.Connection, row_id: int, values: dict) -> dict:
+        """Set the given (non-None) columns. 404 if the row is missing, 400 if there is nothing to set."""
+        self._check_columns(values)
+        names = tuple(name for name in self.columns if values.get(name) is not None)
+        if not names:
+            if conn.execute(self.exists_sql, (row_id,)).fetchone() is None:
+                raise self.not_found()
+            raise HTTPException(status_code=400, detail="No fields to update")
+        try:
+            row = conn.execute(self.update_sql(names), [values[name] for name in names] + [row_id]).fetchone()
+        except sqlite3.IntegrityError:
+            raise self.conflict()
+        if row is None:
+            raise self.not_found()
+        return dict(row)
+
+    def delete(self, conn: sqlite3.Connection, row_id: int):
+        if conn.execute(self.delete_sql, (row_id,)).fetchone() is None:
+            raise self.not_found()
+        self._count = None
+
+    def existing_ids(self, conn: sqlite3.Connection, ids: Sequence[int]) -> set:
+        found = set()
+        unique = list(dict.fromkeys(ids))
+        for start in range(0, len(unique), LOOKUP_CHUNK):
+            chunk = unique[start:start + LOOKUP_CHUNK]
+            placeholders = ", ".join("?" * len(chunk))
+            found.update(row[0] for row in conn.execute(
+                f"SELECT id FROM {self.table} WHERE id IN ({placeholders})", chunk))
+        return found
+
+    def batch(self, conn: sqlite3.Connection, creates: List[dict], updates: List[dict], deletes: List[int],
+              atomic: bool = False) -> dict:
+        """
+        Apply deletes, then partial updates (each dict carries its "id"), then creates, in the
+        caller's transaction, recording the status each single-item endpoint would return.
+        Deletes are one existence lookup plus one executemany; creates and updates reuse the
+        single-row RETURNING statements (executemany cannot return rows). A failed item only
+        undoes its own statement; with `atomic`, any failure raises BatchRejected instead.
+        """
+        results = []
+        existing = self.existing_ids(conn, deletes)
+        doomed = []
+        for index, row_id in enumerate(deletes):
+            if row_id in existing:
+                existing.discard(row_id)
+                doomed.append((row_id,))
+                results.append({"op": "delete", "index": index, "id": row_id, "status": 204})
+            else:
+                results.append({"op": "delete", "index": index, "id": row_id, "status": 404,
+                                "detail": f"{self.label} not found"})
+        if doomed:
+            conn.executemany(self.delete_many_sql, doomed)
+            self._count = None
+
+        for op, items, apply, status in (
+            ("update", updates, lambda values: self.update(conn, values.pop("id"), values), 200),
+            ("create", creates, lambda values: self.insert(conn, values), 201),
+        ):
+            for index, values in enumerate(items):
+                row_id = values.get("id")
+                try:
+                    item = apply(dict(values))
+                    results.append({"op": op, "index": index, "id": item["id"], "status": status, "item": item})
+                except HTTPException as e:
+                    results.append({"op": op, "index": index, "id": row_id, "status": e.status_code,
+                                    "detail": e.detail})
+
+        failed = sum(1 for result in results if result["status"] >= 400)
+        succeeded = lambda op: sum(1 for result in results if result["op"] == op and result["status"] < 400)
+        result = {
+            "applied": not (atomic and failed),
+            "created": succeeded("create"),
+            "updated": succeeded("update"),
+            "deleted": succeeded("delete"),
+            "failed": failed,
+            "results": results,
+        }
+        if atomic and failed:
+            raise BatchRejected(result)
+        return result
+
+    # -------------------- Writes (through the group-committing writer) --------------------
+    def written(self):
+        """After a write to the table from this worker (committed or not): drop what describes the old rows."""
+        self._count = None
+        catalog_versions.invalidate()
+        for hook in self.write_hooks:
+            hook()
+
+    async def create(self, values: dict) -> dict:
+        try:
+            return await database.write_async(lambda conn: self.insert(conn, values), self.router)
+        finally:
+            self.written()
+
+    async def modify(self, row_id: int, values: dict) -> dict:
+        try:
+            return await database.write_async(lambda conn: self.update(conn, row_id, values), self.router)
+        finally:
+            self.written()
+
+    async def remove(self, row_id: int):
+        try:
+            return await database.write_async(lambda conn: self.delete(conn, row_id), self.router)
+        finally:
+            self.written()
+
+    async def apply_batch(self, creates: List[dict], updates: List[dict], deletes: List[int],
+                          atomic: bool = False) -> dict:
+        """One write job for the whole batch; 413 when too large, 409 when an atomic batch is rolled back."""
+        size = len(creates) + len(updates) + len(deletes)
+        if size > BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=413, detail=f"Batch of {size} operations exceeds {BATCH_MAX_ITEMS}")
+        try:
+            return await database.write_async(
+                lambda conn: self.batch(conn, creates, updates, deletes, atomic), self.router
+            )
+        except BatchRejected as e:
+            # Rolled back: the per-item statuses say what would have happened, nothing was written
+            raise HTTPException(status_code=409, detail=e.result)
+        finally:
+            self.written()
+
+
+products_table = CrudTable("drinkware", ("name", "link", "category", "price", "image_url"), "Product", "products",
+                           PRICED_SORTS, {"name": 10.0, "category": 2.0})
+food_table = CrudTable("food", ("name", "category", "price", "image_url"), "Food item", "food",
+                       PRICED_SORTS, {"name": 10.0, "category": 2.0})
+drinks_table = CrudTable("drinks", ("name", "category", "price", "image_url"), "Drink", "drinks",
+                         PRICED_SORTS, {"name": 10.0, "category": 2.0})
+outlets_table = CrudTable("outlets", ("name", "category", "address", "maps_url"), "Outlet", "outlets",
+                          OUTLET_SORTS, {"name": 10.0, "category": 2.0, "address": 1.0})
+CATALOG_TABLES = [products_table, food_table, drinks_table, outlets_table]
+
+
+def ensure_search_indexes():
+    """Create or repair the FTS5 indexes (on the writer); tables that fail keep LIKE search."""
+    def create(conn):
+        return [table.table for table in CATALOG_TABLES if table.create_search_index(conn)]
+
+    try:
+        rebuilt = database.write(create, "search")
+        if rebuilt:
+            print(f"Built full-text search indexes for: {', '.join(rebuilt)}")
+    except Exception as e:
+        print(f"⚠️ Full-text search unavailable, using LIKE search: {e}")
+
+
+# -------------------- FastAPI dependencies --------------------
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison: W/"x" matches "x"
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def conditional_get(table: CrudTable):
+    """
+    Dependency factory for the table's GET endpoints: a strong ETag from the table's
+    version on every response, and 304 for a matching If-None-Match before any
+    connection is checked out (declare it in the route's `dependencies`).
+    """
+    def check_etag(request: Request, response: Response):
+        version = catalog_versions.get(table.table)
+        if version is None:
+            return
+        headers = {"ETag": f'"{table.table}-{version}"', "Cache-Control": CATALOG_CACHE_CONTROL}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, headers["ETag"]):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return check_etag
+
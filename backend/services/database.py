@@ -0,0 +1,370 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from typing import Callable
+from fastapi import HTTPException
+from services.metrics import TimedConnection, SQLITE_QUERY_SECONDS
+from dependencies import (
+    DATABASE_PATH,
+    DB_READ_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_WRITE_WINDOW_MS,
+    DB_WRITE_MAX_BATCH,
+    DB_WRITE_MAX_QUEUE,
+    DB_WRITE_TIMEOUT,
+    DB_BUSY_TIMEOUT_MS,
+    DB_CACHE_SIZE_KB,
+    DB_MMAP_SIZE,
+)
+
+
+# Prepared statements kept per connection, keyed by SQL text (services/crud.py keeps it stable)
+STATEMENT_CACHE_SIZE = 256
+
+
+def open_connection(path: str, readonly: bool) -> sqlite3.Connection:
+    """Open a catalog connection with the shared pragmas; writers also switch the file to WAL."""
+    if readonly:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, factory=TimedConnection, check_same_thread=False,
+                               timeout=DB_BUSY_TIMEOUT_MS / 1000, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute("PRAGMA query_only=ON")
+    else:
+        conn = sqlite3.connect(path, factory=TimedConnection, check_same_thread=False,
+                               timeout=DB_BUSY_TIMEOUT_MS / 1000, cached_statements=STATEMENT_CACHE_SIZE)
+        # WAL is persistent in the file: readers no longer block the writer and vice versa
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+# -------------------- Connection Pool --------------------
+class ConnectionPool:
+    """
+    Bounded pool of read-only SQLite connections. A connection is checked out by one
+    request at a time (it may be used from whichever threadpool thread runs the request)
+    and goes back to the pool afterwards. Waiting longer than `timeout` for one is a 503.
+    """
+
+    def __init__(self, path: str, size: int, timeout: float = DB_POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.checkouts = 0
+        self.timeouts = 0
+
+    @contextmanager
+    def connection(self, router: str = "other"):
+        """Check out a connection whose statements are timed under `router`."""
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise HTTPException(status_code=503, detail="Database is busy, please retry.",
+                                headers={"Retry-After": "1"})
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = open_connection(self.path, readonly=True)
+                with self._lock:
+                    self.opened += 1
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.checkouts += 1
+        conn.query_series = SQLITE_QUERY_SECONDS.labels(router)
+        try:
+            yield conn
+        finally:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+            except sqlite3.Error:
+                conn.close()
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "opened": self.opened,
+                "idle": self._idle.qsize(),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+            }
+
+
+# -------------------- Write Queue --------------------
+class WriteJob:
+    __slots__ = ("fn", "router", "future", "enqueued")
+
+    def __init__(self, fn: Callable, router: str):
+        self.fn = fn
+        self.router = router
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class WriteQueue:
+    """
+    Funnels every write of this worker through one writer thread and connection.
+
+    A write is a function `fn(conn) -> result` that runs its statements without
+    committing. The writer takes the first pending write, collects whatever else
+    arrives within `window` seconds (up to `max_batch`), and runs them in one
+    BEGIN IMMEDIATE ... COMMIT, each inside its own savepoint (unless it is alone in
+    the batch): a write that raises is rolled back alone and its caller gets the
+    exception, the rest still commit.
+    Callers wait for their own result; results are only released after the commit.
+    """
+
+    def __init__(self, path: str, window: float = DB_WRITE_WINDOW_MS / 1000, max_batch: int = DB_WRITE_MAX_BATCH,
+                 max_queue: int = DB_WRITE_MAX_QUEUE, timeout: float = DB_WRITE_TIMEOUT):
+        self.path = path
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue: "queue.Queue[WriteJob]" = queue.Queue(max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.writes = 0
+        self.failed_writes = 0
+        self.failed_commits = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.max_batch_seen = 0
+        self.total_queue_wait = 0.0
+        self.total_commit = 0.0
+
+    # -------------------- Caller side --------------------
+    def start(self):
+        """Open the writer connection (switching the file to WAL) and start the writer thread."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            conn = open_connection(self.path, readonly=False)
+            # Transactions are managed explicitly by the writer
+            conn.isolation_level = None
+            self._thread = threading.Thread(target=self._run, args=(conn,), name="sqlite-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, fn: Callable, router: str = "other") -> Future:
+        self.start()
+        job = WriteJob(fn, router)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise HTTPException(status_code=503, detail="Too many pending database writes, please retry.",
+                                headers={"Retry-After": "1"})
+        return job.future
+
+    def _timed_out(self, future: Future):
+        # Not yet started: it will be skipped. Already committing: it still lands.
+        future.cancel()
+        with self._lock:
+            self.timeouts += 1
+        raise HTTPException(status_code=503, detail="Database write timed out, please retry.",
+                            headers={"Retry-After": "1"})
+
+    def run(self, fn: Callable, router: str = "other"):
+        """Submit a write and block until it is committed (for threads and scripts)."""
+        future = self.submit(fn, router)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._timed_out(future)
+
+    async def run_async(self, fn: Callable, router: str = "other"):
+        """Submit a write and await its committed result without holding a thread."""
+        future = self.submit(fn, router)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._timed_out(future)
+
+    # -------------------- Writer thread --------------------
+    def _collect(self, first: WriteJob) -> list:
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # Close requested: finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self, conn: sqlite3.Connection):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                conn.close()
+                return
+            batch = [job for job in self._collect(first) if job.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                self._commit(conn, batch)
+            except Exception as e:
+                # Keep the writer alive; callers still waiting get the error
+                print(f"SQLite writer error: {e}")
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+
+    def _commit(self, conn: sqlite3.Connection, batch: list):
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if len(batch) == 1:
+                # A lone write needs no savepoint (which costs a statement journal for every
+                # page it touches): if it fails, rolling back the transaction undoes only it
+                job = batch[0]
+                conn.query_series = SQLITE_QUERY_SECONDS.labels(job.router)
+                try:
+                    outcomes.append((job, job.fn(conn), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK")
+                    outcomes.append((job, None, e))
+            else:
+                for job in batch:
+                    conn.query_series = SQLITE_QUERY_SECONDS.labels(job.router)
+                    conn.execute("SAVEPOINT write")
+                    try:
+                        outcomes.append((job, job.fn(conn), None))
+                        conn.execute("RELEASE write")
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO write")
+                        conn.execute("RELEASE write")
+                        outcomes.append((job, None, e))
+            if conn.in_transaction:
+                conn.execute("COMMIT")
+        except Exception as e:
+            # Could not begin or commit (e.g. another worker held the lock past busy_timeout)
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            print(f"SQLite group commit of {len(batch)} writes failed: {e}")
+            with self._lock:
+                self.failed_commits += 1
+            for job in batch:
+                job.future.set_exception(e)
+            return
+
+        committed = time.perf_counter()
+        with self._lock:
+            self.batches += 1
+            self.writes += len(batch)
+            self.failed_writes += sum(1 for _, _, error in outcomes if error is not None)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.total_queue_wait += sum(started - job.enqueued for job in batch)
+            self.total_commit += committed - started
+        for job, result, error in outcomes:
+            if error is not None:
+                job.future.set_exception(error)
+            else:
+                job.future.set_result(result)
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=self.timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "writes": self.writes,
+                "batches": self.batches,
+                "avg_batch": self.writes / self.batches if self.batches else 0.0,
+                "max_batch": self.max_batch_seen,
+                "failed_writes": self.failed_writes,
+                "failed_commits": self.failed_commits,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "pending": self._queue.qsize(),
+                "avg_queue_wait_ms": self.total_queue_wait / self.writes * 1000 if self.writes else 0.0,
+                "avg_commit_ms": self.total_commit / self.batches * 1000 if self.batches else 0.0,
+            }
+
+
+# -------------------- Database --------------------
+class Database:
+    """
+    Data access for the catalog database: a pool of read-only connections for the
+    query path and a single group-committing writer per worker, so writes from this
+    process queue in memory instead of contending for SQLite's lock.
+    """
+
+    def __init__(self, path: str = DATABASE_PATH, read_pool_size: int = DB_READ_POOL_SIZE):
+        self.path = path
+        self.writer = WriteQueue(path)
+        self.readers = ConnectionPool(path, read_pool_size)
+
+    def read(self, router: str = "other"):
+        # The writer switches the file to WAL, which read-only connections cannot do
+        self.writer.start()
+        return self.readers.connection(router)
+
+    def write(self, fn: Callable, router: str = "other"):
+        """Run `fn(conn)` in the next group commit and return its result (blocking)."""
+        return self.writer.run(fn, router)
+
+    async def write_async(self, fn: Callable, router: str = "other"):
+        """Run `fn(conn)` in the next group commit and await its result."""
+        return await self.writer.run_async(fn, router)
+
+    def close(self):
+        self.writer.close()
+        self.readers.close()
+
+    def stats(self) -> dict:
+        return {"readers": self.readers.stats(), "writer": self.writer.stats()}
+
+
+database = Database()
+
+
+# -------------------- FastAPI dependencies --------------------
+def read_connection(router: str):
+    """Dependency factory: a pooled read-only connection for the duration of the request."""
+    def get_read_connection():
+        with database.read(router) as conn:
+            yield conn
+    return get_read_connection
@@ -0,0 +1,79 @@
+import time
+import uuid
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used when a model reports no usage."""
+    return max(1, len(text) // 4)
+
+
+def message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, list):
+        return " ".join(
+            item.get("text", "") if isinstance(item, dict) else str(item) for item in content
+        )
+    return str(content)
+
+
+# -------------------- Fake Chat Model --------------------
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic local stand-in for the Gemini chat model.
+
+    - With tools bound and a fresh user message, it calls the first tool with the message as query.
+    - Otherwise it answers by echoing the tail of the last message (tool output or prompt context).
+    Latency is simulated from the prompt/response size and usage metadata is reported like a real model,
+    so benchmarks and replays exercise the same code paths without network access.
+    """
+
+    model_name: str = "fake-llm"
+    base_latency: float = 0.05
+    seconds_per_output_token: float = 0.002
+    max_answer_chars: int = 800
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        tools = kwargs.get("tools") or []
+        last = messages[-1]
+        prompt_text = "\n".join(message_text(m) for m in messages)
+
+        if tools and isinstance(last, HumanMessage):
+            tool_name = tools[0]["function"]["name"]
+            message = AIMessage(
+                content="",
+                tool_calls=[{"name": tool_name, "args": {"query": message_text(last)}, "id": f"call_{uuid.uuid4().hex[:12]}"}],
+            )
+            output_text = tool_name + message_text(last)
+        else:
+            source = message_text(last)
+            if not isinstance(last, ToolMessage) and "\n\n" in source:
+                # Plain RAG prompt: answer from the retrieved entries block
+                source = source.split("\n\n", 2)[-2] if source.count("\n\n") >= 2 else source
+            output_text = "Here is what I found:\n" + source.strip()[: self.max_answer_chars]
+            message = AIMessage(content=output_text)
+
+        input_tokens = estimate_tokens(prompt_text)
+        output_tokens = estimate_tokens(output_text)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        message.response_metadata = {"model_name": self.model_name}
+
+        time.sleep(self.base_latency + output_tokens * self.seconds_per_output_token)
+        return ChatResult(generations=[ChatGeneration(message=message)])
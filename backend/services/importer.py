@@ -0,0 +1,275 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import codecs
+import csv
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Iterator, Optional
+from fastapi import HTTPException
+from services import crud
+from services.migrations import NATURAL_KEYS, conflict_target
+from services.text_cleaning import parse_price, repair_text
+from dependencies import IMPORT_CHUNK_ROWS
+
+FORMATS = ("csv", "ndjson")
+# Rejected rows reported back with their row number (the rest are only counted)
+MAX_ERROR_SAMPLES = 20
+# Finished imports kept for GET /admin/imports
+MAX_FINISHED_IMPORTS = 20
+
+
+def import_format(content_type: Optional[str], requested: Optional[str]) -> str:
+    """Format from ?format=, else from the Content-Type; 415 when neither says csv or ndjson."""
+    if requested:
+        if requested not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(FORMATS)}")
+        return requested
+    content_type = (content_type or "").lower()
+    if "csv" in content_type:
+        return "csv"
+    if "ndjson" in content_type or "jsonl" in content_type or "json-seq" in content_type:
+        return "ndjson"
+    raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass ?format=")
+
+
+# -------------------- Row parsing --------------------
+class LineSplitter:
+    """Turns byte chunks into complete UTF-8 lines, holding back only the unfinished tail."""
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._tail = ""
+
+    def feed(self, chunk: bytes, final: bool = False) -> list:
+        text = self._tail + self._decoder.decode(chunk, final)
+        lines = text.splitlines(keepends=True)
+        self._tail = "" if final or not lines or lines[-1].endswith(("\n", "\r")) else lines.pop()
+        return lines
+
+
+class CsvRecords:
+    """
+    Joins lines into CSV records: a quoted field may span lines, and a record is complete
+    once its quote count is even. The first record is the header.
+    """
+
+    def __init__(self):
+        self.header = None
+        self._pending = ""
+
+    def feed(self, lines: list) -> Iterator[dict]:
+        for line in lines:
+            self._pending += line
+            if self._pending.count('"') % 2:
+                continue
+            record, self._pending = self._pending, ""
+            if not record.strip():
+                continue
+            values = next(csv.reader([record]))
+            if self.header is None:
+                self.header = [name.strip() for name in values]
+                continue
+            yield dict(zip(self.header, values))
+
+    def finish(self):
+        if self._pending.strip():
+            raise ValueError("unterminated quoted field at end of file")
+
+
+def parse_ndjson(line: str) -> Optional[dict]:
+    if not line.strip():
+        return None
+    row = json.loads(line)
+    if not isinstance(row, dict):
+        raise ValueError("each line must be a JSON object")
+    return row
+
+
+def clean_row(table: "crud.CrudTable", row: dict) -> tuple:
+    """Validate one row against the table's columns; returns the values in column order."""
+    values = []
+    for name in table.columns:
+        value = row.get(name)
+        if isinstance(value, str):
+            value = repair_text(value.strip()) or None
+        if name == "price" and value is not None and not isinstance(value, (int, float)):
+            # Same parsing as the offline ingestion ("Sale priceRM79.00" -> 79.0)
+            if not any(ch.isdigit() for ch in str(value)):
+                raise ValueError(f"price {value!r} is not a number")
+            value = parse_price(str(value))
+        elif value is not None and not isinstance(value, (str, int, float)):
+            raise ValueError(f"{name} must be a string")
+        values.append(value)
+    if values[table.columns.index("name")] is None:
+        raise ValueError("name is required")
+    return tuple(values)
+
+
+def upsert_sql(table: "crud.CrudTable") -> str:
+    keys = NATURAL_KEYS[table.table]
+    updates = ", ".join(f"{name} = excluded.{name}" for name in table.columns if name not in keys)
+    return (f"INSERT INTO {table.table} ({', '.join(table.columns)}) "
+            f"VALUES ({', '.join('?' * len(table.columns))}) "
+            f"ON CONFLICT ({conflict_target(table.table)}) DO UPDATE SET {updates}")
+
+
+# -------------------- Imports --------------------
+class ImportJob:
+    """Progress of one upload, updated as chunks commit and visible while it runs."""
+
+    def __init__(self, entity: str, fmt: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.entity = entity
+        self.format = fmt
+        self.status = "running"
+        self.started = time.time()
+        self.finished = None
+        self.bytes = 0
+        self.rows = 0
+        self.written = 0
+        self.rejected = 0
+        self.chunks = 0
+        self.errors = []
+
+    def reject(self, row: int, error: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERROR_SAMPLES:
+            self.errors.append({"row": row, "error": error})
+
+    def to_dict(self) -> dict:
+        elapsed = (self.finished or time.time()) - self.started
+        return {
+            "id": self.id,
+            "entity": self.entity,
+            "format": self.format,
+            "status": self.status,
+            "bytes": self.bytes,
+            "rows": self.rows,
+            "written": self.written,
+            "rejected": self.rejected,
+            "chunks": self.chunks,
+            "rows_per_second": round(self.rows / elapsed) if elapsed > 0 else 0,
+            "seconds": round(elapsed, 3),
+            "errors": self.errors,
+        }
+
+
+class Importer:
+    """
+    Streams CSV or NDJSON uploads into a catalog table. Rows are parsed and validated as
+    bytes arrive and upserted on the table's natural key in transactions of
+    IMPORT_CHUNK_ROWS rows through the writer. The next chunk is parsed while the last
+    one commits and waits for it before being submitted, so memory stays at two chunks
+    however large the upload is.
+    """
+
+    def __init__(self, chunk_rows: int = IMPORT_CHUNK_ROWS):
+        self.chunk_rows = chunk_rows
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def table(self, entity: str) -> "crud.CrudTable":
+        for table in crud.CATALOG_TABLES:
+            if entity in (table.router, table.table):
+                return table
+        raise HTTPException(status_code=404,
+                            detail=f"Unknown entity; use one of: {', '.join(t.router for t in crud.CATALOG_TABLES)}")
+
+    async def run(self, entity: str, fmt: str, body: AsyncIterator[bytes]) -> dict:
+        table = self.table(entity)
+        sql = upsert_sql(table)
+        job = ImportJob(table.router, fmt)
+        with self._lock:
+            self._jobs[job.id] = job
+        splitter, records, chunk = LineSplitter(), CsvRecords(), []
+        # The chunk being committed while the next one is parsed (at most two in memory)
+        writing = None
+
+        async def write(rows: list):
+            await crud.database.write_async(lambda conn: conn.executemany(sql, rows), "import")
+            table.written()
+            job.written += len(rows)
+            job.chunks += 1
+
+        async def flush():
+            nonlocal writing
+            if writing is not None:
+                await writing
+            writing = asyncio.ensure_future(write(list(chunk)))
+            chunk.clear()
+
+        def parsed(lines: list) -> Iterator[dict]:
+            if fmt == "csv":
+                # CSV records may span lines; a bad one is only known once it is complete
+                yield from records.feed(lines)
+                return
+            for line in lines:
+                try:
+                    row = parse_ndjson(line)
+                except ValueError as e:
+                    job.rows += 1
+                    job.reject(job.rows, f"invalid JSON: {e}")
+                    continue
+                if row is not None:
+                    yield row
+
+        try:
+            body_iter, final = body.__aiter__(), False
+            while not final:
+                try:
+                    data = await body_iter.__anext__()
+                except StopAsyncIteration:
+                    data, final = b"", True
+                job.bytes += len(data)
+                for row in parsed(splitter.feed(data, final)):
+                    job.rows += 1
+                    try:
+                        chunk.append(clean_row(table, row))
+                    except ValueError as e:
+                        job.reject(job.rows, str(e))
+                if len(chunk) >= self.chunk_rows:
+                    await flush()
+            if fmt == "csv":
+                records.finish()
+            if chunk:
+                await flush()
+            if writing is not None:
+                await writing
+            job.status = "done"
+        except HTTPException:
+            job.status = "failed"
+            raise
+        except Exception as e:
+            # Chunks committed before the failure stay committed
+            job.status = "failed"
+            job.errors.append({"row": job.rows, "error": str(e)})
+            raise HTTPException(status_code=400, detail=job.to_dict())
+        finally:
+            if writing is not None:
+                if writing.done():
+                    writing.exception()  # retrieved, so a failure is not logged a second time
+                else:
+                    writing.cancel()
+            job.finished = time.time()
+            self._prune()
+        return job.to_dict()
+
+    def _prune(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.status != "running"]
+            for job_id in finished[:-MAX_FINISHED_IMPORTS]:
+                del self._jobs[job_id]
+
+    def stats(self) -> list:
+        with self._lock:
+            return [job.to_dict() for job in reversed(self._jobs.values())]
+
+
+importer = Importer()
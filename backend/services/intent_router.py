@@ -0,0 +1,228 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+import numpy as np
+from typing import Dict, List, Tuple
+from dependencies import INTENT_ROUTER_THRESHOLD
+from services.metrics import record, INTENT_CLASSIFY
+
+# -------------------- Labels --------------------
+CATALOG = "catalog"
+OUTLET = "outlet"
+CHITCHAT = "chitchat"
+OTHER = "other"
+
+# Intents answered directly from retrieval + one LLM call
+DIRECT_INTENTS = (CATALOG, OUTLET)
+
+# LLM round trips per turn: agent tool decision + RAG summary + agent answer,
+# versus a single summary call on the direct path
+AGENT_LLM_CALLS = 3
+DIRECT_LLM_CALLS = 1
+
+# -------------------- Labelled prototypes --------------------
+PROTOTYPES: Dict[str, List[str]] = {
+    CATALOG: [
+        "How much is the All Day Cup?",
+        "What tumblers do you sell?",
+        "Show me the drinkware and mugs",
+        "What is the price of the CEO Latte?",
+        "Do you have any frappe drinks?",
+        "What food is on the menu?",
+        "List the pastries and cakes",
+        "Is there nasi lemak?",
+        "Which drinks are in the Oatside series?",
+        "What's the cheapest coffee?",
+        "Recommend a non-coffee drink",
+        "How much does a ceramic mug cost?",
+        "What sandwiches are available?",
+        "Do you sell cold cups or bottles?",
+    ],
+    OUTLET: [
+        "Where is the nearest ZUS Coffee outlet?",
+        "Which outlets are in Shah Alam?",
+        "List the stores in Kuala Lumpur",
+        "What is the address of the Bangsar branch?",
+        "Is there a ZUS outlet in Petaling Jaya?",
+        "Give me the location of the store in Ampang",
+        "How many outlets are there in Selangor?",
+        "Find a ZUS Coffee near Putrajaya",
+        "Google Maps link for the Subang outlet",
+        "Which mall has a ZUS Coffee store?",
+    ],
+    CHITCHAT: [
+        "Hi",
+        "Hello there",
+        "Good morning!",
+        "Thanks for your help",
+        "Thank you so much",
+        "How are you?",
+        "Who are you?",
+        "What can you do?",
+        "Bye, see you later",
+        "That's great, cheers",
+    ],
+    OTHER: [
+        "What is the weather today?",
+        "Write me a poem about the sea",
+        "Explain quantum computing",
+        "Translate this sentence into French",
+        "Who won the football match yesterday?",
+        "Help me debug my Python code",
+        "What is the capital of Japan?",
+        "Tell me the latest stock market news",
+    ],
+}
+
+# Held-out labelled questions used to report router accuracy
+EVAL_SET: List[Tuple[str, str]] = [
+    ("price of the All Day Cup 500ml", CATALOG),
+    ("do you have mugs for sale", CATALOG),
+    ("what's in the frappe buddy series", CATALOG),
+    ("any chicken rice dishes on the menu?", CATALOG),
+    ("how much is a Spanish Latte", CATALOG),
+    ("which tumbler is the biggest", CATALOG),
+    ("show me soft serve options", CATALOG),
+    ("what fruit refreshers do you have", CATALOG),
+    ("outlets in Bandar Seri Putra", OUTLET),
+    ("where can I find ZUS in Cheras", OUTLET),
+    ("address of the Giant Shah Alam store", OUTLET),
+    ("is there a branch near KLCC", OUTLET),
+    ("stores open in Subang Jaya", OUTLET),
+    ("list outlets in Kajang", OUTLET),
+    ("hey", CHITCHAT),
+    ("thanks a lot!", CHITCHAT),
+    ("good evening", CHITCHAT),
+    ("what are you able to help with", CHITCHAT),
+    ("see ya", CHITCHAT),
+    ("how do I bake sourdough bread at home", OTHER),
+    ("what's 17 times 23", OTHER),
+    ("recommend a good movie", OTHER),
+    ("who is the prime minister of Malaysia", OTHER),
+]
+
+
+# -------------------- Intent Router --------------------
+class IntentRouter:
+    """
+    Nearest-prototype intent classifier over the already-loaded sentence embedding model.
+    Catalog and outlet questions can then skip the agent's tool-decision LLM call.
+    """
+
+    def __init__(self, embed_model, prototypes: Dict[str, List[str]] = PROTOTYPES,
+                 threshold: float = INTENT_ROUTER_THRESHOLD):
+        self.embed_model = embed_model
+        self.threshold = threshold
+
+        self.labels: List[str] = []
+        texts: List[str] = []
+        for label, examples in prototypes.items():
+            self.labels.extend([label] * len(examples))
+            texts.extend(examples)
+        self.prototype_matrix = self._encode(texts)
+
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {label: 0 for label in prototypes}
+        self.total_turns = 0
+        self.direct_turns = 0
+        self.llm_calls_saved = 0
+        self.total_classify_ms = 0.0
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self.embed_model.encode(texts, convert_to_numpy=True), dtype="float32")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def classify_embedding(self, embedding: np.ndarray) -> Tuple[str, float]:
+        """
+        Classify a normalized (1, dim) query embedding.
+        Returns (label, score); low-confidence matches fall back to "other".
+        """
+        sims = self.prototype_matrix @ embedding[0]
+        best = int(np.argmax(sims))
+        score = float(sims[best])
+        label = self.labels[best] if score >= self.threshold else OTHER
+        return label, score
+
+    def classify(self, text: str) -> Tuple[str, float, np.ndarray]:
+        """
+        Embed and classify a message.
+        Returns (label, score, embedding) so the caller can reuse the embedding for retrieval.
+        """
+        start = time.perf_counter()
+        embedding = self._encode([text])
+        label, score = self.classify_embedding(embedding)
+        elapsed = time.perf_counter() - start
+        record(INTENT_CLASSIFY, elapsed)
+        elapsed_ms = elapsed * 1000
+
+        with self._lock:
+            self.total_turns += 1
+            self.counts[label] = self.counts.get(label, 0) + 1
+            self.total_classify_ms += elapsed_ms
+        return label, score, embedding
+
+    def record_direct(self):
+        """Record a turn answered on the direct retrieval path."""
+        with self._lock:
+            self.direct_turns += 1
+            self.llm_calls_saved += AGENT_LLM_CALLS - DIRECT_LLM_CALLS
+
+    def evaluate(self, samples: List[Tuple[str, str]] = EVAL_SET) -> dict:
+        """
+        Measure accuracy on labelled samples.
+        """
+        texts = [text for text, _ in samples]
+        embeddings = self._encode(texts)
+        confusion: Dict[str, Dict[str, int]] = {}
+        correct = 0
+        for (text, expected), embedding in zip(samples, embeddings):
+            predicted, _ = self.classify_embedding(embedding[None, :])
+            confusion.setdefault(expected, {}).setdefault(predicted, 0)
+            confusion[expected][predicted] += 1
+            correct += int(predicted == expected)
+
+        per_label = {
+            label: row.get(label, 0) / sum(row.values())
+            for label, row in confusion.items()
+        }
+        return {
+            "samples": len(samples),
+            "accuracy": correct / len(samples) if samples else 0.0,
+            "per_label_recall": per_label,
+            "confusion": confusion,
+            "threshold": self.threshold,
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "turns": self.total_turns,
+                "intents": dict(self.counts),
+                "direct_turns": self.direct_turns,
+                "llm_calls_saved": self.llm_calls_saved,
+                "llm_calls_saved_per_turn": self.llm_calls_saved / self.total_turns if self.total_turns else 0.0,
+                "avg_classify_ms": self.total_classify_ms / self.total_turns if self.total_turns else 0.0,
+            }
+
+
+# -------------------- Follow-up detection --------------------
+FOLLOW_UP_WORDS = {
+    "it", "its", "that", "those", "these", "them", "they", "this", "one", "ones",
+    "first", "second", "third", "last", "other", "another", "same", "also", "and",
+}
+
+
+def looks_like_follow_up(message: str, has_history: bool) -> bool:
+    """
+    Heuristic: a short message leaning on pronouns or ordinals only makes sense
+    with the previous turn, so it must not be answered without history.
+    """
+    if not has_history:
+        return False
+    words = [w.strip("?!.,'\"").lower() for w in message.split()]
+    return len(words) <= 12 and any(w in FOLLOW_UP_WORDS for w in words)
@@ -0,0 +1,207 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+# Seconds; covers sub-millisecond SQLite reads up to full agent turns
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0)
+
+# Span timings of the current request, set only when the caller asked for them (see main.py)
+request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+
+_registry = []
+
+
+# -------------------- Metric types --------------------
+class HistogramSeries:
+    """One labelled histogram series. Bucket counts are stored per bucket and cumulated on render."""
+
+    __slots__ = ("span_name", "upper_bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, span_name: str, upper_bounds):
+        self.span_name = span_name
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        i = bisect_left(self.upper_bounds, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def labels(self, *values: str) -> HistogramSeries:
+        """
+        Series for the label values. Look it up once and keep it on hot paths.
+        """
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                # Span name like "stage.embed_encode" or "llm_call.small"
+                span_name = ".".join((self.name[len("zus_"):].replace("_seconds", ""),) + values)
+                series = self._series.setdefault(values, HistogramSeries(span_name, self.buckets))
+        return series
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, series in sorted(self._series.items()):
+            with series._lock:
+                counts, total, count = list(series.counts), series.sum, series.count
+            labels = _format_labels(self.labelnames, values)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames + ('le',), values + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *values: str, amount: float = 1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, values)} {value}" for values, value in items)
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def render() -> str:
+    """Prometheus text exposition of every registered metric."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -------------------- Spans --------------------
+def record(series: HistogramSeries, seconds: float):
+    """Observe a duration and, when the request asked for timings, keep it as a span."""
+    series.observe(seconds)
+    spans = request_spans.get()
+    if spans is not None:
+        spans.append((series.span_name, seconds))
+
+
+class span:
+    """
+    Time a block into a histogram series:
+
+        with span(EMBED_ENCODE):
+            ...
+
+    A plain class rather than @contextmanager keeps the overhead to two
+    perf_counter calls and one histogram update.
+    """
+
+    __slots__ = ("series", "start")
+
+    def __init__(self, series: HistogramSeries):
+        self.series = series
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.series, time.perf_counter() - self.start)
+        return False
+
+
+def server_timing(spans: List[Tuple[str, float]]) -> str:
+    """Format spans as a Server-Timing header value (durations in ms)."""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in spans)
+
+
+# -------------------- Metrics --------------------
+REQUEST_SECONDS = Histogram("zus_request_seconds", "Total HTTP request time by endpoint.", ("method", "handler"))
+STAGE_SECONDS = Histogram("zus_stage_seconds", "Time spent in a retrieval stage.", ("stage",))
+LLM_CALL_SECONDS = Histogram("zus_llm_call_seconds", "Time of each LLM call by model tier.", ("tier",))
+AGENT_STEP_SECONDS = Histogram("zus_agent_step_seconds", "Time of each agent step (model call or tool call).", ("step",))
+SQLITE_QUERY_SECONDS = Histogram("zus_sqlite_query_seconds", "SQLite statement execution time by router.", ("router",))
+
+CACHE_EVENTS = Counter("zus_cache_events_total", "Cache lookups by cache and result (hit or miss).", ("cache", "result"))
+ERRORS = Counter("zus_errors_total", "Errors by kind.", ("kind",))
+LLM_TOKENS = Counter("zus_llm_tokens_total", "LLM tokens by endpoint, model and kind (input or output).",
+                     ("endpoint", "model", "kind"))
+LLM_COST = Counter("zus_llm_cost_usd_total", "Estimated LLM cost in USD by endpoint and model.", ("endpoint", "model"))
+REQUEST_TOKENS = Histogram("zus_request_tokens", "LLM tokens (input + output) used per request.", ("endpoint",),
+                           buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000))
+
+INTENT_CLASSIFY = STAGE_SECONDS.labels("intent_classify")
+EMBED_ENCODE = STAGE_SECONDS.labels("embed_encode")
+FAISS_SEARCH = STAGE_SECONDS.labels("faiss_search")
+METADATA_LOOKUP = STAGE_SECONDS.labels("metadata_lookup")
+AGENT_MODEL_STEP = AGENT_STEP_SECONDS.labels("model")
+AGENT_TOOL_STEP = AGENT_STEP_SECONDS.labels("tool")
+
+
+# -------------------- SQLite timing --------------------
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        with span(self.connection.query_series):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with span(self.connection.query_series):
+            return super().executemany(sql, seq_of_parameters)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute) time each statement."""
+
+    query_series = SQLITE_QUERY_SECONDS.labels("other")
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
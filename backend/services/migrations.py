@@ -0,0 +1,303 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import shutil
+import sqlite3
+import tempfile
+from typing import Callable, List, Sequence, Union
+from services.text_cleaning import repair_text
+from dependencies import DATABASE_PATH
+
+PRICED_TABLES = ("drinkware", "food", "drinks")
+VERSIONED_TABLES = PRICED_TABLES + ("outlets",)
+
+
+# -------------------- Migrations --------------------
+class Migration:
+    """
+    One schema step. `statements` run in order inside a single transaction; a callable
+    gets the connection (for data fixes SQL can't express).
+    """
+
+    def __init__(self, version: int, name: str, statements: Sequence[Union[str, Callable[[sqlite3.Connection], None]]]):
+        self.version = version
+        self.name = name
+        self.statements = list(statements)
+
+
+def _dedupe(table: str, keys: Sequence[str]) -> str:
+    """Delete all but the oldest row per natural key (rows with a NULL key part are kept)."""
+    not_null = " AND ".join(f"{key} IS NOT NULL" for key in keys)
+    return (f"DELETE FROM {table} WHERE {not_null} AND id NOT IN "
+            f"(SELECT MIN(id) FROM {table} GROUP BY {', '.join(keys)})")
+
+
+# Scraped text columns (URLs are left alone)
+TEXT_COLUMNS = {
+    "drinkware": ("name", "category"),
+    "food": ("name", "category"),
+    "drinks": ("name", "category"),
+    "outlets": ("name", "category", "address"),
+}
+
+
+def _repair_mojibake(conn: sqlite3.Connection):
+    """
+    Re-decode text the scraper stored double-encoded ("Spanish LattÃ©"), so search and
+    display see "Spanish Latté". A repaired row whose natural key now matches a clean
+    row is the same item, and is dropped like migration 2's duplicates.
+    """
+    for table, columns in TEXT_COLUMNS.items():
+        for row in conn.execute(f"SELECT id, {', '.join(columns)} FROM {table}").fetchall():
+            repaired = [repair_text(value) for value in row[1:]]
+            if repaired == list(row[1:]):
+                continue
+            try:
+                conn.execute("SAVEPOINT repair")
+                conn.execute(f"UPDATE {table} SET {', '.join(f'{c} = ?' for c in columns)} WHERE id = ?",
+                             (*repaired, row[0]))
+                conn.execute("RELEASE repair")
+            except sqlite3.IntegrityError:
+                conn.execute("ROLLBACK TO repair")
+                conn.execute("RELEASE repair")
+                conn.execute(f"DELETE FROM {table} WHERE id = ?", (row[0],))
+
+
+def _version_counter(table: str) -> List[str]:
+    return [
+        f"INSERT OR IGNORE INTO catalog_versions (name, version) "
+        f"VALUES ('{table}', CAST(strftime('%s', 'now') AS INTEGER))",
+        *[f"CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN "
+          f"UPDATE catalog_versions SET version = version + 1 WHERE name = '{table}'; END"
+          for event in ("INSERT", "UPDATE", "DELETE")],
+    ]
+
+
+# Natural keys: what makes a scraped row the same row on the next ingest
+NATURAL_KEYS = {
+    "drinkware": ("link",),
+    "food": ("name", "category"),
+    "drinks": ("name", "category"),
+    "outlets": ("name", "address"),
+    "embedding_metadata": ("item_type", "item_index"),
+}
+
+# Key columns that may be NULL. Unique indexes treat NULLs as distinct, so these are keyed
+# as COALESCE(column, '') (index and ON CONFLICT target alike): a row without a category
+# or address is still the same row on the next import. A lone NULL link identifies nothing
+# and embedding_metadata is never upserted, so those keys stay plain.
+NULLABLE_KEYS = {
+    "food": ("category",),
+    "drinks": ("category",),
+    "outlets": ("address",),
+}
+
+
+def key_expressions(table: str) -> List[str]:
+    return [f"COALESCE({column}, '')" if column in NULLABLE_KEYS.get(table, ()) else column
+            for column in NATURAL_KEYS[table]]
+
+
+def conflict_target(table: str) -> str:
+    """The ON CONFLICT target matching the table's unique natural-key index."""
+    return ", ".join(key_expressions(table))
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "catalog filter and sort indexes", [
+        # Price filters with and without a category, and the keyset sort keys of
+        # services/crud.py (expression indexes must match its sort expressions exactly)
+        *[sql for table in PRICED_TABLES for sql in (
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_category_price ON {table} (category, price)",
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_price ON {table} (price)",
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_price_sort ON {table} (COALESCE(price, -1))",
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_name ON {table} (name)",
+        )],
+        "CREATE INDEX IF NOT EXISTS idx_outlets_category_sort ON outlets (COALESCE(category, ''))",
+        "CREATE INDEX IF NOT EXISTS idx_outlets_name ON outlets (name)",
+    ]),
+    Migration(2, "unique natural keys", [
+        *[sql for table, keys in NATURAL_KEYS.items() for sql in (
+            _dedupe(table, keys),
+            f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table}_{'_'.join(keys)} ON {table} ({', '.join(keys)})",
+        )],
+    ]),
+    Migration(3, "catalog version counters", [
+        # Bumped by every write from any process, for ETags. Counters start at the current
+        # Unix time so a recreated database never reuses an old version
+        "CREATE TABLE IF NOT EXISTS catalog_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)",
+        *[sql for table in VERSIONED_TABLES for sql in _version_counter(table)],
+    ]),
+    Migration(4, "repair mis-encoded catalog text", [_repair_mojibake]),
+    Migration(5, "NULL-safe natural keys", [
+        # Same index names as migration 2, now over the COALESCE expressions
+        *[sql for table in NULLABLE_KEYS for sql in (
+            _dedupe(table, key_expressions(table)),
+            f"DROP INDEX IF EXISTS uq_{table}_{'_'.join(NATURAL_KEYS[table])}",
+            f"CREATE UNIQUE INDEX uq_{table}_{'_'.join(NATURAL_KEYS[table])} ON {table} ({conflict_target(table)})",
+        )],
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> List[str]:
+    """
+    Apply the migrations newer than the file's user_version, each with its version bump
+    in the same transaction. Runs inside the caller's transaction when one is open (the
+    writer's group commit); otherwise commits after each migration. Returns what ran.
+    """
+    applied = []
+    current = schema_version(conn)
+    for migration in MIGRATIONS:
+        if migration.version <= current:
+            continue
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            for step in migration.statements:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {migration.version}")
+            if own_transaction:
+                conn.execute("COMMIT")
+        except Exception:
+            if own_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        applied.append(f"{migration.version}: {migration.name}")
+    return applied
+
+
+def ensure_version_triggers(conn: sqlite3.Connection) -> List[str]:
+    """
+    Recreate missing catalog_versions triggers (dropping and recreating a table, as a
+    re-run of the ingestion script may, drops them with it) and bump those tables'
+    versions, since their rows may have changed unseen. Idempotent; a no-op before
+    migration 3. Returns the tables repaired.
+    """
+    if schema_version(conn) < 3:
+        return []
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    missing = [table for table in VERSIONED_TABLES if table in existing and not all(
+        f"{table}_version_{event}" in existing for event in ("insert", "update", "delete"))]
+    if not missing:
+        return []
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table in missing:
+            for sql in _version_counter(table):
+                conn.execute(sql)
+            conn.execute("UPDATE catalog_versions SET version = version + 1 WHERE name = ?", (table,))
+        if own_transaction:
+            conn.execute("COMMIT")
+    except Exception:
+        if own_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    return missing
+
+
+def upgrade(conn: sqlite3.Connection) -> List[str]:
+    """Pending migrations, then repair of what they created that has since been dropped."""
+    applied = migrate(conn)
+    applied += [f"3: catalog version counters (triggers restored on {table})" for table in ensure_version_triggers(conn)]
+    return applied
+
+
+def run_migrations():
+    """Bring the catalog schema up to date on this worker's writer (called at startup)."""
+    from services.database import database
+
+    try:
+        applied = database.write(upgrade, "migrations")
+        for name in applied:
+            print(f"Applied migration {name}")
+    except Exception as e:
+        print(f"⚠️ Catalog migrations failed, continuing on the current schema: {e}")
+
+
+# -------------------- Query plan check --------------------
+# Hot read paths, the index each must use, and whether that index must also deliver the
+# order (keyset pages must stop after LIMIT rows instead of sorting the whole table)
+HOT_QUERIES = [
+    ("SELECT * FROM drinks WHERE category = ? AND price >= ? AND price <= ?", "idx_drinks_category_price", False),
+    ("SELECT * FROM food t WHERE 1=1 AND t.price >= ? AND t.price <= ? ORDER BY t.id LIMIT ?", "idx_food_price", False),
+    ("SELECT *, COALESCE(price, -1) AS _sort_key FROM drinkware WHERE (COALESCE(price, -1), id) > (?, ?) "
+     "ORDER BY COALESCE(price, -1) ASC, id ASC LIMIT ?", "idx_drinkware_price_sort", True),
+    ("SELECT *, name AS _sort_key FROM outlets ORDER BY name DESC, id DESC LIMIT ?", "idx_outlets_name", True),
+    ("SELECT *, COALESCE(category, '') AS _sort_key FROM outlets WHERE (COALESCE(category, ''), id) > (?, ?) "
+     "ORDER BY COALESCE(category, '') ASC, id ASC LIMIT ?", "idx_outlets_category_sort", True),
+    ("SELECT * FROM embedding_metadata WHERE item_type = ?", "uq_embedding_metadata_item_type_item_index", False),
+    ("SELECT id FROM drinkware WHERE link = ?", "uq_drinkware_link", False),
+]
+
+
+def query_plan(conn: sqlite3.Connection, sql: str) -> str:
+    params = [None] * sql.count("?")
+    return "; ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+
+
+def check_plans(conn: sqlite3.Connection) -> List[str]:
+    """Problems with HOT_QUERIES' plans on a migrated database (empty when all use their index)."""
+    problems = []
+    for sql, index, ordered in HOT_QUERIES:
+        plan = query_plan(conn, sql)
+        if f"INDEX {index}" not in plan or (ordered and "USE TEMP B-TREE" in plan):
+            problems.append(f"{sql}\n    expected {index}, got: {plan}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Catalog schema migrations")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for command, description in (("status", "show the schema version and pending migrations"),
+                                 ("upgrade", "apply pending migrations to the database"),
+                                 ("check", "migrate a copy of the database and verify hot queries use indexes")):
+        sub.add_parser(command, help=description).add_argument("--db", default=DATABASE_PATH)
+    args = parser.parse_args()
+
+    if args.command == "check":
+        workdir = tempfile.mkdtemp(prefix="migrations-check-")
+        try:
+            path = os.path.join(workdir, "catalog.db")
+            shutil.copyfile(args.db, path)
+            conn = sqlite3.connect(path, isolation_level=None)
+            migrate(conn)
+            problems = check_plans(conn)
+            conn.close()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        for problem in problems:
+            print(f"✗ {problem}")
+        print(f"{len(HOT_QUERIES) - len(problems)}/{len(HOT_QUERIES)} hot queries use their index")
+        sys.exit(1 if problems else 0)
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        if args.command == "upgrade":
+            for name in upgrade(conn):
+                print(f"Applied migration {name}")
+        version = schema_version(conn)
+        print(f"Schema version {version} (latest {LATEST_VERSION})")
+        for migration in MIGRATIONS:
+            if migration.version > version:
+                print(f"  pending {migration.version}: {migration.name}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+from typing import Dict, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+from services.metrics import record, LLM_CALL_SECONDS, ERRORS
+from services.token_usage import token_ledger
+from services.fake_llm import estimate_tokens, message_text
+from dependencies import (
+    build_llm,
+    LLM_MODEL_SMALL,
+    LLM_MODEL_LARGE,
+    LLM_SUMMARY_TIER,
+    LLM_AGENT_TIER,
+    SMALL_TIER_MAX_PROMPT_CHARS,
+    ESCALATE_BELOW_SCORE,
+)
+
+SMALL = "small"
+LARGE = "large"
+
+# Task type -> default tier
+TASK_TIERS = {"summary": LLM_SUMMARY_TIER, "agent": LLM_AGENT_TIER}
+
+
+# -------------------- Per-tier metrics --------------------
+class TierMetrics(BaseCallbackHandler):
+    """
+    Callback attached to a tier's model client: records latency and token usage of
+    every call made through it, whether from the agent or a RAG summary. Calls whose
+    response carries no usage metadata are estimated from the prompt and answer text.
+    """
+
+    def __init__(self, tier: str, model: str):
+        self.tier = tier
+        self.model = model
+        self.series = LLM_CALL_SECONDS.labels(tier)
+        self._started: Dict[object, tuple] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt_tokens = estimate_tokens("\n".join(message_text(m) for batch in messages for m in batch))
+        with self._lock:
+            self._started[run_id] = (time.perf_counter(), prompt_tokens)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        ended = time.perf_counter()
+        input_tokens = output_tokens = 0
+        answer = []
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+                answer.append(generation.text)
+        with self._lock:
+            started, prompt_tokens = self._started.pop(run_id, (None, 0))
+
+        estimated = not (input_tokens or output_tokens)
+        if estimated:
+            input_tokens, output_tokens = prompt_tokens, estimate_tokens("".join(answer))
+        latency = ended - started if started is not None else 0.0
+
+        with self._lock:
+            self.calls += 1
+            self.total_latency += latency
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+        if started is not None:
+            record(self.series, latency)
+        token_ledger.record(self.model, input_tokens, output_tokens, estimated=estimated)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._started.pop(run_id, None)
+            self.errors += 1
+        ERRORS.inc("llm_call")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "model": self.model,
+                "calls": self.calls,
+                "errors": self.errors,
+                "avg_latency_ms": self.total_latency / self.calls * 1000 if self.calls else 0.0,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+            }
+
+
+# -------------------- Model Router --------------------
+class ModelRouter:
+    """
+    Picks a model tier per call. Summaries go to the small tier unless the prompt is
+    large or retrieval confidence is low; callers may also escalate after a failed
+    validation. Each tier's client is built once and shared.
+    """
+
+    def __init__(self, models: Optional[Dict[str, str]] = None, task_tiers: Optional[Dict[str, str]] = None,
+                 max_small_prompt_chars: int = SMALL_TIER_MAX_PROMPT_CHARS, min_score: float = ESCALATE_BELOW_SCORE):
+        self.models = models or {SMALL: LLM_MODEL_SMALL, LARGE: LLM_MODEL_LARGE}
+        self.task_tiers = task_tiers or TASK_TIERS
+        self.max_small_prompt_chars = max_small_prompt_chars
+        self.min_score = min_score
+        self.metrics = {tier: TierMetrics(tier, model) for tier, model in self.models.items()}
+        self._clients = {}
+        self._lock = threading.Lock()
+        self.routed = {tier: 0 for tier in self.models}
+        self.escalations = {"prompt_size": 0, "low_confidence": 0, "validation": 0}
+
+    def llm_for(self, tier: str):
+        client = self._clients.get(tier)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(tier)
+                if client is None:
+                    client = build_llm(self.models[tier], callbacks=[self.metrics[tier]])
+                    self._clients[tier] = client
+        return client
+
+    def choose(self, task: str, prompt_chars: int = 0, top_score: Optional[float] = None) -> str:
+        """
+        Tier for a task, escalating small-tier work on prompt size or low top retrieval score.
+        """
+        tier = self.task_tiers.get(task, LARGE)
+        if tier == SMALL:
+            if prompt_chars > self.max_small_prompt_chars:
+                tier = self.escalate("prompt_size")
+            elif top_score is not None and top_score < self.min_score:
+                tier = self.escalate("low_confidence")
+        with self._lock:
+            self.routed[tier] += 1
+        return tier
+
+    def escalate(self, reason: str) -> str:
+        with self._lock:
+            self.escalations[reason] += 1
+        return LARGE
+
+    def stats(self) -> dict:
+        with self._lock:
+            routed = dict(self.routed)
+            escalations = dict(self.escalations)
+        return {
+            "routed": routed,
+            "escalations": escalations,
+            "tiers": {tier: metrics.stats() for tier, metrics in self.metrics.items()},
+        }
+
+
+model_router = ModelRouter()
+
+
+def get_agent_llm():
+    """FastAPI dependency: the shared model client for agent reasoning."""
+    return model_router.llm_for(model_router.task_tiers.get("agent", LARGE))
@@ -0,0 +1,155 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+from services.metrics import request_spans
+from dependencies import (
+    QUERY_LOG_ENABLED,
+    QUERY_LOG_PATH,
+    QUERY_LOG_SAMPLE_RATE,
+    QUERY_LOG_FLUSH_INTERVAL,
+    QUERY_LOG_MAX_PENDING,
+)
+
+# Record of the sampled chat turn currently being handled
+_current_record: ContextVar[Optional[dict]] = ContextVar("current_query_record", default=None)
+
+
+class QueryLog:
+    """
+    Opt-in, sampled, append-only JSON Lines log of chat queries for replay and tuning.
+
+    The request only appends its record to an in-memory buffer; a writer thread
+    appends buffered records to the file in batches. When the buffer is full,
+    records are dropped (and counted) rather than slowing requests down.
+    """
+
+    def __init__(self, path: str = QUERY_LOG_PATH, sample_rate: float = QUERY_LOG_SAMPLE_RATE,
+                 enabled: bool = QUERY_LOG_ENABLED, flush_interval: float = QUERY_LOG_FLUSH_INTERVAL,
+                 max_pending: int = QUERY_LOG_MAX_PENDING):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.enabled = enabled and sample_rate > 0
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._pending: List[dict] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self.sampled = 0
+        self.written = 0
+        self.dropped = 0
+
+        self._writer = None
+        if self.enabled:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._writer = threading.Thread(target=self._write_loop, name="query-log-writer", daemon=True)
+            self._writer.start()
+
+    # -------------------- Request side --------------------
+    def start(self, query: str, session_id: str) -> Optional[dict]:
+        """
+        Decide whether to sample this turn. When sampled, returns the record that
+        annotate() fills in and enables span collection for the request.
+        """
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        record = {
+            "ts": time.time(),
+            "session_id": session_id,
+            "query": query,
+            "path": None,
+            "intent": None,
+            "cache": [],
+            "hit_ids": [],
+            "fallback": False,
+        }
+        _current_record.set(record)
+        if request_spans.get() is None:
+            request_spans.set([])
+        record["_started"] = time.perf_counter()
+        return record
+
+    def annotate(self, cache: Optional[str] = None, hits=None, **fields):
+        """
+        Add details to the current turn's record, if it is being sampled.
+        `cache` is the retrieval outcome ("follow_up", "speculative", "search", "direct").
+        """
+        record = _current_record.get()
+        if record is None:
+            return
+        if cache:
+            record["cache"].append(cache)
+        if hits:
+            record["hit_ids"].extend(hit["faiss_id"] for hit in hits if "faiss_id" in hit)
+        record.update(fields)
+
+    def finish(self, record: Optional[dict], status: int = 200):
+        """Close the record with its timing breakdown and queue it for writing."""
+        if record is None:
+            return
+        _current_record.set(None)
+        record["latency_ms"] = round((time.perf_counter() - record.pop("_started")) * 1000, 2)
+        record["status"] = status
+        timings = {}
+        for name, seconds in request_spans.get() or []:
+            timings[name] = round(timings.get(name, 0.0) + seconds * 1000, 2)
+        record["timings_ms"] = timings
+
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(record)
+            self.sampled += 1
+
+    # -------------------- Writer --------------------
+    def flush(self) -> int:
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch))
+        with self._lock:
+            self.written += len(batch)
+        return len(batch)
+
+    def _write_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Query log write error: {e}")
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join(timeout=2)
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "sampled": self.sampled,
+                "written": self.written,
+                "dropped": self.dropped,
+                "pending": len(self._pending),
+            }
+
+
+query_log = QueryLog()
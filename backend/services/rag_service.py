@@ -3,62 +3,85 @@ import sys
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import sqlite3
-import faiss
+import re
+import json
+import threading
 import numpy as np
-from sentence_transformers import SentenceTransformer
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from fastapi import HTTPException
-from dependencies import DATABASE_PATH, FAISS_INDEX_PATH, EMBEDDING_MODEL
+from dependencies import FAISS_INDEX_PATH, EMBEDDING_MODEL_SOURCE
+from services.database import database
+from services.resilience import call_with_resilience, mark_fallback, LLMUnavailableError
+from services.model_router import LARGE
+from services.metrics import span, EMBED_ENCODE, FAISS_SEARCH, METADATA_LOOKUP
 
 # -------------------- Config --------------------
 TOP_K_DEFAULT = 5
+NO_MATCH_MESSAGE = "I couldn't find any matching products, food, drinks, or outlets."
+MAX_CONCURRENT_SUMMARIES = 4
 
 # -------------------- RAG Service --------------------
 class RAGService:
-    def __init__(self, llm=None):
+    def __init__(self, llm=None, model_router=None):
         self.llm = llm
-        # Load embedding model
-        self.embed_model = SentenceTransformer(EMBEDDING_MODEL)
-        # Load FAISS index
-        try:
-            self.faiss_index = faiss.read_index(FAISS_INDEX_PATH)
-        except Exception as e:
-            raise RuntimeError(f"Failed to load FAISS index: {e}")
+        # When set, summaries without an explicit llm are routed across model tiers
+        self.model_router = model_router
+        # Embedding model and FAISS index load on first use (or during startup warm-up);
+        # sentence_transformers (torch) and faiss are only imported then
+        self._embed_model = None
+        self._faiss_index = None
+        self._load_lock = threading.Lock()
+
+    # -------------------- Lazy assets --------------------
+    @property
+    def embed_model(self):
+        if self._embed_model is None:
+            with self._load_lock:
+                if self._embed_model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._embed_model = SentenceTransformer(EMBEDDING_MODEL_SOURCE)
+        return self._embed_model
+
+    @property
+    def faiss_index(self):
+        if self._faiss_index is None:
+            with self._load_lock:
+                if self._faiss_index is None:
+                    import faiss
+                    try:
+                        self._faiss_index = faiss.read_index(FAISS_INDEX_PATH)
+                    except Exception as e:
+                        raise RuntimeError(f"Failed to load FAISS index: {e}")
+        return self._faiss_index
 
     # -------------------- Helper: Retrieve metadata --------------------
     def get_metadata(self, indices):
         """
         Fetch metadata from SQLite embedding_metadata table for given FAISS indices.
-        Returns a list of dicts corresponding to each index.
-        """
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        metadata = []
-        for idx in indices:
-            if idx == -1:  # invalid FAISS index
-                metadata.append(None)
-                continue
-            
-            # Convert numpy.int64 to Python int for SQLite compatibility
-            db_id = int(idx + 1)  # SQLite AUTOINCREMENT IDs start at 1
-            
-            cursor.execute(
-                "SELECT item_type, item_index, text FROM embedding_metadata WHERE id=?",
-                (db_id,)
-            )
-            row = cursor.fetchone()
-            
-            if row:
-                metadata.append({
-                    "item_type": row[0],
-                    "item_index": row[1],
-                    "text": row[2]
-                })
-            else:
-                metadata.append(None)
-        conn.close()
-        return metadata
+        Returns a list of dicts corresponding to each index (None for invalid/missing ones).
+        All indices are looked up in a single query.
+        """
+        # Convert numpy.int64 to Python int for SQLite compatibility.
+        # SQLite AUTOINCREMENT IDs start at 1; FAISS returns -1 for missing results.
+        db_ids = [int(idx) + 1 for idx in indices if idx != -1]
+        rows_by_id = {}
+        if db_ids:
+            with span(METADATA_LOOKUP), database.read("rag") as conn:
+                cursor = conn.cursor()
+                placeholders = ", ".join("?" * len(set(db_ids)))
+                cursor.execute(
+                    f"SELECT id, item_type, item_index, text FROM embedding_metadata WHERE id IN ({placeholders})",
+                    list(set(db_ids))
+                )
+                for row in cursor.fetchall():
+                    rows_by_id[row[0]] = {
+                        "item_type": row[1],
+                        "item_index": row[2],
+                        "text": row[3]
+                    }
+
+        return [None if idx == -1 else rows_by_id.get(int(idx) + 1) for idx in indices]
 
     # -------------------- Helper: Extract LLM response --------------------
     def extract_llm_content(self, response):
@@ -93,75 +116,193 @@ class RAGService:
         else:
             return str(response)
 
-    # -------------------- Search and summarize --------------------
-    def search_and_summarize(self, query: str, top_k: int = TOP_K_DEFAULT, llm=None):
+    # -------------------- Helper: Embed query --------------------
+    def embed_query(self, query: str):
         """
-        Main RAG function:
-        1. Embed user query
-        2. Search FAISS index
-        3. Retrieve metadata
-        4. Construct context and prompt
-        5. Call LLM
+        Encode a query into a normalized (1, dim) float32 matrix ready for FAISS.
         """
-        try:
-            # 1. Generate query embedding
+        import faiss
+        with span(EMBED_ENCODE):
             q_embedding = self.embed_model.encode([query], convert_to_numpy=True)
             faiss.normalize_L2(q_embedding)
+        return q_embedding
+
+    def embed_queries(self, queries):
+        """
+        Encode several queries in one batch into a normalized (n, dim) float32 matrix.
+        """
+        import faiss
+        with span(EMBED_ENCODE):
+            q_embeddings = self.embed_model.encode(list(queries), convert_to_numpy=True)
+            faiss.normalize_L2(q_embeddings)
+        return q_embeddings
+
+    # -------------------- Search --------------------
+    def search(self, query: str, top_k: int = TOP_K_DEFAULT, query_embedding=None):
+        """
+        Retrieval half of RAG:
+        1. Embed user query (skipped when the caller already has the embedding)
+        2. Search FAISS index
+        3. Retrieve metadata and build hits
+        """
+        # 1. Generate query embedding
+        q_embedding = query_embedding if query_embedding is not None else self.embed_query(query)
 
-            # 2. Search FAISS
+        # 2. Search FAISS
+        with span(FAISS_SEARCH):
             D, I = self.faiss_index.search(q_embedding, top_k)
-            hits_meta = self.get_metadata(I[0])
-
-            # 3. Construct hits and context
-            hits = []
-            context_pieces = []
-            for score, meta in zip(D[0], hits_meta):
-                if meta is None:
-                    continue
-                # Handle different item types
-                if meta["item_type"] == "drinkware":
-                    context = meta["text"]  # text already contains name, category, price
-                elif meta["item_type"] == "food":
-                    context = meta["text"]  # text already contains name, category, price
-                elif meta["item_type"] == "drink":
-                    context = meta["text"]  # text already contains name, category, price
-                elif meta["item_type"] == "outlet":
-                    context = meta["text"]  # text already contains name, region, address
-                else:
-                    context = meta["text"]
-                hits.append({"score": float(score), "doc": meta, "context": context})
-                context_pieces.append(context)
+        hits_meta = self.get_metadata(I[0])
+
+        return self._build_hits(D[0], I[0], hits_meta)
+
+    def _build_hits(self, scores, ids, hits_meta):
+        # Construct hits (text already contains name, category, price or address)
+        hits = []
+        for score, faiss_id, meta in zip(scores, ids, hits_meta):
+            if meta is None:
+                continue
+            hits.append({"score": float(score), "faiss_id": int(faiss_id), "doc": meta, "context": meta["text"]})
+        return hits
+
+    def search_by_vector(self, vector, top_k: int = TOP_K_DEFAULT):
+        """
+        Search with an existing normalized (1, dim) vector, e.g. one derived from earlier hits.
+        """
+        with span(FAISS_SEARCH):
+            D, I = self.faiss_index.search(vector, top_k)
+        return self._build_hits(D[0], I[0], self.get_metadata(I[0]))
 
+    def get_vectors(self, faiss_ids):
+        """
+        Reconstruct stored vectors for FAISS ids as a (n, dim) float32 matrix.
+        """
+        return np.vstack([self.faiss_index.reconstruct(int(i)) for i in faiss_ids])
+
+    def search_many(self, queries, top_k: int = TOP_K_DEFAULT):
+        """
+        Retrieve hits for several sub-queries at once: one batched encode, one FAISS
+        search over the whole query matrix and one metadata lookup.
+        Returns a list of hit lists in the same order as `queries`.
+        """
+        q_embeddings = self.embed_queries(queries)
+        with span(FAISS_SEARCH):
+            D, I = self.faiss_index.search(q_embeddings, top_k)
+        hits_meta = self.get_metadata(I.reshape(-1))
+
+        results = []
+        for row, (scores, ids) in enumerate(zip(D, I)):
+            results.append(self._build_hits(scores, ids, hits_meta[row * top_k:(row + 1) * top_k]))
+        return results
+
+    # -------------------- Summarize --------------------
+    def build_prompt(self, query: str, hits):
+        docs_context = "\n\n".join(hit["context"] for hit in hits)
+        return (
+            f"You are a helpful assistant for ZUS Coffee internal operations.\n"
+            f"User Request: {query}\n\n"
+            f"Here are the top relevant entries from our database:\n"
+            f"{docs_context}\n\n"
+            f"Task: Provide a concise, clear, and helpful summary to the user. "
+            f"Include the names, prices (if available), and addresses or links where applicable."
+        )
+
+    def summarize(self, query: str, hits, llm=None):
+        """
+        Generation half of RAG: construct the prompt from hits and call the LLM.
+        """
+        if llm is None and self.model_router is not None:
+            return self._summarize_routed(query, hits)
+        llm_to_use = llm or self.llm
+        if llm_to_use is None:
+            return "LLM not configured. Context retrieved:\n" + "\n\n".join(hit["context"] for hit in hits)
+        try:
+            summary_response = call_with_resilience(llm_to_use.invoke, self.build_prompt(query, hits))
+        except LLMUnavailableError as e:
+            # Slow or failing model: answer straight from the hits instead of erroring
+            print(f"RAG summary fallback: {e}")
+            mark_fallback()
+            return format_fallback_answer(hits)
+        # Extract content using helper method
+        return self.extract_llm_content(summary_response).strip()
+
+    def _summarize_routed(self, query: str, hits):
+        """
+        Summarize on the tier picked by the model router, retrying once on the
+        large tier when a small-tier summary fails validation.
+        """
+        router = self.model_router
+        prompt = self.build_prompt(query, hits)
+        tier = router.choose("summary", len(prompt), max(hit["score"] for hit in hits))
+        try:
+            summary = self.extract_llm_content(call_with_resilience(router.llm_for(tier).invoke, prompt)).strip()
+            if tier != LARGE and not validate_summary(summary, hits):
+                router.escalate("validation")
+                summary = self.extract_llm_content(call_with_resilience(router.llm_for(LARGE).invoke, prompt)).strip()
+        except LLMUnavailableError as e:
+            print(f"RAG summary fallback: {e}")
+            mark_fallback()
+            return format_fallback_answer(hits)
+        return summary
+
+    def summarize_many(self, queries, hits_per_query, llm=None):
+        """
+        Summarize several sub-queries concurrently. Sub-queries without hits
+        get the no-match message without an LLM call.
+        """
+        summaries = [NO_MATCH_MESSAGE] * len(queries)
+        pending = [i for i, hits in enumerate(hits_per_query) if hits]
+
+        # Calls run on a thread pool, so total time is roughly the slowest call.
+        # Each runs in a copy of this context so the request deadline still applies.
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SUMMARIES) as executor:
+            futures = {
+                i: executor.submit(copy_context().run, self.summarize, queries[i], hits_per_query[i], llm)
+                for i in pending
+            }
+            for i, future in futures.items():
+                summaries[i] = future.result()
+        return summaries
+
+    # -------------------- Search and summarize --------------------
+    def search_and_summarize(self, query: str, top_k: int = TOP_K_DEFAULT, llm=None, query_embedding=None, hits=None):
+        """
+        Main RAG function: retrieve the top hits (unless precomputed hits are given),
+        then have the LLM summarize them.
+        """
+        try:
+            if hits is None:
+                hits = self.search(query, top_k, query_embedding=query_embedding)
             if not hits:
                 return {
                     "query": query,
-                    "summary": "I couldn't find any matching products, food, drinks, or outlets.",
+                    "summary": NO_MATCH_MESSAGE,
                     "hits": []
                 }
 
-            # 4. Construct prompt for LLM
-            docs_context = "\n\n".join(context_pieces)
-            prompt = (
-                f"You are a helpful assistant for ZUS Coffee internal operations.\n"
-                f"User Request: {query}\n\n"
-                f"Here are the top relevant entries from our database:\n"
-                f"{docs_context}\n\n"
-                f"Task: Provide a concise, clear, and helpful summary to the user. "
-                f"Include the names, prices (if available), and addresses or links where applicable."
-            )
-
-            # 5. Call LLM
-            llm_to_use = llm or self.llm
-            if llm_to_use is None:
-                summary_text = "LLM not configured. Context retrieved:\n" + docs_context
-            else:
-                summary_response = llm_to_use.invoke(prompt)
-                # Extract content using helper method
-                summary_text = self.extract_llm_content(summary_response)
+            return {
+                "query": query,
+                "summary": self.summarize(query, hits, llm=llm),
+                "hits": hits
+            }
 
+        except Exception as e:
+            print(f"RAG Service Error: {e}")
+            import traceback
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail="Internal error processing the query.")
+
+    # -------------------- Search and format (raw context) --------------------
+    def search_and_format(self, query: str, top_k: int = TOP_K_DEFAULT, query_embedding=None, hits=None):
+        """
+        Retrieval without an LLM pass: returns compact structured hits as the
+        context, leaving the single generation to the caller (e.g. the agent).
+        """
+        try:
+            if hits is None:
+                hits = self.search(query, top_k, query_embedding=query_embedding)
             return {
                 "query": query,
-                "summary": summary_text.strip(),
+                "context": format_hits_compact(hits) if hits else NO_MATCH_MESSAGE,
                 "hits": hits
             }
 
@@ -169,4 +310,113 @@ class RAGService:
             print(f"RAG Service Error: {e}")
             import traceback
             traceback.print_exc()
-            raise HTTPException(status_code=500, detail="Internal error processing the query.")
\ No newline at end of file
+            raise HTTPException(status_code=500, detail="Internal error processing the query.")
+
+
+    # -------------------- Multi-query variants --------------------
+    def search_and_summarize_many(self, queries, top_k: int = TOP_K_DEFAULT, llm=None):
+        """
+        Compound questions: batch-retrieve all sub-queries, summarize them
+        concurrently and merge the answers into one context.
+        """
+        try:
+            hits_per_query = self.search_many(queries, top_k)
+            summaries = self.summarize_many(queries, hits_per_query, llm=llm)
+            return {
+                "queries": list(queries),
+                "summary": merge_sections(queries, summaries),
+                "hits": hits_per_query
+            }
+
+        except Exception as e:
+            print(f"RAG Service Error: {e}")
+            import traceback
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail="Internal error processing the query.")
+
+    def search_and_format_many(self, queries, top_k: int = TOP_K_DEFAULT):
+        """
+        Compound questions in raw context mode: batch-retrieve and return compact hits per sub-query.
+        """
+        try:
+            hits_per_query = self.search_many(queries, top_k)
+            contexts = [format_hits_compact(hits) if hits else NO_MATCH_MESSAGE for hits in hits_per_query]
+            return {
+                "queries": list(queries),
+                "context": merge_sections(queries, contexts),
+                "hits": hits_per_query
+            }
+
+        except Exception as e:
+            print(f"RAG Service Error: {e}")
+            import traceback
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail="Internal error processing the query.")
+
+
+def format_fallback_answer(hits) -> str:
+    """
+    Retrieval-only answer used when the LLM is unavailable or out of time.
+    """
+    lines = ["Here's what I found in our database:"]
+    for hit in hits:
+        item = parse_hit(hit)
+        if "name" not in item:
+            lines.append(f"- {item.get('text', hit['context'])}")
+            continue
+        details = [item[field] for field in ("price", "category", "address") if item.get(field)]
+        lines.append(f"- **{item['name']}**" + (f" — {' — '.join(details)}" if details else ""))
+    return "\n".join(lines)
+
+
+def validate_summary(summary: str, hits) -> bool:
+    """
+    Cheap check that a summary is grounded in the hits: non-empty and naming at least one of them.
+    """
+    if not summary:
+        return False
+    names = [item["name"].lower() for item in map(parse_hit, hits) if "name" in item]
+    return not names or any(name in summary.lower() for name in names)
+
+
+def merge_sections(queries, texts) -> str:
+    """
+    Merge per-sub-query results into one context, headed by each sub-query.
+    """
+    return "\n\n".join(f"### {query}\n{text}" for query, text in zip(queries, texts))
+
+
+# -------------------- Compact hit formatting --------------------
+# Metadata text looks like "Drink: Spanish Latte, Category: soe, Price: RM12.9"
+# or "Outlet: ZUS Coffee – Bangsar, Category: Kuala Lumpur/Selangor, Address: ..."
+HIT_TEXT_PATTERN = re.compile(
+    r"^(?P<kind>\w+):\s*(?P<name>.*?)"
+    r"(?:,\s*(?:Category|Region):\s*(?P<category>.*?))?"
+    r"(?:,\s*Price:\s*(?P<price>[^,]*))?"
+    r"(?:,\s*Address:\s*(?P<address>.*))?$"
+)
+
+
+def parse_hit(hit) -> dict:
+    """
+    Turn a hit into a compact dict with only the fields the agent needs.
+    """
+    doc = hit["doc"]
+    item = {"type": doc["item_type"]}
+    match = HIT_TEXT_PATTERN.match(doc["text"])
+    if match:
+        for field in ("name", "category", "price", "address"):
+            value = match.group(field)
+            if value and value not in ("N/A", "None", "RMN/A", "RMNone"):
+                item[field] = value.strip()
+    else:
+        item["text"] = doc["text"]
+    item["score"] = round(hit["score"], 3)
+    return item
+
+
+def format_hits_compact(hits) -> str:
+    """
+    One JSON object per line, without whitespace padding, to keep tool output tokens low.
+    """
+    return "\n".join(json.dumps(parse_hit(hit), ensure_ascii=False, separators=(",", ":")) for hit in hits)
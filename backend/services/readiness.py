@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class Readiness:
+    """
+    Tracks background loading of heavy assets. Each asset's status and load time is
+    kept for the readiness probe; the process is ready once mark_ready() is called
+    after the warm-up succeeds.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.ready = False
+        self.ready_after = None
+        self.assets: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, name: str, fn):
+        """Run one loading step, recording its duration and any error, and return its result."""
+        with self._lock:
+            self.assets[name] = {"status": "loading"}
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            with self._lock:
+                self.assets[name] = {"status": "failed", "seconds": round(time.perf_counter() - start, 3), "error": str(e)}
+            raise
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.assets[name] = {"status": "loaded", "seconds": round(seconds, 3)}
+        print(f"Loaded {name} in {seconds:.2f}s")
+        return result
+
+    def mark_ready(self):
+        with self._lock:
+            self.ready = True
+            self.ready_after = round(time.monotonic() - self.started_at, 3)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "ready_after_seconds": self.ready_after,
+                "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+                "assets": {name: dict(asset) for name, asset in self.assets.items()},
+            }
+
+
+readiness = Readiness()
@@ -0,0 +1,250 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextvars import ContextVar, copy_context
+from typing import Callable, Optional
+from services.metrics import ERRORS
+from dependencies import (
+    LLM_CALL_TIMEOUT,
+    LLM_HEDGE_AFTER,
+    LLM_MAX_WORKERS,
+    LLM_MAX_CONCURRENT,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_SECONDS,
+)
+
+
+# -------------------- Errors --------------------
+class LLMUnavailableError(Exception):
+    """The model call did not produce an answer in time; callers should fall back."""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    pass
+
+
+class DeadlineExceededError(LLMUnavailableError):
+    pass
+
+
+class LLMTimeoutError(LLMUnavailableError):
+    pass
+
+
+# -------------------- Deadline --------------------
+class Deadline:
+    """
+    Per-request time budget. Set once by the endpoint and read by every model call
+    made on behalf of the request, including those inside agent steps and tools.
+    Calls still running when they time out are passed to `on_abandon` (the admission
+    slot holds on to them), since a running thread cannot be cancelled.
+    """
+
+    def __init__(self, seconds: float, on_abandon: Optional[Callable[[Future], None]] = None):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.fell_back = False
+        self.on_abandon = on_abandon
+
+    def abandon(self, future: Future):
+        if self.on_abandon is not None:
+            self.on_abandon(future)
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def start_deadline(seconds: float, on_abandon: Optional[Callable[[Future], None]] = None) -> Deadline:
+    deadline = Deadline(seconds, on_abandon)
+    current_deadline.set(deadline)
+    return deadline
+
+
+# -------------------- Circuit Breaker --------------------
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_seconds`; then lets a single trial call through (half-open).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.times_opened += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "times_opened": self.times_opened,
+            }
+
+
+# -------------------- Guarded model calls --------------------
+llm_breaker = CircuitBreaker()
+# Single model calls (summaries, classification). Whole agent runs make such calls
+# themselves, so they get their own pool: an agent waiting on a summary must never be
+# what keeps the summary from getting a worker. Agent runs, abandoned ones included,
+# hold an LLM admission slot, so LLM_MAX_CONCURRENT workers are always enough.
+_executor = ThreadPoolExecutor(max_workers=LLM_MAX_WORKERS, thread_name_prefix="llm-call")
+agent_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENT, thread_name_prefix="llm-agent")
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "failures": 0, "timeouts": 0, "abandoned": 0, "rejected": 0, "hedges": 0,
+          "hedge_wins": 0, "requests": 0, "fallbacks": 0}
+
+
+def _count(key: str, n: int = 1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def call_with_resilience(fn, *args, timeout: float = LLM_CALL_TIMEOUT, hedge_after: Optional[float] = LLM_HEDGE_AFTER,
+                         breaker: CircuitBreaker = llm_breaker, executor: Optional[ThreadPoolExecutor] = None,
+                         **kwargs):
+    """
+    Run a model call with a hard timeout bounded by the request deadline, on `executor`
+    (the single-call pool by default; pass agent_executor for calls that make model calls).
+
+    If `hedge_after` seconds pass without an answer, a second identical call is
+    started and whichever finishes first wins. Failures and timeouts feed the
+    circuit breaker; every way of not getting an answer raises LLMUnavailableError.
+    """
+    if not breaker.allow():
+        _count("rejected")
+        ERRORS.inc("llm_circuit_open")
+        raise CircuitOpenError("LLM circuit breaker is open")
+
+    budget = timeout
+    deadline = current_deadline.get()
+    if deadline is not None:
+        budget = min(budget, deadline.remaining())
+    if budget <= 0:
+        raise DeadlineExceededError("Request deadline exhausted before the model call")
+
+    _count("calls")
+    started = time.monotonic()
+    # Each attempt runs in its own copy of the caller's context (deadline, session, speculation)
+    executor = executor or _executor
+    primary = executor.submit(copy_context().run, fn, *args, **kwargs)
+    futures = [primary]
+    hedged = False
+    last_error = None
+
+    while futures:
+        remaining = budget - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        wait_for = remaining
+        if hedge_after is not None and not hedged:
+            wait_for = min(remaining, max(0.0, hedge_after - (time.monotonic() - started)))
+
+        done, _ = wait(futures, timeout=wait_for, return_when=FIRST_COMPLETED)
+        if not done:
+            if hedge_after is not None and not hedged and budget - (time.monotonic() - started) > 0:
+                hedged = True
+                _count("hedges")
+                futures.append(executor.submit(copy_context().run, fn, *args, **kwargs))
+            continue
+
+        for future in done:
+            futures.remove(future)
+            error = future.exception()
+            if error is None:
+                breaker.record_success()
+                if future is not primary:
+                    _count("hedge_wins")
+                return future.result()
+            last_error = error
+
+    breaker.record_failure()
+    if futures:
+        for future in futures:
+            # cancel() only stops calls still queued; a running one keeps its worker and
+            # quota until it returns, so it stays counted against the request's admission
+            if not future.cancel():
+                _count("abandoned")
+                if deadline is not None:
+                    deadline.abandon(future)
+        _count("timeouts")
+        ERRORS.inc("llm_timeout")
+        raise LLMTimeoutError(f"Model call exceeded {budget:.1f}s")
+    _count("failures")
+    ERRORS.inc("llm_failure")
+    raise LLMUnavailableError(f"Model call failed: {last_error}") from last_error
+
+
+def mark_fallback():
+    """
+    Note that part of the current request was answered from retrieval only because
+    the model was unavailable. Outside a request scope it is counted immediately.
+    """
+    deadline = current_deadline.get()
+    if deadline is None:
+        _count("fallbacks")
+    else:
+        deadline.fell_back = True
+
+
+def record_request(deadline: Deadline):
+    """Count a finished LLM-backed request and whether it needed the fallback."""
+    _count("requests")
+    if deadline.fell_back:
+        _count("fallbacks")
+
+
+def stats() -> dict:
+    with _stats_lock:
+        snapshot = dict(_stats)
+    snapshot["fallback_rate"] = snapshot["fallbacks"] / snapshot["requests"] if snapshot["requests"] else 0.0
+    snapshot["breaker"] = llm_breaker.stats()
+    return snapshot
@@ -0,0 +1,153 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import numpy as np
+from services.intent_router import FOLLOW_UP_WORDS, looks_like_follow_up
+from services.speculation import content_words
+from services.metrics import CACHE_EVENTS
+from dependencies import RETRIEVAL_CACHE_SESSIONS
+
+# Session of the chat turn currently being handled, set by the /chat endpoint
+current_session_id: ContextVar[Optional[str]] = ContextVar("current_session_id", default=None)
+
+ORDINALS = {
+    "first": 0, "1st": 0, "second": 1, "2nd": 1, "third": 2, "3rd": 2,
+    "fourth": 3, "4th": 3, "fifth": 4, "5th": 4, "last": -1,
+}
+
+# Words that point back at the previous turn, or ask about its items, without naming anything new
+REFERENTIAL_WORDS = FOLLOW_UP_WORDS | set(ORDINALS) | {
+    "more", "else", "again", "detail", "details", "info", "information", "what's", "whats",
+    "price", "prices", "cost", "costs", "address", "located", "location", "open", "hours", "near",
+}
+
+
+class ConversationRetrievalCache:
+    """
+    Keeps each session's previous-turn hits (FAISS ids + vectors) so follow-ups like
+    "and how much is the second one?" are answered without embedding the fragment:
+
+    1. an ordinal reference picks that hit from the previous turn
+    2. otherwise the cached hits are re-ranked by keyword overlap with the follow-up
+    3. otherwise a narrow FAISS search is seeded with the centroid of the cached vectors
+
+    A follow-up naming something none of the cached hits mention ("and outlets in Cheras?")
+    is left to a real search.
+    """
+
+    def __init__(self, rag_service, max_sessions: int = RETRIEVAL_CACHE_SESSIONS):
+        self.rag_service = rag_service
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    # -------------------- Store --------------------
+    def remember(self, hits: List[dict], session_id: Optional[str] = None):
+        """
+        Record a turn's hits for the session (defaults to the current chat session).
+        """
+        session_id = session_id or current_session_id.get()
+        if not session_id or not hits:
+            return
+        ids = [hit["faiss_id"] for hit in hits if "faiss_id" in hit]
+        vectors = self.rag_service.get_vectors(ids) if ids else None
+        with self._lock:
+            self._entries[session_id] = {"hits": list(hits), "vectors": vectors}
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                evicted, _ = self._entries.popitem(last=False)
+                self._stats.pop(evicted, None)
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+            self._stats.pop(session_id, None)
+
+    # -------------------- Lookup --------------------
+    def resolve_follow_up(self, query: str, top_k: int = 5) -> Optional[List[dict]]:
+        """
+        Return hits for a follow-up query from the session's previous turn, or None
+        when the query is not a follow-up or nothing is cached.
+        """
+        session_id = current_session_id.get()
+        if not session_id:
+            return None
+        with self._lock:
+            entry = self._entries.get(session_id)
+        if not looks_like_follow_up(query, has_history=entry is not None):
+            return None
+        if self._names_something_new(query, entry["hits"]):
+            self._record(session_id, hit=False)
+            return None
+
+        hits = self._from_ordinal(query, entry["hits"])
+        if hits is None:
+            hits = self._rerank(query, entry["hits"])
+        if hits is None and entry["vectors"] is not None:
+            hits = self._narrow_search(entry["vectors"], top_k)
+
+        self._record(session_id, hit=hits is not None)
+        return hits[:top_k] if hits else None
+
+    def _names_something_new(self, query: str, hits: List[dict]) -> bool:
+        known = set().union(*(content_words(hit["context"]) for hit in hits))
+        for word in content_words(query) - REFERENTIAL_WORDS:
+            # "outlets" still refers to hits that say "Outlet"
+            if word not in known and word.removesuffix("s") not in known and word + "s" not in known:
+                return True
+        return False
+
+    def _from_ordinal(self, query: str, hits: List[dict]) -> Optional[List[dict]]:
+        for word in query.lower().replace("?", " ").split():
+            position = ORDINALS.get(word)
+            if position is not None and -len(hits) <= position < len(hits):
+                chosen = hits[position]
+                return [chosen] + [h for h in hits if h is not chosen]
+        return None
+
+    def _rerank(self, query: str, hits: List[dict]) -> Optional[List[dict]]:
+        words = content_words(query)
+        overlaps = [len(words & content_words(hit["context"])) for hit in hits]
+        if not any(overlaps):
+            return None
+        order = sorted(range(len(hits)), key=lambda i: (-overlaps[i], -hits[i]["score"]))
+        return [hits[i] for i in order]
+
+    def _narrow_search(self, vectors: np.ndarray, top_k: int) -> List[dict]:
+        centroid = vectors.mean(axis=0, keepdims=True).astype("float32")
+        centroid /= max(float(np.linalg.norm(centroid)), 1e-12)
+        return self.rag_service.search_by_vector(centroid, top_k)
+
+    # -------------------- Stats --------------------
+    def _record(self, session_id: str, hit: bool):
+        with self._lock:
+            stats = self._stats.setdefault(session_id, {"follow_ups": 0, "hits": 0, "misses": 0})
+            stats["follow_ups"] += 1
+            stats["hits" if hit else "misses"] += 1
+        CACHE_EVENTS.inc("follow_up_retrieval", "hit" if hit else "miss")
+
+    def session_stats(self, session_id: str) -> dict:
+        with self._lock:
+            stats = dict(self._stats.get(session_id, {"follow_ups": 0, "hits": 0, "misses": 0}))
+            stats["cached_hits"] = len(self._entries.get(session_id, {}).get("hits", []))
+        stats["hit_rate"] = stats["hits"] / stats["follow_ups"] if stats["follow_ups"] else 0.0
+        return stats
+
+    def stats(self) -> dict:
+        with self._lock:
+            follow_ups = sum(s["follow_ups"] for s in self._stats.values())
+            hits = sum(s["hits"] for s in self._stats.values())
+            sessions = len(self._entries)
+        return {
+            "sessions": sessions,
+            "follow_ups": follow_ups,
+            "hits": hits,
+            "hit_rate": hits / follow_ups if follow_ups else 0.0,
+        }
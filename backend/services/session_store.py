@@ -0,0 +1,419 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import abc
+import json
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from dependencies import (
+    SESSION_BACKEND,
+    SESSION_DB_PATH,
+    SESSION_REDIS_URL,
+    SESSION_TTL_SECONDS,
+    SESSION_CACHE_SIZE,
+    SESSION_CACHE_TTL,
+    SESSION_FLUSH_INTERVAL,
+)
+from services.metrics import CACHE_EVENTS
+
+# Chat messages are stored as plain {"role": ..., "content": ...} dicts so every
+# backend can serialize them without knowing about the pydantic schemas.
+
+
+# -------------------- Base Store --------------------
+class SessionStore(abc.ABC):
+    """
+    Interface for chat session storage.
+    Backends only need to append messages, read a full history and clear it.
+    """
+
+    @abc.abstractmethod
+    def get(self, session_id: str) -> List[dict]:
+        ...
+
+    @abc.abstractmethod
+    def append(self, session_id: str, messages: List[dict]) -> None:
+        ...
+
+    @abc.abstractmethod
+    def clear(self, session_id: str) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+# -------------------- In-Memory Store --------------------
+class MemorySessionStore(SessionStore):
+    """
+    Process-local storage. Only safe with a single uvicorn worker.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, List[dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> List[dict]:
+        with self._lock:
+            return list(self._sessions.get(session_id, []))
+
+    def append(self, session_id: str, messages: List[dict]) -> None:
+        with self._lock:
+            self._sessions.setdefault(session_id, []).extend(messages)
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+# -------------------- SQLite Store --------------------
+class SQLiteSessionStore(SessionStore):
+    """
+    Shared storage for all workers on one host, backed by a WAL-mode SQLite file.
+
+    Appends are buffered in memory and written behind by a flusher thread in
+    batches, so a chat turn never waits on fsync. Reads merge the on-disk rows
+    with this worker's not-yet-flushed messages.
+    """
+
+    def __init__(self, db_path: str = SESSION_DB_PATH, flush_interval: float = SESSION_FLUSH_INTERVAL,
+                 max_batch: int = 500):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._pending: List[tuple] = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        conn = self._connect()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, id)")
+        conn.commit()
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="session-store-flusher", daemon=True)
+        self._flusher.start()
+
+    def _connect(self):
+        """Return this thread's connection, opening it in WAL mode on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, session_id: str) -> List[dict]:
+        rows = self._connect().execute(
+            "SELECT role, content FROM chat_messages WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ).fetchall()
+        messages = [{"role": role, "content": content} for role, content in rows]
+
+        with self._pending_lock:
+            messages.extend(
+                {"role": role, "content": content}
+                for sid, role, content, _ in self._pending
+                if sid == session_id
+            )
+        return messages
+
+    def append(self, session_id: str, messages: List[dict]) -> None:
+        now = time.time()
+        with self._pending_lock:
+            self._pending.extend((session_id, m["role"], m["content"], now) for m in messages)
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wakeup.set()
+
+    def clear(self, session_id: str) -> None:
+        with self._pending_lock:
+            self._pending = [p for p in self._pending if p[0] != session_id]
+        with self._write_lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+            conn.commit()
+
+    def flush(self) -> int:
+        """Write all buffered messages in one transaction. Returns the number written."""
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            conn = self._connect()
+            try:
+                conn.executemany(
+                    "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                    batch
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                # Put the batch back in front so ordering is preserved for the next attempt
+                with self._pending_lock:
+                    self._pending = batch + self._pending
+                raise
+            return len(batch)
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Session store flush error: {e}")
+
+    def close(self) -> None:
+        self._closed = True
+        self._wakeup.set()
+        self._flusher.join(timeout=2)
+        self.flush()
+
+
+# -------------------- Redis Store --------------------
+class RespError(Exception):
+    """Error reply returned by a Redis-compatible server."""
+
+
+class RespClient:
+    """
+    Minimal client for the Redis serialization protocol (RESP2).
+    Works against Redis, Valkey, KeyDB or any local stand-in that speaks RESP.
+    """
+
+    def __init__(self, url: str = SESSION_REDIS_URL, timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile("rb")
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        for command in setup:
+            self._send([command])
+            reply = self._read_reply()
+            if isinstance(reply, RespError):
+                self.close()
+                raise reply
+
+    def _send(self, commands):
+        buf = bytearray()
+        for args in commands:
+            buf += b"*%d\r\n" % len(args)
+            for arg in args:
+                data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+                buf += b"$%d\r\n%s\r\n" % (len(data), data)
+        self._sock.sendall(bytes(buf))
+
+    def _read_reply(self):
+        """One reply; error replies are returned as RespError so the rest can still be read."""
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode("utf-8")
+        if prefix == b"-":
+            return RespError(payload.decode("utf-8"))
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2]
+        if prefix == b"*":
+            length = int(payload)
+            if length == -1:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RespError(f"Unknown reply type: {line!r}")
+
+    def pipeline(self, commands):
+        """Send several commands in one round trip and return all replies."""
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    self._send(commands)
+                    # Every reply is read before raising, or the next command would get a stale one
+                    replies = [self._read_reply() for _ in commands]
+                except (ConnectionError, OSError):
+                    self.close()
+                    if attempt:
+                        raise
+                    continue
+                except Exception:
+                    # Unparseable reply: the connection's position in the stream is unknown
+                    self.close()
+                    raise
+                for reply in replies:
+                    if isinstance(reply, RespError):
+                        raise reply
+                return replies
+
+    def execute(self, *args):
+        return self.pipeline([args])[0]
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+                self._file = None
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Shared storage across hosts. Each session is a Redis list of JSON messages
+    that expires after SESSION_TTL_SECONDS of inactivity.
+    """
+
+    def __init__(self, client: Optional[RespClient] = None, ttl: int = SESSION_TTL_SECONDS,
+                 prefix: str = "zus:chat:"):
+        self.client = client or RespClient()
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def get(self, session_id: str) -> List[dict]:
+        items = self.client.execute("LRANGE", self._key(session_id), 0, -1) or []
+        return [json.loads(item) for item in items]
+
+    def append(self, session_id: str, messages: List[dict]) -> None:
+        if not messages:
+            return
+        key = self._key(session_id)
+        commands = [("RPUSH", key, *[json.dumps(m) for m in messages])]
+        if self.ttl:
+            commands.append(("EXPIRE", key, self.ttl))
+        self.client.pipeline(commands)
+
+    def clear(self, session_id: str) -> None:
+        self.client.execute("DEL", self._key(session_id))
+
+    def close(self) -> None:
+        self.client.close()
+
+
+# -------------------- Read Cache --------------------
+class CachedSessionStore(SessionStore):
+    """
+    Small LRU read cache in front of a shared store.
+
+    Local writes keep the cached copy current; entries written by other workers
+    become visible once the cached copy is older than `ttl` seconds.
+    """
+
+    def __init__(self, store: SessionStore, max_entries: int = SESSION_CACHE_SIZE, ttl: float = SESSION_CACHE_TTL):
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str) -> List[dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._cache.move_to_end(session_id)
+                self.hits += 1
+                CACHE_EVENTS.inc("session", "hit")
+                return list(entry[1])
+            self.misses += 1
+        CACHE_EVENTS.inc("session", "miss")
+
+        messages = self.store.get(session_id)
+        self._put(session_id, messages, now)
+        return list(messages)
+
+    def append(self, session_id: str, messages: List[dict]) -> None:
+        self.store.append(session_id, messages)
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None:
+                self._cache[session_id] = (entry[0], entry[1] + list(messages))
+
+    def clear(self, session_id: str) -> None:
+        self.store.clear(session_id)
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+    def _put(self, session_id: str, messages: List[dict], loaded_at: float):
+        with self._lock:
+            self._cache[session_id] = (loaded_at, list(messages))
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.store).__name__,
+            "cached_sessions": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self) -> None:
+        self.store.close()
+
+
+# -------------------- Factory --------------------
+def create_session_store(backend: str = SESSION_BACKEND) -> SessionStore:
+    """
+    Build the session store selected by SESSION_BACKEND (memory, sqlite or redis).
+    Shared backends are wrapped in the in-process read cache.
+    """
+    backend = backend.lower()
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return CachedSessionStore(SQLiteSessionStore())
+    if backend == "redis":
+        return CachedSessionStore(RedisSessionStore())
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
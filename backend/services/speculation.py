@@ -0,0 +1,134 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Optional
+from services.metrics import CACHE_EVENTS
+from dependencies import SPECULATION_SIMILARITY
+
+# Words that say nothing about what to retrieve
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "be", "do", "does", "did", "of", "in", "at", "on", "for",
+    "to", "and", "or", "any", "some", "me", "my", "i", "you", "your", "we", "our", "what", "whats",
+    "which", "where", "how", "much", "many", "can", "could", "please", "tell", "show", "give", "list",
+    "there", "have", "has", "zus", "coffee", "about", "with", "it", "its",
+}
+
+# The speculation started for the request currently being handled
+_current_speculation: ContextVar[Optional["Speculation"]] = ContextVar("current_speculation", default=None)
+
+
+def content_words(text: str) -> set:
+    return {w for w in re.findall(r"[\w']+", text.lower()) if w not in STOPWORDS}
+
+
+def query_similarity(a: str, b: str) -> float:
+    """
+    Overlap coefficient of content words: 1.0 when one query's keywords are a subset of the other's.
+    Agents tend to shorten the user's question into keywords, which this tolerates.
+    """
+    words_a, words_b = content_words(a), content_words(b)
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / min(len(words_a), len(words_b))
+
+
+# -------------------- Speculation --------------------
+class Speculation:
+    def __init__(self, query: str, top_k: int, future):
+        self.query = query
+        self.top_k = top_k
+        self.future = future
+        self.claimed = False
+        self.retrieval_ms = 0.0
+
+
+class SpeculativeRetriever:
+    """
+    Starts embedding + FAISS search for the user's message while the agent's first
+    LLM call is still deciding whether to call the tool. When the tool then asks
+    for a close-enough query, it gets the precomputed hits instead of searching again.
+    """
+
+    def __init__(self, rag_service, max_workers: int = 4, similarity_threshold: float = SPECULATION_SIMILARITY):
+        self.rag_service = rag_service
+        self.similarity_threshold = similarity_threshold
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative-rag")
+
+        self._lock = threading.Lock()
+        self.started = 0
+        self.claimed = 0
+        self.wasted = 0
+        self.latency_saved_ms = 0.0
+
+    def _retrieve(self, speculation: Speculation, query_embedding=None):
+        start = time.perf_counter()
+        hits = self.rag_service.search(speculation.query, speculation.top_k, query_embedding=query_embedding)
+        speculation.retrieval_ms = (time.perf_counter() - start) * 1000
+        return hits
+
+    def start(self, query: str, top_k: int = 5, query_embedding=None) -> Speculation:
+        """
+        Submit the speculative search and make it visible to tools running in this context.
+        """
+        speculation = Speculation(query, top_k, None)
+        speculation.future = self.executor.submit(self._retrieve, speculation, query_embedding)
+        _current_speculation.set(speculation)
+        with self._lock:
+            self.started += 1
+        return speculation
+
+    def claim(self, query: str, top_k: int = 5):
+        """
+        Return the speculative hits if they were started for a similar query in
+        this request, else None. Each speculation can be claimed once.
+        """
+        speculation = _current_speculation.get()
+        if speculation is None or speculation.claimed or top_k > speculation.top_k:
+            return None
+        if query_similarity(query, speculation.query) < self.similarity_threshold:
+            return None
+
+        speculation.claimed = True
+        wait_start = time.perf_counter()
+        try:
+            hits = speculation.future.result()
+        except Exception as e:
+            print(f"Speculative retrieval failed: {e}")
+            return None
+        waited_ms = (time.perf_counter() - wait_start) * 1000
+
+        with self._lock:
+            self.claimed += 1
+            self.latency_saved_ms += max(0.0, speculation.retrieval_ms - waited_ms)
+        CACHE_EVENTS.inc("speculative_retrieval", "hit")
+        return hits[:top_k]
+
+    def finish(self, speculation: Optional[Speculation]):
+        """
+        Close out a request's speculation, counting it as wasted if no tool used it.
+        """
+        _current_speculation.set(None)
+        if speculation is None or speculation.claimed:
+            return
+        speculation.future.cancel()
+        with self._lock:
+            self.wasted += 1
+        CACHE_EVENTS.inc("speculative_retrieval", "miss")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "started": self.started,
+                "claimed": self.claimed,
+                "wasted": self.wasted,
+                "wasted_rate": self.wasted / self.started if self.started else 0.0,
+                "latency_saved_ms": round(self.latency_saved_ms, 1),
+                "avg_latency_saved_ms": self.latency_saved_ms / self.claimed if self.claimed else 0.0,
+            }
@@ -0,0 +1,27 @@
+import re
+
+# Shared by the offline ingestion script, the admin importer and the migrations, so it must not
+# import from ingestion/ (which is left out of the Docker image)
+
+# Lead characters of UTF-8 text that was decoded as Windows-1252/1250 upstream ("LattÃ©", "LattĂ©")
+MOJIBAKE = re.compile("[ÃĂÂâÅ]")
+
+
+def repair_text(value):
+    """Undo double-encoded UTF-8 ('LattÃ©' -> 'Latté'); text that doesn't round-trip is returned as is."""
+    if not isinstance(value, str) or not MOJIBAKE.search(value):
+        return value
+    for encoding in ("cp1252", "cp1250"):
+        try:
+            return value.encode(encoding).decode("utf-8")
+        except UnicodeError:
+            continue
+    return value
+
+
+def parse_price(price_str):
+    """Extract numeric price from a string like 'Sale priceRM79.00'."""
+    if not price_str:
+        return 0.0
+    match = re.search(r"(\d+(\.\d+)?)", price_str)
+    return float(match.group(1)) if match else 0.0
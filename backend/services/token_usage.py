@@ -0,0 +1,182 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, Optional
+from fastapi import HTTPException
+from services.metrics import LLM_TOKENS, LLM_COST, REQUEST_TOKENS
+from dependencies import (
+    LLM_MODEL_SMALL,
+    LLM_MODEL_LARGE,
+    LLM_SMALL_PRICE,
+    LLM_LARGE_PRICE,
+    SESSION_TOKEN_BUDGET,
+    TOKEN_USAGE_SESSIONS,
+)
+
+# Endpoint used for model calls made outside a request (benchmarks, scripts)
+NO_ENDPOINT = "other"
+
+
+def parse_price(value: str) -> tuple:
+    """Parse "input,output" USD per million tokens."""
+    input_price, output_price = (float(part) for part in value.split(","))
+    return input_price, output_price
+
+
+PRICES = {LLM_MODEL_SMALL: parse_price(LLM_SMALL_PRICE), LLM_MODEL_LARGE: parse_price(LLM_LARGE_PRICE)}
+
+
+def empty_usage() -> dict:
+    return {"calls": 0, "input_tokens": 0, "output_tokens": 0, "estimated_calls": 0, "cost_usd": 0.0}
+
+
+def add_usage(total: dict, usage: dict):
+    for key, value in usage.items():
+        total[key] += value
+
+
+# -------------------- Request usage --------------------
+class RequestUsage:
+    """
+    Tokens used by one request, per model. Model calls made on the request's behalf
+    (in any thread with a copy of its context) add to it until it is finished.
+    """
+
+    def __init__(self, endpoint: str, session_id: Optional[str]):
+        self.endpoint = endpoint
+        self.session_id = session_id
+        self.by_model: Dict[str, dict] = {}
+        self.finished = False
+
+    def total_tokens(self) -> int:
+        return sum(u["input_tokens"] + u["output_tokens"] for u in self.by_model.values())
+
+
+current_usage: ContextVar[Optional[RequestUsage]] = ContextVar("current_usage", default=None)
+
+
+# -------------------- Token Ledger --------------------
+class TokenLedger:
+    """
+    Aggregates LLM token usage and estimated cost per endpoint, per session and per model,
+    and enforces an optional per-session token budget. Totals are per worker process.
+    """
+
+    def __init__(self, prices: Dict[str, tuple] = PRICES, session_budget: int = SESSION_TOKEN_BUDGET,
+                 max_sessions: int = TOKEN_USAGE_SESSIONS):
+        self.prices = prices
+        self.session_budget = session_budget
+        self.max_sessions = max_sessions
+        self.by_endpoint: Dict[str, dict] = {}
+        self.by_model: Dict[str, dict] = {}
+        self.by_session: "OrderedDict[str, dict]" = OrderedDict()
+        self.requests = 0
+        self.over_budget = 0
+        self._lock = threading.Lock()
+
+    def cost(self, model: str, input_tokens: int, output_tokens: int) -> float:
+        input_price, output_price = self.prices.get(model, (0.0, 0.0))
+        return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+    # -------------------- Recording --------------------
+    def start_request(self, endpoint: str, session_id: Optional[str] = None) -> RequestUsage:
+        usage = RequestUsage(endpoint, session_id)
+        current_usage.set(usage)
+        return usage
+
+    def record(self, model: str, input_tokens: int, output_tokens: int, estimated: bool = False):
+        """
+        Record one model call against the current request, or straight into the
+        totals when there is no open request (e.g. a call that outlived its request).
+        """
+        call = {
+            "calls": 1,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "estimated_calls": int(estimated),
+            "cost_usd": self.cost(model, input_tokens, output_tokens),
+        }
+        usage = current_usage.get()
+        with self._lock:
+            if usage is not None and not usage.finished:
+                add_usage(usage.by_model.setdefault(model, empty_usage()), call)
+                return
+            endpoint = usage.endpoint if usage is not None else NO_ENDPOINT
+            session_id = usage.session_id if usage is not None else None
+            self._aggregate(endpoint, session_id, model, call)
+
+    def finish(self, usage: RequestUsage):
+        """Close a request and fold its usage into the endpoint, session and model totals."""
+        with self._lock:
+            usage.finished = True
+            self.requests += 1
+            for model, call in usage.by_model.items():
+                self._aggregate(usage.endpoint, usage.session_id, model, call)
+        if usage.by_model:
+            REQUEST_TOKENS.labels(usage.endpoint).observe(usage.total_tokens())
+
+    def _aggregate(self, endpoint: str, session_id: Optional[str], model: str, call: dict):
+        add_usage(self.by_endpoint.setdefault(endpoint, empty_usage()), call)
+        add_usage(self.by_model.setdefault(model, empty_usage()), call)
+        if session_id:
+            session = self.by_session.get(session_id)
+            if session is None:
+                session = self.by_session[session_id] = empty_usage()
+                while len(self.by_session) > self.max_sessions:
+                    self.by_session.popitem(last=False)
+            self.by_session.move_to_end(session_id)
+            add_usage(session, call)
+
+        LLM_TOKENS.inc(endpoint, model, "input", amount=call["input_tokens"])
+        LLM_TOKENS.inc(endpoint, model, "output", amount=call["output_tokens"])
+        LLM_COST.inc(endpoint, model, amount=call["cost_usd"])
+
+    # -------------------- Budgets --------------------
+    def session_tokens(self, session_id: str) -> int:
+        with self._lock:
+            session = self.by_session.get(session_id)
+            return session["input_tokens"] + session["output_tokens"] if session else 0
+
+    def check_budget(self, session_id: str):
+        """
+        Raise 429 when the session has used up its token budget (no-op when budgets are off).
+        """
+        if self.session_budget <= 0 or self.session_tokens(session_id) < self.session_budget:
+            return
+        with self._lock:
+            self.over_budget += 1
+        raise HTTPException(status_code=429, detail="This chat session has reached its usage limit. Please start a new session.")
+
+    # -------------------- Stats --------------------
+    def session_stats(self, session_id: str) -> dict:
+        with self._lock:
+            stats = dict(self.by_session.get(session_id, empty_usage()))
+        stats["total_tokens"] = stats["input_tokens"] + stats["output_tokens"]
+        stats["budget"] = self.session_budget or None
+        stats["budget_remaining"] = max(0, self.session_budget - stats["total_tokens"]) if self.session_budget else None
+        return stats
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_endpoint = {endpoint: dict(usage) for endpoint, usage in self.by_endpoint.items()}
+            by_model = {model: dict(usage) for model, usage in self.by_model.items()}
+            sessions = len(self.by_session)
+            requests, over_budget = self.requests, self.over_budget
+        for usage in by_endpoint.values():
+            usage["avg_tokens_per_call"] = (usage["input_tokens"] + usage["output_tokens"]) / usage["calls"] if usage["calls"] else 0.0
+        return {
+            "requests": requests,
+            "sessions": sessions,
+            "over_budget": over_budget,
+            "session_budget": self.session_budget or None,
+            "by_endpoint": by_endpoint,
+            "by_model": by_model,
+        }
+
+
+token_ledger = TokenLedger()
@@ -0,0 +1,4 @@
+import os
+
+# The app resolves data/ and database/ against the working directory, which is backend/ when served
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+import anyio.to_thread
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from starlette.requests import Request
+
+from services import admission
+from services.admission import AdmissionQueue, admission_slot, client_key
+
+
+def test_queued_requests_hold_no_threadpool_thread():
+    queue = AdmissionQueue("Test", max_concurrent=2, max_waiting=30, max_wait=10)
+    release = threading.Event()
+    app = FastAPI()
+
+    @app.get("/slow", dependencies=[Depends(admission_slot(queue))])
+    def slow():
+        release.wait(10)
+        return {"ok": True}
+
+    @app.get("/ping")
+    def ping():
+        return {"ok": True}
+
+    async def scenario():
+        # Far fewer threads than queued requests: waiting must not occupy any of them
+        anyio.to_thread.current_default_thread_limiter().total_tokens = 4
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            slow_requests = [asyncio.create_task(client.get("/slow")) for _ in range(32)]
+            while queue.running < 2 or queue.waiting < 30:
+                await asyncio.sleep(0.01)
+            ping = await asyncio.wait_for(client.get("/ping"), timeout=2)
+            release.set()
+            return ping, await asyncio.gather(*slow_requests)
+
+    ping, responses = asyncio.run(scenario())
+    assert ping.status_code == 200
+    assert [r.status_code for r in responses] == [200] * 32
+    assert queue.stats()["admitted"] == 32
+
+
+def test_full_queue_and_wait_timeout_are_rejected():
+    queue = AdmissionQueue("Test", max_concurrent=1, max_waiting=1, max_wait=0.1)
+
+    async def scenario():
+        first = await queue.admit()
+        waiter = asyncio.create_task(queue.admit())
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as overflow:
+            await queue.admit()
+        with pytest.raises(HTTPException) as timeout:
+            await waiter
+        first.close()
+        return overflow.value, timeout.value
+
+    overflow, timeout = asyncio.run(scenario())
+    assert overflow.status_code == timeout.status_code == 503
+    assert "Retry-After" in overflow.headers
+    assert queue.stats()["rejected"] == 2
+
+
+def test_held_call_keeps_the_slot_after_the_request():
+    queue = AdmissionQueue("Test", max_concurrent=1, max_waiting=1, max_wait=0.1)
+
+    async def scenario():
+        first = await queue.admit()
+        abandoned = Future()
+        first.hold(abandoned)
+        first.close()
+        assert queue.stats()["lingering"] == 1
+        with pytest.raises(HTTPException):
+            await queue.admit()
+        threading.Thread(target=abandoned.set_result, args=(None,)).start()
+        second = await queue.admit()
+        second.close()
+
+    asyncio.run(scenario())
+    assert queue.stats()["lingering"] == 0
+    assert queue.running == 0
+
+
+def request_from(peer: str, forwarded: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+def test_client_key_ignores_forwarded_for_from_untrusted_peers(monkeypatch):
+    monkeypatch.setattr(admission, "trusted_proxies", [])
+    assert client_key(request_from("203.0.113.7", "1.2.3.4")) == "203.0.113.7"
+
+
+def test_client_key_uses_nearest_untrusted_hop_behind_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(admission, "trusted_proxies", admission._parse_networks("10.0.0.0/8"))
+    # The leftmost hop is whatever the client sent; the proxy appended the real address
+    assert client_key(request_from("10.1.2.3", "6.6.6.6, 198.51.100.9, 10.0.0.5")) == "198.51.100.9"
+    assert client_key(request_from("10.1.2.3", "10.0.0.5")) == "10.1.2.3"
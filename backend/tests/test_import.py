@@ -0,0 +1,54 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from dependencies import DATABASE_PATH
+from ingestion import ingest_scraped_data_to_sqlite as ingestion
+from services.crud import food_table, outlets_table
+from services.importer import clean_row, upsert_sql
+from services.migrations import upgrade
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / "catalog.db"
+    shutil.copyfile(DATABASE_PATH, path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    upgrade(conn)
+    yield path, conn
+    conn.close()
+
+
+def count(conn, table: str, name: str) -> int:
+    return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+
+
+def test_reimport_without_category_or_address_updates_in_place(catalog):
+    _, conn = catalog
+    food = [clean_row(food_table, {"name": "Kaya Toast", "price": f"RM{price}"}) for price in (5, 6)]
+    outlet = [clean_row(outlets_table, {"name": "ZUS Coffee – Pop-up", "category": category})
+              for category in ("kiosk", "cart")]
+    for table, rows in ((food_table, food), (outlets_table, outlet)):
+        for row in rows:
+            conn.execute(upsert_sql(table), row)
+
+    assert count(conn, "food", "Kaya Toast") == 1
+    assert conn.execute("SELECT price FROM food WHERE name = 'Kaya Toast'").fetchone()[0] == 6.0
+    assert count(conn, "outlets", "ZUS Coffee – Pop-up") == 1
+    assert conn.execute("SELECT category FROM outlets WHERE name = 'ZUS Coffee – Pop-up'").fetchone()[0] == "cart"
+
+
+def test_ingestion_rerun_does_not_duplicate_null_keys(catalog, monkeypatch):
+    path, conn = catalog
+    monkeypatch.setattr(ingestion, "DATABASE_PATH", str(path))
+    for _ in range(2):
+        ingestion.ingest_drinks([{"name": "Uncategorised Latté", "price": "RM9.90"}])
+    assert count(conn, "drinks", "Uncategorised Latté") == 1
+
+
+def test_null_key_still_distinct_from_named_key(catalog):
+    _, conn = catalog
+    for category in (None, "toast"):
+        conn.execute(upsert_sql(food_table), clean_row(food_table, {"name": "Kaya Toast", "category": category}))
+    assert count(conn, "food", "Kaya Toast") == 2
@@ -0,0 +1,47 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from dependencies import DATABASE_PATH
+from services.migrations import LATEST_VERSION, check_plans, ensure_version_triggers, schema_version, upgrade
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / "catalog.db"
+    shutil.copyfile(DATABASE_PATH, path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    upgrade(conn)
+    yield conn
+    conn.close()
+
+
+def version(conn, table: str) -> int:
+    return conn.execute("SELECT version FROM catalog_versions WHERE name = ?", (table,)).fetchone()[0]
+
+
+def test_upgrade_is_idempotent(catalog):
+    assert schema_version(catalog) == LATEST_VERSION
+    assert upgrade(catalog) == []
+
+
+def test_hot_queries_use_their_index(catalog):
+    # Same EXPLAIN QUERY PLAN check as `python services/migrations.py check`
+    assert check_plans(catalog) == []
+
+
+def test_recreated_table_gets_its_version_triggers_back(catalog):
+    before = version(catalog, "food")
+    # What a re-run of the ingestion script after dropping a table leaves behind
+    schema = catalog.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'food'").fetchone()[0]
+    catalog.execute("DROP TABLE food")
+    catalog.execute(schema)
+    catalog.execute("INSERT INTO food (name, category) VALUES ('Kaya Toast', 'toast')")
+    assert version(catalog, "food") == before
+
+    assert ensure_version_triggers(catalog) == ["food"]
+    assert version(catalog, "food") == before + 1
+    catalog.execute("UPDATE food SET price = 5 WHERE name = 'Kaya Toast'")
+    assert version(catalog, "food") == before + 2
+    assert ensure_version_triggers(catalog) == []
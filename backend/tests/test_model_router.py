@@ -0,0 +1,62 @@
+from services.fake_llm import FakeChatModel
+from services.model_router import LARGE, SMALL, ModelRouter
+from services.rag_service import RAGService
+
+
+def hit(score, text):
+    """A retrieval hit shaped like RAGService.search output."""
+    return {"score": score, "faiss_id": 0, "doc": {"item_type": "drink", "text": text}, "context": text}
+
+
+HITS = [
+    hit(0.82, "Drink: Spanish Latte, Category: soe, Price: RM12.9"),
+    hit(0.74, "Drink: Iced Spanish Latte, Category: soe, Price: RM13.9"),
+]
+
+
+def stand_in_router(small_answer_chars=800, **kwargs):
+    """Router whose tiers are local stand-in models, wired to the router's per-tier metrics."""
+    router = ModelRouter(models={SMALL: "small-model", LARGE: "large-model"},
+                         task_tiers={"summary": SMALL, "agent": LARGE}, **kwargs)
+    router._clients = {
+        SMALL: FakeChatModel(model_name="fake-small", base_latency=0, seconds_per_output_token=0,
+                             max_answer_chars=small_answer_chars, callbacks=[router.metrics[SMALL]]),
+        LARGE: FakeChatModel(model_name="fake-large", base_latency=0, seconds_per_output_token=0,
+                             callbacks=[router.metrics[LARGE]]),
+    }
+    return router
+
+
+def test_grounded_summary_stays_on_the_small_tier():
+    router = stand_in_router()
+    summary = RAGService(model_router=router).summarize("spanish latte", HITS)
+
+    assert "Spanish Latte" in summary
+    stats = router.stats()
+    assert stats["routed"] == {SMALL: 1, LARGE: 0}
+    assert stats["tiers"][SMALL]["calls"] == 1 and stats["tiers"][LARGE]["calls"] == 0
+    assert stats["tiers"][SMALL]["input_tokens"] > 0 and stats["tiers"][SMALL]["output_tokens"] > 0
+
+
+def test_ungrounded_small_summary_is_retried_on_the_large_tier():
+    # A small model that names none of the hits fails validation
+    router = stand_in_router(small_answer_chars=0)
+    summary = RAGService(model_router=router).summarize("spanish latte", HITS)
+
+    assert "Spanish Latte" in summary
+    stats = router.stats()
+    assert stats["escalations"]["validation"] == 1
+    assert stats["tiers"][SMALL]["calls"] == 1 and stats["tiers"][LARGE]["calls"] == 1
+
+
+def test_large_prompt_and_low_confidence_go_straight_to_the_large_tier():
+    router = stand_in_router(max_small_prompt_chars=50)
+    RAGService(model_router=router).summarize("spanish latte", HITS)
+
+    router.max_small_prompt_chars, router.min_score = 10_000, 0.9
+    RAGService(model_router=router).summarize("spanish latte", HITS)
+
+    stats = router.stats()
+    assert stats["escalations"]["prompt_size"] == 1 and stats["escalations"]["low_confidence"] == 1
+    assert stats["routed"] == {SMALL: 0, LARGE: 2}
+    assert stats["tiers"][SMALL]["calls"] == 0 and stats["tiers"][LARGE]["calls"] == 2
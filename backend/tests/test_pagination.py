@@ -0,0 +1,40 @@
+import base64
+import json
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+
+from services.crud import decode_cursor, encode_cursor, drinks_table
+
+
+def forged(*payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    for key in ("Latté", 12.9, 3, None):
+        assert decode_cursor(encode_cursor("price", "asc", "next", key, 7)) == ("price", "asc", "next", key, 7)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 json",
+    forged("price", "asc", "sideways", 1.0, 7),
+    forged("price", "asc", "next", 1.0, "7"),
+    forged("price", "asc", "next", 1.0, 2**70),
+    forged("name", "asc", "next", ["a", "b"], 7),
+    forged("name", "asc", "next", {"a": 1}, 7),
+    forged("price", "asc", "next", 2**64, 7),
+    forged("price", "asc", "next", True, 7),
+])
+def test_forged_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as rejected:
+        decode_cursor(cursor)
+    assert rejected.value.status_code == 400
+
+
+def test_forged_cursor_never_reaches_sqlite():
+    conn = sqlite3.connect(":memory:")
+    with pytest.raises(HTTPException) as rejected:
+        drinks_table.page(conn, 20, "name", "asc", forged("name", "asc", "next", [1, 2], 7), False)
+    assert rejected.value.status_code == 400
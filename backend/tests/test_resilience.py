@@ -0,0 +1,53 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+import pytest
+
+from services import resilience
+from services.resilience import CircuitBreaker, LLMTimeoutError, call_with_resilience, start_deadline
+
+
+def test_agent_runs_do_not_starve_their_own_model_calls(monkeypatch):
+    # One single-call worker: an agent run occupying it would time out its own summaries
+    monkeypatch.setattr(resilience, "_executor", ThreadPoolExecutor(max_workers=1))
+    breaker = CircuitBreaker()
+
+    def agent():
+        return [call_with_resilience(lambda: f"summary {i}", timeout=1, hedge_after=None, breaker=breaker)
+                for i in range(4)]
+
+    result = call_with_resilience(agent, timeout=2, hedge_after=None, breaker=breaker,
+                                  executor=resilience.agent_executor)
+    assert result == [f"summary {i}" for i in range(4)]
+
+
+def test_timed_out_running_call_is_handed_to_the_deadline():
+    held, release = [], threading.Event()
+
+    def scenario():
+        start_deadline(5, on_abandon=held.append)
+        with pytest.raises(LLMTimeoutError):
+            call_with_resilience(release.wait, 5, timeout=0.05, hedge_after=None, breaker=CircuitBreaker())
+
+    copy_context().run(scenario)
+    assert len(held) == 1 and not held[0].done()
+    release.set()
+    held[0].result(timeout=1)
+
+
+def test_queued_call_is_cancelled_not_abandoned(monkeypatch):
+    monkeypatch.setattr(resilience, "_executor", ThreadPoolExecutor(max_workers=1))
+    held, release = [], threading.Event()
+    blocker = resilience._executor.submit(release.wait, 5)
+
+    def scenario():
+        start_deadline(5, on_abandon=held.append)
+        with pytest.raises(LLMTimeoutError):
+            call_with_resilience(time.sleep, 0, timeout=0.05, hedge_after=None, breaker=CircuitBreaker())
+
+    copy_context().run(scenario)
+    release.set()
+    blocker.result(timeout=1)
+    assert held == []
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from services.retrieval_cache import ConversationRetrievalCache, current_session_id
+
+AMPANG = [
+    "Outlet: ZUS Coffee – Jalan Ampang, Category: Kuala Lumpur/Selangor, Address: 12 Jalan Ampang",
+    "Outlet: ZUS Coffee – Ampang Point, Category: Kuala Lumpur/Selangor, Address: Ampang Point Mall",
+]
+
+
+class StandInIndex:
+    """The two RAGService calls the cache makes, over fixed vectors; records centroid searches."""
+
+    def __init__(self):
+        self.vector_searches = 0
+
+    def get_vectors(self, faiss_ids):
+        return np.eye(4, dtype="float32")[list(faiss_ids)]
+
+    def search_by_vector(self, vector, top_k):
+        self.vector_searches += 1
+        return [{"score": 0.5, "faiss_id": 3, "context": "Outlet: ZUS Coffee – Ampang Jaya"}]
+
+
+@pytest.fixture
+def cache():
+    cache = ConversationRetrievalCache(StandInIndex())
+    token = current_session_id.set("s1")
+    cache.remember([{"score": 0.9 - i / 10, "faiss_id": i, "context": text} for i, text in enumerate(AMPANG)])
+    yield cache
+    current_session_id.reset(token)
+
+
+def test_follow_up_naming_a_new_place_runs_a_real_search(cache):
+    assert cache.resolve_follow_up("and outlets in Cheras?") is None
+    assert cache.resolve_follow_up("what about the Cheras one?") is None
+    assert cache.rag_service.vector_searches == 0
+    assert cache.session_stats("s1")["misses"] == 2
+
+
+def test_follow_up_about_cached_hits_is_answered_from_them(cache):
+    assert cache.resolve_follow_up("and the second one?")[0]["context"] == AMPANG[1]
+    assert cache.resolve_follow_up("and the ones at Ampang Point?")[0]["context"] == AMPANG[1]
+    assert cache.rag_service.vector_searches == 0
+
+
+def test_referential_follow_up_searches_around_the_cached_hits(cache):
+    hits = cache.resolve_follow_up("tell me more about those")
+    assert hits[0]["context"] == "Outlet: ZUS Coffee – Ampang Jaya"
+    assert cache.rag_service.vector_searches == 1
@@ -0,0 +1,62 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from dependencies import DATABASE_PATH
+from services.crud import drinks_table
+from services.migrations import migrate
+from services.text_cleaning import repair_text
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    """A migrated copy of the shipped catalog, its search index built before the text repair."""
+    path = tmp_path / "catalog.db"
+    shutil.copyfile(DATABASE_PATH, path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("BEGIN")
+    drinks_table.create_search_index(conn)
+    conn.execute("COMMIT")
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("scraped, expected", [
+    ("Spanish LattÃ© FrappÃ©", "Spanish Latté Frappé"),
+    ("Vietnamese Spanish LattĂ© (1L)", "Vietnamese Spanish Latté (1L)"),
+    ("Iced ButtercrĂ¨me Chocolatta", "Iced Buttercrème Chocolatta"),
+    ("CafÃ© Mocha", "Café Mocha"),
+    ("Jasmine Cham Latté", "Jasmine Cham Latté"),
+    ("Pak Nasser’s Nasi Lemak", "Pak Nasser’s Nasi Lemak"),
+    (None, None),
+])
+def test_repair_text(scraped, expected):
+    assert repair_text(scraped) == expected
+
+
+def names(rows):
+    return {row["name"] for row in rows}
+
+
+def test_accent_insensitive_search_finds_scraped_names(catalog):
+    found = names(drinks_table.search(catalog, 100, name="spanish latte"))
+    assert {"Spanish Latté", "Spanish Latté Frappé", "Vietnamese Spanish Latté (1L)", "SOE Spanish Latté"} <= found
+    assert len(found) >= 10
+    assert "Cafe Latté (1L)" in names(drinks_table.search(catalog, 100, name="latte"))
+    assert "Mango Frappé" in names(drinks_table.search(catalog, 100, name="frappe"))
+    assert "Iced Buttercrème Spanish Latté" in names(drinks_table.search(catalog, 100, name="buttercreme"))
+
+
+def test_filter_without_words_is_not_dropped(catalog):
+    assert drinks_table.search(catalog, 100, name="!!!") == []
+    assert drinks_table.search(catalog, 100, name="latte", category="!!!") == []
+    catalog.execute("UPDATE drinks SET name = 'Latté!!!' WHERE id = 1")
+    assert names(drinks_table.search(catalog, 100, name="!!!")) == {"Latté!!!"}
+
+
+def test_no_mis_encoded_names_left(catalog):
+    for table in ("drinkware", "food", "drinks", "outlets"):
+        assert catalog.execute(f"SELECT COUNT(*) FROM {table} WHERE name GLOB '*[ÃĂ]*'").fetchone()[0] == 0
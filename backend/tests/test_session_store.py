@@ -0,0 +1,130 @@
+import socket
+import threading
+
+import pytest
+
+from services.session_store import CachedSessionStore, RespClient, RespError, SQLiteSessionStore
+
+
+class StandInServer:
+    """
+    Tiny RESP server: WRONGTYPE for RPUSH on key "wrong", an unparseable reply to GARBLE,
+    and the command name echoed for anything else.
+    """
+
+    def __init__(self):
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        self.connections = 0
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            conn, _ = self.listener.accept()
+            self.connections += 1
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        try:
+            self.reply(conn, conn.makefile("rb"))
+        except OSError:
+            pass  # client dropped the connection
+
+    def reply(self, conn, stream):
+        while True:
+            header = stream.readline()
+            if not header:
+                return
+            args = []
+            for _ in range(int(header[1:])):
+                length = int(stream.readline()[1:])
+                args.append(stream.read(length + 2)[:-2].decode())
+            if args[0] == "RPUSH" and args[1] == "wrong":
+                conn.sendall(b"-WRONGTYPE Operation against a key holding the wrong kind of value\r\n")
+            elif args[0] == "GARBLE":
+                conn.sendall(b"?garbled\r\n")
+            else:
+                conn.sendall(b"+%s\r\n" % args[0].encode())
+
+
+@pytest.fixture(scope="module")
+def server():
+    return StandInServer()
+
+
+def test_error_mid_pipeline_does_not_desync_the_connection(server):
+    client = RespClient(f"redis://127.0.0.1:{server.port}")
+    with pytest.raises(RespError, match="WRONGTYPE"):
+        client.pipeline([("RPUSH", "wrong", "x"), ("EXPIRE", "wrong", 60), ("LTRIM", "wrong", 0, -1)])
+    # The replies after the error were consumed, so the next command gets its own
+    assert client.execute("PING") == "PING"
+    assert client.pipeline([("GET", "a"), ("TTL", "a")]) == ["GET", "TTL"]
+    client.close()
+
+
+def test_unknown_reply_drops_the_connection(server):
+    client = RespClient(f"redis://127.0.0.1:{server.port}")
+    client.execute("PING")
+    connections = server.connections
+    with pytest.raises(RespError, match="Unknown reply type"):
+        client.pipeline([("GARBLE",), ("PING",)])
+    assert client.execute("PING") == "PING"
+    assert server.connections == connections + 1
+    client.close()
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    # Long flush interval: the test decides when the write-behind buffer reaches disk
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), flush_interval=3600)
+    yield store
+    store.close()
+
+
+def rows_on_disk(store, session_id):
+    return store._connect().execute("SELECT COUNT(*) FROM chat_messages WHERE session_id = ?",
+                                    (session_id,)).fetchone()[0]
+
+
+def test_pending_appends_are_read_before_the_flush(sqlite_store):
+    sqlite_store.append("s1", [{"role": "user", "content": "hi"}])
+    sqlite_store.flush()
+    sqlite_store.append("s1", [{"role": "assistant", "content": "hello"}])
+
+    assert rows_on_disk(sqlite_store, "s1") == 1
+    assert [m["content"] for m in sqlite_store.get("s1")] == ["hi", "hello"]
+    assert sqlite_store.get("s2") == []
+
+
+def test_clear_drops_flushed_and_pending_messages(sqlite_store):
+    sqlite_store.append("s1", [{"role": "user", "content": "hi"}])
+    sqlite_store.append("s2", [{"role": "user", "content": "other"}])
+    sqlite_store.flush()
+    sqlite_store.append("s1", [{"role": "assistant", "content": "hello"}])
+
+    sqlite_store.clear("s1")
+    assert sqlite_store.get("s1") == []
+    sqlite_store.flush()
+    assert rows_on_disk(sqlite_store, "s1") == 0
+    assert [m["content"] for m in sqlite_store.get("s2")] == ["other"]
+
+
+def test_cached_store_sees_local_writes_at_once(sqlite_store):
+    store = CachedSessionStore(sqlite_store, ttl=3600)
+    assert store.get("s1") == []
+    store.append("s1", [{"role": "user", "content": "hi"}])
+    assert [m["content"] for m in store.get("s1")] == ["hi"]
+    store.clear("s1")
+    assert store.get("s1") == []
+    assert store.stats()["hits"] == 1
+
+
+def test_cached_store_reloads_writes_from_other_workers_after_ttl(sqlite_store):
+    store = CachedSessionStore(sqlite_store, ttl=3600)
+    store.get("s1")
+    # Another worker writing the shared store is not visible while the cached copy is fresh
+    sqlite_store.append("s1", [{"role": "user", "content": "elsewhere"}])
+    assert store.get("s1") == []
+
+    store.ttl = 0
+    assert [m["content"] for m in store.get("s1")] == ["elsewhere"]